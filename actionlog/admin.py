@@ -1,14 +1,31 @@
 from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
 
 from django.shortcuts import reverse
 
 from .forms import LogModelForm
 from .models import LogModel
 
-from shipment.models import Shipment
-from cargo.models import Cargo
-from supplier.models import Supplier
-from customer.models import Customer
+
+class ContentTypeListFilter(admin.RelatedOnlyFieldListFilter):
+    """
+    Фильтр по типу объекта: только типы, которые есть в истории,
+    с названиями моделей.
+    """
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        self.title = LogModel._meta.get_field('table_name').verbose_name
+
+    def field_choices(self, field, request, model_admin):
+        choices = []
+        for pk, label in super().field_choices(field, request, model_admin):
+            # ContentType кэшируется менеджером, запроса нет
+            model = ContentType.objects.get_for_id(pk).model_class()
+            choices.append((pk, model._meta.verbose_name if model else label))
+        return choices
 
 
 @admin.register(LogModel)
@@ -16,33 +33,31 @@ class LogAdmin(admin.ModelAdmin):
     form = LogModelForm
     list_display = ('id', 'table_name', 'data', 'action', 'date', )
     fields = list_display
-    list_filter = ('table_name', 'date', 'action', )
+    # фильтр по типу объекта - по индексированному content_type,
+    # table_name только для отображения
+    list_filter = (('content_type', ContentTypeListFilter),
+                   'date', 'action', )
     search_fields = ('data', )
 
-    def check_if_object_exists(self, log_entry):
-        exists = False
-        object_entry_id = log_entry.object_entry_id
-        if log_entry.table_name == Shipment._meta.verbose_name:
-            exists = Shipment.objects.filter(pk=object_entry_id).exists()
-        elif log_entry.table_name == Cargo._meta.verbose_name:
-            exists = Cargo.objects.filter(pk=object_entry_id).exists()
-        elif log_entry.table_name == Customer._meta.verbose_name:
-            exists = Customer.objects.filter(pk=object_entry_id).exists()
-        else:
-            exists = Supplier.objects.filter(pk=object_entry_id).exists()
-        return exists
-
-    def get_model_name(self, log_entry):
-        name = ''
-        if log_entry.table_name == Shipment._meta.verbose_name:
-            name = Shipment.__name__
-        elif log_entry.table_name == Cargo._meta.verbose_name:
-            name = Cargo.__name__
-        elif log_entry.table_name == Customer._meta.verbose_name:
-            name = Customer.__name__
-        else:
-            name = Supplier.__name__
-        return name
+    def get_object_link(self, log_entry):
+        """
+        Ссылка на страницу объекта записи или None,
+        если объект удален.
+        """
+        if log_entry.content_type_id is None:
+            return None
+        # ContentType кэшируется менеджером, запроса нет
+        content_type = ContentType.objects.get_for_id(
+            log_entry.content_type_id)
+        model = content_type.model_class()
+        if model is None or not (model
+                                 ._base_manager
+                                 .filter(pk=log_entry.object_entry_id)
+                                 .exists()):
+            return None
+        return reverse(f'admin:{content_type.app_label}_'
+                       f'{content_type.model}_change',
+                       args=(log_entry.object_entry_id, ))
 
     def has_add_permission(self, request, obj=None):
         return False
@@ -53,17 +68,11 @@ class LogAdmin(admin.ModelAdmin):
     def change_view(self, request, object_id,
                     form_url='', extra_context=None):
         extra_context = extra_context or {}
-        if LogModel.objects.filter(pk=object_id).exists():
-            log_entry = LogModel.objects.get(pk=object_id)
-            exists = self.check_if_object_exists(log_entry)
-            if exists:
-                extra_context['object_exists'] = exists
-                model_name = self.get_model_name(log_entry).lower()
-                app_name = model_name
-                url_to_reverse = ('admin:'
-                                  + app_name + '_' + model_name + '_change')
-                link = reverse(url_to_reverse,
-                               args=(log_entry.object_entry_id, ))
+        log_entry = self.get_object(request, object_id)
+        if log_entry is not None:
+            link = self.get_object_link(log_entry)
+            if link:
+                extra_context['object_exists'] = True
                 extra_context['object_link'] = link
         return super().change_view(request, object_id,
                                    form_url='', extra_context=extra_context)
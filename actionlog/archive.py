@@ -0,0 +1,197 @@
+import datetime
+import glob
+import gzip
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LogModel
+
+ARCHIVE_FIELDS = ('id', 'table_name', 'content_type', 'data', 'action',
+                  'date', 'object_entry_id')
+ARCHIVE_PATTERN = 'actionlog-%04d-%02d.ndjson.gz'
+
+
+def archive_path(year, month, root=None):
+    return os.path.join(root or settings.ACTION_LOG_ARCHIVE_DIR,
+                        ARCHIVE_PATTERN % (year, month))
+
+
+def archive_files(root=None, since=None, until=None):
+    """
+    Файлы архива по возрастанию месяца; since и until (даты
+    в UTC) отбрасывают файлы месяцев вне промежутка.
+    """
+    root = root or settings.ACTION_LOG_ARCHIVE_DIR
+    for path in sorted(glob.glob(os.path.join(root,
+                                              'actionlog-*.ndjson.gz'))):
+        year, month = map(int, os.path.basename(path)[10:17].split('-'))
+        if since and (year, month) < (since.year, since.month):
+            continue
+        if until and (year, month) > (until.year, until.month):
+            continue
+        yield path
+
+
+def _record(values):
+    values['date'] = values['date'].astimezone(
+        datetime.timezone.utc).isoformat()
+    return json.dumps(values, ensure_ascii=False) + '\n'
+
+
+def _concatenate(path, size, part):
+    # архив обрезается до размера перед дописыванием: остаток
+    # прерванного дописывания того же члена удаляется
+    with open(path, 'ab') as archive:
+        archive.truncate(size)
+        with open(part, 'rb') as member:
+            shutil.copyfileobj(member, archive)
+        archive.flush()
+        os.fsync(archive.fileno())
+    os.remove(part)
+
+
+def _recover(root):
+    """
+    Завершение дописываний, прерванных сбоем процесса.
+
+    Готовый член gzip хранится в файле <архив>.<размер архива>.part
+    до конца дописывания; недописанный член (.tmp) удаляется,
+    его записи остались в таблице.
+    """
+    for part in glob.glob(os.path.join(root, 'actionlog-*.part')):
+        path, size = part[:-len('.part')].rsplit('.', 1)
+        _concatenate(path, int(size), part)
+    for temp in glob.glob(os.path.join(root, 'actionlog-*.tmp')):
+        os.remove(temp)
+
+
+def _append(root, month, lines):
+    # каждое дописывание - отдельный член gzip-файла, файл
+    # читается целиком стандартным gzip; член сначала пишется
+    # во временный файл и дописывается в архив только целиком
+    path = archive_path(*month, root=root)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    temp = path + '.tmp'
+    with open(temp, 'wb') as member:
+        with gzip.GzipFile(fileobj=member, mode='wb') as stream:
+            stream.write(''.join(lines).encode('utf-8'))
+        member.flush()
+        os.fsync(member.fileno())
+    part = f'{path}.{size}.part'
+    os.replace(temp, part)
+    _concatenate(path, size, part)
+
+
+def archive_entries(before, root=None, chunk_size=1000):
+    """
+    Перенос записей истории старше before в помесячные архивы
+    (gzip, по одной записи JSON в строке).
+
+    Записи переносятся частями по chunk_size: часть дописывается
+    в архивы и затем удаляется из таблицы в своей транзакции.
+    Если процесс прервался между записью в архив и удалением,
+    при повторном запуске часть попадет в архив еще раз (у копий
+    одинаковый id, search_archives возвращает одну). Возвращает
+    количество перенесенных записей.
+    """
+    root = root or settings.ACTION_LOG_ARCHIVE_DIR
+    os.makedirs(root, exist_ok=True)
+    _recover(root)
+    moved = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(LogModel
+                         .objects
+                         .filter(date__lt=before, pk__gt=last_id)
+                         .order_by('pk')
+                         .values(*ARCHIVE_FIELDS)[:chunk_size])
+            if not chunk:
+                return moved
+            months = {}
+            for values in chunk:
+                date = values['date'].astimezone(datetime.timezone.utc)
+                months.setdefault((date.year, date.month),
+                                  []).append(_record(values))
+            for month, lines in sorted(months.items()):
+                _append(root, month, lines)
+            last_id = chunk[-1]['id']
+            LogModel.objects.filter(pk__in=[values['id']
+                                            for values in chunk]).delete()
+        moved += len(chunk)
+
+
+def archive_old_entries(days=None, root=None, chunk_size=1000):
+    """
+    Перенос в архив записей старше days дней
+    (по умолчанию ACTION_LOG_RETENTION_DAYS).
+    """
+    if days is None:
+        days = settings.ACTION_LOG_RETENTION_DAYS
+    before = timezone.now() - datetime.timedelta(days=days)
+    return archive_entries(before, root, chunk_size)
+
+
+def _read_lines(path):
+    # строки без перевода строки и обрыв файла - следы недописанного
+    # члена, остальные строки файла читаются
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        try:
+            for line in archive:
+                if line.endswith('\n'):
+                    yield line
+        except EOFError:
+            pass
+
+
+def search_archives(query=None, table_name=None, action=None,
+                    object_entry_id=None, since=None, until=None,
+                    root=None):
+    """
+    Поиск записей в архивах: генератор словарей записей
+    в порядке месяцев архивов.
+
+    query ищется без учета регистра в поле data (как search_fields
+    в админке), since и until - границы даты (aware datetime).
+    Файлы читаются построчно; в памяти хранятся текущая строка
+    и id найденных записей текущего файла: повторные копии записи
+    (они всегда в одном файле) пропускаются. Недописанный член
+    в конце файла (сбой до завершения archive_entries) пропускается.
+    """
+    needle = query.casefold() if query else None
+    # по сырой строке можно отсеивать, только если JSON не меняет запрос
+    prefilter = (needle
+                 and json.dumps(needle, ensure_ascii=False)[1:-1] == needle)
+    since_utc = since.astimezone(datetime.timezone.utc) if since else None
+    until_utc = until.astimezone(datetime.timezone.utc) if until else None
+    for path in archive_files(root, since_utc, until_utc):
+        seen = set()
+        for line in _read_lines(path):
+            # быстрая проверка по строке до разбора JSON
+            if prefilter and needle not in line.casefold():
+                continue
+            record = json.loads(line)
+            if needle and needle not in record['data'].casefold():
+                continue
+            if table_name and record['table_name'] != table_name:
+                continue
+            if action and record['action'] != action:
+                continue
+            if (object_entry_id is not None
+                    and record['object_entry_id'] != object_entry_id):
+                continue
+            if since_utc or until_utc:
+                date = datetime.datetime.fromisoformat(record['date'])
+                if since_utc and date < since_utc:
+                    continue
+                if until_utc and date >= until_utc:
+                    continue
+            if record['id'] in seen:
+                continue
+            seen.add(record['id'])
+            yield record
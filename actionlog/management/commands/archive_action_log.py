@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from actionlog.archive import archive_old_entries
+
+
+class Command(BaseCommand):
+    help = ('Moves action log entries older than the retention period '
+            'into monthly gzip NDJSON archives')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Retention period in days '
+                                 '(default: ACTION_LOG_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Entries archived and deleted per '
+                                 'transaction')
+        parser.add_argument('--archive-dir',
+                            help='Archive directory '
+                                 '(default: ACTION_LOG_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        moved = archive_old_entries(options['days'], options['archive_dir'],
+                                    options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'OK - {moved} entries archived'))
@@ -0,0 +1,47 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from actionlog.archive import search_archives
+
+
+def parse_date(value):
+    try:
+        date = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Command(BaseCommand):
+    help = ('Searches archived action log entries and prints matches '
+            'as NDJSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('query', nargs='?',
+                            help='Text to find in the object description')
+        parser.add_argument('--table', help='Object type (table_name)')
+        parser.add_argument('--action')
+        parser.add_argument('--object', type=int, help='Object id')
+        parser.add_argument('--since', type=parse_date,
+                            help='ISO date or datetime, inclusive')
+        parser.add_argument('--until', type=parse_date,
+                            help='ISO date or datetime, exclusive')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--archive-dir',
+                            help='Archive directory '
+                                 '(default: ACTION_LOG_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        records = search_archives(options['query'], options['table'],
+                                  options['action'], options['object'],
+                                  options['since'], options['until'],
+                                  options['archive_dir'])
+        for count, record in enumerate(records, 1):
+            self.stdout.write(json.dumps(record, ensure_ascii=False))
+            if count == options['limit']:
+                break
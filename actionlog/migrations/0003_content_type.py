@@ -0,0 +1,55 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# модели, действия с которыми записываются в историю
+LOGGED_MODELS = (('shipment', 'Shipment'), ('cargo', 'Cargo'),
+                 ('customer', 'Customer'), ('supplier', 'Supplier'))
+
+
+def fill_content_types(apps, schema_editor):
+    # в table_name записано название модели (verbose_name)
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    LogModel = apps.get_model('actionlog', 'LogModel')
+    for app_label, model_name in LOGGED_MODELS:
+        model = apps.get_model(app_label, model_name)
+        content_type, created = ContentType.objects.get_or_create(
+            app_label=app_label, model=model._meta.model_name)
+        (LogModel
+         .objects
+         .filter(table_name=str(model._meta.verbose_name))
+         .update(content_type=content_type))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('actionlog', '0002_auto_20200305_1930'),
+        ('cargo', '0003_document_totals'),
+        ('customer', '0002_priority'),
+        ('shipment', '0004_confirmation_token'),
+        ('supplier', '0002_auto_20200307_1715'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logmodel',
+            name='content_type',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='contenttypes.ContentType', verbose_name='Модель объекта'),
+        ),
+        migrations.RunPython(fill_content_types, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='logmodel',
+            index=models.Index(fields=['content_type', 'object_entry_id', 'date'], name='actionlog_object_history'),
+        ),
+        migrations.AddIndex(
+            model_name='logmodel',
+            index=models.Index(fields=['content_type', 'date'], name='actionlog_type_date'),
+        ),
+        migrations.AddIndex(
+            model_name='logmodel',
+            index=models.Index(fields=['action', 'date'], name='actionlog_action_date'),
+        ),
+    ]
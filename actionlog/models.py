@@ -1,3 +1,4 @@
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.utils.translation import gettext as _
 
@@ -6,8 +7,21 @@ class LogModel(models.Model):
     class Meta:
         verbose_name = _('Действие')
         verbose_name_plural = _('История действий')
+        indexes = [
+            # история одного объекта
+            models.Index(fields=['content_type', 'object_entry_id', 'date'],
+                         name='actionlog_object_history'),
+            # действия с объектами одного типа по дням
+            models.Index(fields=['content_type', 'date'],
+                         name='actionlog_type_date'),
+            models.Index(fields=['action', 'date'],
+                         name='actionlog_action_date'),
+        ]
     table_name = models.CharField(max_length=132, null=False, blank=True,
                                   verbose_name=_('Тип объекта'))
+    content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT,
+                                     null=True, editable=False,
+                                     verbose_name=_('Модель объекта'))
     data = models.TextField(null=False, blank=True,
                             verbose_name=_('Объект'))
     action = models.CharField(max_length=16, null=False, blank=True,
@@ -19,3 +33,24 @@ class LogModel(models.Model):
 
     def __str__(self):
         return _('действие - ') + self.action
+
+
+def log_entry(instance, action):
+    """
+    Несохраненная запись истории о действии над объектом.
+    """
+    # ContentType кэшируется менеджером, запроса нет
+    return LogModel(table_name=instance._meta.verbose_name,
+                    content_type=ContentType.objects.get_for_model(instance),
+                    data=str(instance), action=action,
+                    object_entry_id=instance.pk)
+
+
+def log_actions(instances, action):
+    """
+    Запись в историю одного действия над несколькими объектами
+    одним запросом (для изменений через QuerySet.update,
+    которые не отправляют сигналы).
+    """
+    return LogModel.objects.bulk_create(log_entry(instance, action)
+                                        for instance in instances)
@@ -1,3 +1,4 @@
+from django.core.signals import request_finished
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
@@ -5,7 +6,8 @@ from cargo.models import Cargo
 from customer.models import Customer
 from supplier.models import Supplier
 from shipment.models import Shipment
-from .models import LogModel
+from .models import log_entry
+from .writer import action_log
 
 from django.utils.translation import gettext as _
 
@@ -15,13 +17,17 @@ from django.utils.translation import gettext as _
 @receiver([post_save, post_delete], sender=Supplier)
 @receiver([post_save, post_delete], sender=Cargo)
 def save_del_data(sender, instance, created=None, **kwargs):
-    table_name = instance.__class__._meta.verbose_name
-    log = LogModel(table_name=table_name, data=str(instance),
-                   object_entry_id=instance.pk)
     if created:
-        log.action = _('Создание')
+        action = _('Создание')
     elif created == False:
-        log.action = _('Редактирование')
+        action = _('Редактирование')
     else:
-        log.action = _('Удаление')
-    log.save()
+        action = _('Удаление')
+    # запись добавляется при фиксации транзакции вместе с остальными
+    action_log.add(log_entry(instance, action))
+
+
+@receiver(request_finished)
+def flush_action_log(sender, **kwargs):
+    # записи, не записанные после фиксации (см. ActionLogWriter)
+    action_log.flush()
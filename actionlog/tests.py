@@ -1,3 +1,89 @@
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+
 from django.test import TestCase
+from django.utils import timezone
+
+from .archive import _record, archive_entries, archive_path, search_archives
+from .models import LogModel
+
+
+class ArchiveTest(TestCase):
+    """
+    Перенос истории действий в архивы и поиск в архивах
+    (actionlog.archive).
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.date = datetime.datetime(2020, 1, 15,
+                                      tzinfo=datetime.timezone.utc)
+        self.path = archive_path(2020, 1, root=self.root)
+
+    def add_entries(self, count):
+        LogModel.objects.bulk_create(
+            LogModel(table_name='Товар', data=f'товар {i}',
+                     action='создание', object_entry_id=i)
+            for i in range(count))
+        LogModel.objects.update(date=self.date)
+
+    def archive(self):
+        return archive_entries(timezone.now(), root=self.root, chunk_size=2)
+
+    def search(self):
+        return [record['id'] for record in search_archives(root=self.root)]
+
+    def member(self, ids):
+        lines = [_record(values) for values in (LogModel
+                                                .objects
+                                                .filter(pk__in=ids)
+                                                .order_by('pk')
+                                                .values('id', 'table_name',
+                                                        'content_type',
+                                                        'data', 'action',
+                                                        'date',
+                                                        'object_entry_id'))]
+        return gzip.compress(''.join(lines).encode('utf-8'))
+
+    def test_archive_and_search(self):
+        self.add_entries(5)
+        ids = list(LogModel.objects.order_by('pk').values_list('pk',
+                                                               flat=True))
+        self.assertEqual(self.archive(), 5)
+        self.assertFalse(LogModel.objects.exists())
+        self.assertEqual(self.search(), ids)
+        self.assertEqual(os.listdir(self.root), [os.path.basename(self.path)])
+
+    def test_repeated_chunk_is_returned_once(self):
+        # сбой между записью части в архив и удалением из таблицы
+        self.add_entries(3)
+        ids = list(LogModel.objects.order_by('pk').values_list('pk',
+                                                               flat=True))
+        with open(self.path, 'ab') as archive:
+            archive.write(self.member(ids[:2]))
+        self.assertEqual(self.archive(), 3)
+        self.assertEqual(self.search(), ids)
 
-# Create your tests here.
+    def test_interrupted_append_is_completed(self):
+        self.add_entries(2)
+        archived = list(LogModel.objects.values_list('pk', flat=True))
+        self.archive()
+        self.add_entries(2)
+        ids = sorted(LogModel.objects.values_list('pk', flat=True))
+        # сбой при дописывании: в архиве начало члена,
+        # готовый член сохранен в .part
+        size = os.path.getsize(self.path)
+        member = self.member(ids)
+        with open(f'{self.path}.{size}.part', 'wb') as part:
+            part.write(member)
+        with open(self.path, 'ab') as archive:
+            archive.write(member[:len(member) // 2])
+        self.assertEqual(sorted(self.search()), sorted(archived))
+        # повторный запуск дописывает член и переносит те же записи
+        self.assertEqual(self.archive(), 2)
+        self.assertEqual(sorted(self.search()), sorted(archived + ids))
+        self.assertEqual(os.listdir(self.root), [os.path.basename(self.path)])
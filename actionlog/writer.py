@@ -0,0 +1,152 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import LogModel
+
+logger = logging.getLogger(__name__)
+
+# наибольшее количество записей в одном INSERT фонового потока
+LOG_BATCH_SIZE = 500
+
+
+class ActionLogWriter:
+    """
+    Запись истории действий пакетами.
+
+    Записи, добавленные в транзакции, копятся до ее фиксации
+    и записываются одним bulk_create; записи отмененной транзакции
+    или отмененной точки сохранения (savepoint) отбрасываются вместе
+    с ее callback-функциями on_commit. Вне транзакции запись
+    сохраняется сразу.
+
+    В асинхронном режиме зафиксированные записи передаются в очередь
+    ограниченного размера и записываются фоновым потоком; если очередь
+    заполнена, записи сохраняются в текущем потоке, а оставшиеся
+    в очереди записи сохраняются при завершении процесса.
+    """
+
+    def __init__(self, async_mode=False, queue_size=10000,
+                 using=DEFAULT_DB_ALIAS):
+        self.async_mode = async_mode
+        self.using = using
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def _ready(self):
+        ready = getattr(self._local, 'ready', None)
+        if ready is None:
+            ready = self._local.ready = []
+        return ready
+
+    def add(self, entry):
+        """
+        Добавить несохраненную запись LogModel.
+        """
+        connection = transaction.get_connection(self.using)
+        if not connection.in_atomic_block:
+            # вместе с записями, оставшимися от прошлых транзакций
+            self._ready.append(entry)
+            self.flush()
+            return
+        # callback-функции отбрасываются Django при откате точки
+        # сохранения, в которой запись добавлена, и выполняются
+        # после фиксации в порядке добавления: запись пакета
+        # выполняет callback последней добавленной записи
+        generation = self._local.generation = (
+            getattr(self._local, 'generation', 0) + 1)
+        ready = self._ready
+        transaction.on_commit(lambda: ready.append(entry), using=self.using)
+        transaction.on_commit(lambda: self._flush_last(generation),
+                              using=self.using)
+
+    def _flush_last(self, generation):
+        # если последняя запись отменена откатом точки сохранения,
+        # остальные записываются при следующей записи вне транзакции
+        # или в конце запроса (flush_action_log)
+        if generation == self._local.generation:
+            self.flush()
+
+    def flush(self):
+        ready = self._ready
+        if not ready:
+            return
+        entries = list(ready)
+        ready.clear()
+        if self.async_mode:
+            self._enqueue(entries)
+        else:
+            self._write(entries)
+
+    def _write(self, entries):
+        LogModel.objects.using(self.using).bulk_create(entries)
+
+    def _enqueue(self, entries):
+        self._start_thread()
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                # очередь заполнена: остаток записывается сразу
+                self._write(entries[index:])
+                return
+
+    def _start_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='action-log-writer',
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.drain)
+
+    def _take_batch(self, block=True):
+        entries = []
+        try:
+            entries.append(self._queue.get(block=block))
+            while len(entries) < LOG_BATCH_SIZE:
+                entries.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return entries
+
+    def _write_batch(self, entries):
+        try:
+            self._write(entries)
+        except Exception:
+            logger.exception('Failed to write %d action log entries',
+                             len(entries))
+        finally:
+            for entry in entries:
+                self._queue.task_done()
+
+    def _run(self):
+        try:
+            while True:
+                self._write_batch(self._take_batch())
+        finally:
+            connections[self.using].close()
+
+    def drain(self):
+        """
+        Записать все записи очереди в текущем потоке.
+        """
+        while True:
+            entries = self._take_batch(block=False)
+            if not entries:
+                return
+            self._write_batch(entries)
+
+
+action_log = ActionLogWriter(async_mode=settings.ACTION_LOG_ASYNC,
+                             queue_size=settings.ACTION_LOG_QUEUE_SIZE)
@@ -1,5 +1,13 @@
 #!/bin/sh
 source venv/bin/activate
+if [ "$1" = "outbox" ]; then
+  # отправка писем из очереди - отдельный контейнер с --restart always
+  # (install.sh); база создается контейнером web
+  until [ -f "database/warehouse.db" ]; do
+    sleep 1
+  done
+  exec python manage.py deliver_outbox
+fi
 if [ ! -f "database/warehouse.db" ]; then
   python manage.py migrate
   python manage.py collectstatic --no-input
@@ -1,10 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.translation import gettext as _
 
 from .forms import CargoForm
 from warehouse.forms import StockFormM2M
 
 from .models import Cargo
+from .receipt import ReceiptConflict, receive_cargos
+from common.filters import LineCountFilter, TotalFilter
 from common.models import CargoStock
 
 
@@ -22,18 +24,52 @@ class CargoAdmin(admin.ModelAdmin):
         verbose_name_plural = _('Товары')
         can_delete = False
 
+        def get_queryset(self, request):
+            # товар и категория строки загружаются вместе со строками
+            return (super()
+                    .get_queryset(request)
+                    .select_related('stock__category'))
+
     form = CargoForm
     # поля для отображения в списке поставок
-    list_display = ('supplier', 'date', 'status',)
+    list_display = ('supplier', 'date', 'status', 'total', 'line_count',)
     # поля для фильтрации
-    list_filter = ('date', 'supplier', 'status',)
+    list_filter = ('date', 'supplier', 'status', TotalFilter,
+                   LineCountFilter,)
     # поля для текстового поиска
     search_fields = ['supplier__organization', ]
     fieldsets = ((_('ИНФОРМАЦИЯ О ПОСТАВКЕ'),
                   {'fields': ('cargo_id', 'cargo_supplier',
                               'cargo_status', 'cargo_date',
-                              'number', 'total')}),)
+                              'number', 'cargo_total')}),)
     inlines = [StockInline, ]
+    actions = ['receive_selected', ]
+
+    def receive_selected(self, request, queryset):
+        try:
+            result = receive_cargos(queryset.values_list('pk', flat=True))
+        except ReceiptConflict:
+            self.message_user(request,
+                              _('Статусы поставок изменились во время '
+                                'приемки, повторите действие'),
+                              messages.ERROR)
+            return
+        self.message_user(request,
+                          _('Принято поставок: %(cargos)d, позиций: '
+                            '%(lines)d, товаров: %(stocks)d, '
+                            'единиц товара: %(units)d')
+                          % {'cargos': len(result.received),
+                             'lines': result.lines,
+                             'stocks': len(result.deltas),
+                             'units': sum(result.deltas.values())},
+                          messages.SUCCESS if result.received
+                          else messages.WARNING)
+        if result.skipped:
+            self.message_user(request,
+                              _('Пропущены поставки не в пути: %(ids)s')
+                              % {'ids': ', '.join(map(str, result.skipped))},
+                              messages.WARNING)
+    receive_selected.short_description = _('Принять выбранные поставки')
 
     def has_add_permission(self, request):
         return False
@@ -51,9 +87,10 @@ class CargoAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         if '_confirm' in request.POST and obj.status == Cargo.IN_TRANSIT:
-            cargo_stocks = CargoStock.objects.filter(cargo=obj)
-            for cs in cargo_stocks:
-                cs.stock.number += cs.number
-                cs.stock.save()
+            # запись в историю добавит сохранение поставки
+            result = receive_cargos([obj.pk], log=False)
+            if not result.received:
+                # поставку уже принял другой кладовщик
+                messages.warning(request, _('Поставка уже принята'))
             obj.status = Cargo.DONE
         super().save_model(request, obj, form, change)
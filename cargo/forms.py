@@ -2,8 +2,9 @@ from django import forms
 
 from django.utils.translation import gettext as _
 
-from .models import Cargo, get_cargo_total
+from .models import Cargo
 from common.models import format_date
+from warehouse.catalog import get_stock_catalog
 
 
 class CargoNewForm(forms.ModelForm):
@@ -16,6 +17,102 @@ class CargoNewForm(forms.ModelForm):
         fields = ('supplier', )
 
 
+# наибольшее количество строк в списке товаров поставки
+CARGO_LINES_LIMIT = 10000
+# разделители наименования и количества в строке списка
+LINE_SEPARATORS = ('\t', ';', ',')
+
+
+def parse_cargo_lines(text):
+    """
+    Строки списка товаров "наименование<разделитель>количество"
+    (разделитель - табуляция, точка с запятой или запятая, как при
+    вставке из таблицы или в CSV-файле).
+
+    Возвращает пару (словарь {наименование: количество},
+    список ошибок); количество одного товара в нескольких строках
+    складывается. Пустые строки и заголовок (первая непустая строка
+    без числа в количестве) пропускаются.
+    """
+    items, errors = {}, []
+    first = True
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        header, first = first, False
+        for separator in LINE_SEPARATORS:
+            if separator in line:
+                name, number = line.rsplit(separator, 1)
+                break
+        else:
+            errors.append(_('Строка %(line)d: нет количества')
+                          % {'line': line_num})
+            continue
+        name, number = name.strip().strip('"'), number.strip().strip('"')
+        try:
+            number = int(number)
+        except ValueError:
+            if not header:
+                errors.append(_('Строка %(line)d: неверное количество')
+                              % {'line': line_num})
+            continue
+        if number < 1:
+            errors.append(_('Строка %(line)d: неверное количество')
+                          % {'line': line_num})
+            continue
+        items[name] = items.get(name, 0) + number
+    return items, errors
+
+
+class CargoLinesForm(forms.Form):
+    """
+    Список товаров поставки, вставленный из таблицы или загруженный
+    файлом: для поставок, в которых больше позиций, чем в форме.
+    """
+    lines = forms.CharField(required=False, label=_('Список товаров'),
+                            widget=forms.Textarea(attrs={'rows': '6',
+                                                         'cols': '60'}))
+    lines_file = forms.FileField(required=False, label=_('Файл со списком'))
+
+    def __init__(self, *args, catalog=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog = catalog or get_stock_catalog()
+
+    def has_lines(self):
+        return bool(self.data.get('lines', '').strip()
+                    or self.files.get('lines_file'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # поле и файл разбираются отдельно: у каждого свой заголовок
+        # и своя нумерация строк
+        items, errors = parse_cargo_lines(cleaned_data.get('lines') or '')
+        upload = cleaned_data.get('lines_file')
+        if upload:
+            try:
+                text = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise forms.ValidationError(_('Файл должен быть '
+                                              'в кодировке UTF-8'))
+            file_items, file_errors = parse_cargo_lines(text)
+            for name, number in file_items.items():
+                items[name] = items.get(name, 0) + number
+            errors.extend(_('Файл %(file)s: %(error)s')
+                          % {'file': upload.name, 'error': error}
+                          for error in file_errors)
+        unknown = [name for name in items if name not in self.catalog.names]
+        errors.extend(_('Товар "%(name)s" не найден') % {'name': name}
+                      for name in unknown[:20])
+        if len(items) > CARGO_LINES_LIMIT:
+            errors.append(_('Не больше %(limit)d позиций в поставке')
+                          % {'limit': CARGO_LINES_LIMIT})
+        if errors:
+            raise forms.ValidationError(errors[:20])
+        cleaned_data['items'] = items
+        return cleaned_data
+
+
 class CargoForm(forms.ModelForm):
     """
     Форма поставки для интерфейса кладовщика.
@@ -29,7 +126,7 @@ class CargoForm(forms.ModelForm):
     cargo_status = forms.CharField(label=_('Статус поставки'))
     cargo_date = forms.CharField(label=_('Дата поставки'))
     number = forms.CharField(label=_('Количество позиций'))
-    total = forms.CharField(label=_('Сумма поставки'))
+    cargo_total = forms.CharField(label=_('Сумма поставки'))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -39,8 +136,7 @@ class CargoForm(forms.ModelForm):
                 value.widget = forms.TextInput({'size': '35',
                                                 'readonly': 'readonly'})
                 value.required = False
-            number = current_cargo.cargostock_set.count()
-            total = get_cargo_total(current_cargo)
+            number, total = current_cargo.line_count, current_cargo.total
             supplier = current_cargo.supplier.organization
             date = current_cargo.date
             self.fields['cargo_id'].initial = current_cargo.id
@@ -48,4 +144,4 @@ class CargoForm(forms.ModelForm):
             self.fields['cargo_date'].initial = format_date(date)
             self.fields['cargo_supplier'].initial = supplier
             self.fields['number'].initial = number
-            self.fields['total'].initial = total
+            self.fields['cargo_total'].initial = total
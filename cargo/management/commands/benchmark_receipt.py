@@ -0,0 +1,109 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from cargo.models import Cargo
+from cargo.receipt import receive_cargos
+from category.models import Category
+from common.models import CargoStock
+from common.versions import bump_version
+from supplier.models import Supplier
+from warehouse.catalog import CATALOG_VERSION
+from warehouse.models import Stock
+
+
+def legacy_receive(cargo_ids):
+    # прежняя приемка: каждая строка сохраняет товар целиком
+    for cargo in Cargo.objects.filter(pk__in=cargo_ids):
+        for line in CargoStock.objects.filter(cargo=cargo):
+            line.stock.number += line.number
+            line.stock.save()
+        cargo.status = Cargo.DONE
+        cargo.save()
+    return len(cargo_ids)
+
+
+def single_receive(cargo_ids):
+    # приемка каждой поставки из формы поставки
+    for cargo in Cargo.objects.filter(pk__in=cargo_ids):
+        receive_cargos([cargo.pk], log=False)
+        cargo.status = Cargo.DONE
+        cargo.save()
+    return len(cargo_ids)
+
+
+def bulk_receive(cargo_ids):
+    return len(receive_cargos(cargo_ids).received)
+
+
+class Command(BaseCommand):
+    help = ('Measures cargos/sec of receiving cargos line by line, '
+            'one by one and with the bulk receive action '
+            '(all changes are rolled back)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cargos', type=int, default=500)
+        parser.add_argument('--lines', type=int, default=50,
+                            help='lines per cargo')
+        parser.add_argument('--stocks', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cargo_ids = self.fill(options['cargos'], options['lines'],
+                                  options['stocks'])
+            self.stdout.write(f'{len(cargo_ids)} cargos, '
+                              f'{options["lines"]} lines each')
+            for title, receive in (('line by line (before)', legacy_receive),
+                                   ('one by one', single_receive),
+                                   ('bulk action', bulk_receive)):
+                with transaction.atomic():
+                    elapsed, count, received = self.measure(receive,
+                                                            cargo_ids)
+                    self.stdout.write(
+                        f'  {title:22} {received:5} received '
+                        f'{count:7} queries {elapsed:8.2f} s '
+                        f'{received / elapsed:10.1f} cargos/sec')
+                    transaction.set_rollback(True)
+            transaction.set_rollback(True)
+
+    def fill(self, cargos, lines, stocks):
+        category = Category.objects.create(name='benchmark-receipt')
+        supplier = Supplier.objects.create(organization='benchmark-receipt',
+                                           address='-', phone_number='0',
+                                           email='benchmark@example.com',
+                                           legal_details='-')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        Stock.objects.bulk_create(
+            Stock(article=start + i, name=f'benchmark-receipt {i}',
+                  price=i % 100 + 1, number=0, category=category)
+            for i in range(stocks))
+        # bulk_create не отправляет сигналы товара
+        bump_version(CATALOG_VERSION)
+        stock_ids = list(Stock.objects.filter(category=category)
+                         .values_list('pk', flat=True))
+        Cargo.objects.bulk_create(Cargo(supplier=supplier)
+                                  for i in range(cargos))
+        cargo_ids = list(Cargo.objects.filter(supplier=supplier)
+                         .order_by('pk').values_list('pk', flat=True))
+        CargoStock.objects.bulk_create(
+            CargoStock(cargo_id=pk,
+                       stock_id=stock_ids[(i * lines + j) % stocks],
+                       number=j % 10 + 1)
+            for i, pk in enumerate(cargo_ids) for j in range(lines))
+        return cargo_ids
+
+    def measure(self, receive, cargo_ids):
+        count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            received = receive(cargo_ids)
+            elapsed = time.perf_counter() - started
+        return elapsed, count, received
@@ -0,0 +1,40 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+def fill_cargo_totals(apps, schema_editor):
+    Cargo = apps.get_model('cargo', 'Cargo')
+    CargoStock = apps.get_model('common', 'CargoStock')
+    totals = {}
+    for cargo_id, price, number in CargoStock.objects.values_list(
+            'cargo_id', 'stock__price', 'number'):
+        total, count = totals.get(cargo_id, (0, 0))
+        totals[cargo_id] = (total + price * number, count + 1)
+    Cargo.objects.bulk_update(
+        (Cargo(pk=pk, total=total, line_count=count)
+         for pk, (total, count) in totals.items()),
+        ('total', 'line_count'), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargo', '0002_auto_20200301_1804'),
+        ('common', '0004_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargo',
+            name='line_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Количество позиций'),
+        ),
+        migrations.AddField(
+            model_name='cargo',
+            name='total',
+            field=models.FloatField(db_index=True, default=0, verbose_name='Сумма поставки'),
+        ),
+        migrations.RunPython(fill_cargo_totals,
+                             migrations.RunPython.noop),
+    ]
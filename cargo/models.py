@@ -5,11 +5,6 @@ from django.utils.translation import gettext as _
 from common.models import format_date
 
 
-def get_cargo_total(obj):
-    return sum([row.stock.price * row.number
-                for row in obj.cargostock_set.all()])
-
-
 class Cargo(models.Model):
     """
     Таблица поставок.
@@ -32,6 +27,12 @@ class Cargo(models.Model):
     stocks = models.ManyToManyField('warehouse.Stock',
                                     through='common.CargoStock',
                                     verbose_name=_('Товары'))
+    # сумма и количество строк поставки, обновляются вместе со строками
+    # (common.documents)
+    total = models.FloatField(default=0, db_index=True,
+                              verbose_name=_('Сумма поставки'))
+    line_count = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name=_('Количество позиций'))
 
     def __str__(self):
         return (str(self.pk) + ', ' + str(self.supplier) + ', '
@@ -0,0 +1,28 @@
+from django.db import transaction
+
+from common.documents import refresh_cargo_totals
+from common.models import CargoStock
+from warehouse.models import Stock
+
+
+def create_cargo(cargo, items):
+    """
+    Создание поставки со строками в одной транзакции.
+
+    cargo - несохраненная поставка, items - словарь
+    {наименование товара: количество}. Товары находятся одним
+    запросом, строки записываются одним bulk_create; неизвестное
+    наименование - KeyError, и ничего не записывается.
+    """
+    with transaction.atomic():
+        stocks = Stock.objects.in_bulk(list(items), field_name='name')
+        missing = [name for name in items if name not in stocks]
+        if missing:
+            raise KeyError(missing[0])
+        cargo.save()
+        CargoStock.objects.bulk_create(
+            CargoStock(cargo=cargo, stock=stocks[name], number=number)
+            for name, number in items.items())
+        # bulk_create не отправляет сигналы строк
+        refresh_cargo_totals([cargo.pk])
+    return cargo
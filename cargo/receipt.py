@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from actionlog.models import log_actions
+from common.models import CargoStock
+from warehouse.models import StockMovement
+from warehouse.services import change_stock
+
+from .models import Cargo
+
+# повторы, если статусы поставок изменились во время приемки
+RECEIPT_ATTEMPTS = 3
+
+
+class ReceiptResult:
+    """
+    Результат приемки поставок.
+
+    received - id принятых поставок, skipped - id поставок,
+    которые уже приняты (или не найдены), deltas - {id товара:
+    поступившее количество}, lines - количество строк поставок.
+    """
+
+    def __init__(self, received=(), skipped=(), deltas=None, lines=0):
+        self.received = list(received)
+        self.skipped = list(skipped)
+        self.deltas = deltas or {}
+        self.lines = lines
+
+
+class ReceiptConflict(Exception):
+    """
+    Статусы поставок менялись параллельно во всех попытках приемки.
+    """
+
+
+def _receive(cargo_ids, log):
+    cargo_ids = set(cargo_ids)
+    received = list(Cargo
+                    .objects
+                    .filter(pk__in=cargo_ids, status=Cargo.IN_TRANSIT)
+                    .order_by('pk')
+                    .values_list('pk', flat=True))
+    skipped = sorted(cargo_ids.difference(received))
+    if not received:
+        return ReceiptResult(received, skipped)
+    # условный UPDATE: поставку, которую уже принял другой
+    # кладовщик, нельзя принять второй раз
+    changed = (Cargo
+               .objects
+               .filter(pk__in=received, status=Cargo.IN_TRANSIT)
+               .update(status=Cargo.DONE))
+    if changed != len(received):
+        raise ReceiptConflict()
+    deltas = {}
+    movements = []
+    for cargo_id, stock_id, number in (CargoStock
+                                       .objects
+                                       .filter(cargo__in=received)
+                                       .values_list('cargo_id', 'stock_id',
+                                                    'number')):
+        deltas[stock_id] = deltas.get(stock_id, 0) + number
+        movements.append((stock_id, number, cargo_id, None))
+    change_stock(deltas, StockMovement.RECEIPT, movements=movements)
+    if log:
+        log_actions(Cargo
+                    .objects
+                    .filter(pk__in=received)
+                    .select_related('supplier'),
+                    _('Редактирование'))
+    return ReceiptResult(received, skipped, deltas, len(movements))
+
+
+def receive_cargos(cargo_ids, log=True):
+    """
+    Приемка поставок в одной транзакции.
+
+    Статусы поставок меняются одним условным UPDATE, количество
+    товаров всех строк складывается по товарам и добавляется общими
+    запросами UPDATE (change_stock). Поставки не в пути пропускаются.
+
+    Записи истории действий о принятых поставках добавляются одним
+    запросом (log=False - если поставка сохраняется вызывающим кодом
+    и запись добавит сигнал).
+    """
+    for attempt in range(RECEIPT_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _receive(cargo_ids, log)
+        except ReceiptConflict:
+            if attempt == RECEIPT_ATTEMPTS - 1:
+                raise
@@ -6,10 +6,9 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 from django.shortcuts import render, redirect
 
-from warehouse.models import Stock
-from warehouse.forms import StockForm
-from common.models import CargoStock
-from .forms import CargoNewForm
+from warehouse.forms import BaseCatalogFormSet, StockForm
+from .forms import CargoLinesForm, CargoNewForm
+from .orders import create_cargo
 
 
 # не кэшируем страницу для нормальной работы кода jQuery
@@ -22,34 +21,51 @@ class CargoFormsetsView(View):
     в одной форме.
     """
     stock_formset = forms.formset_factory(form=StockForm,
+                                          formset=BaseCatalogFormSet,
                                           max_num=50,
                                           min_num=1,
                                           extra=0)
+    # набор форм без обязательной строки, если товары переданы списком
+    stock_formset_optional = forms.formset_factory(form=StockForm,
+                                                   formset=BaseCatalogFormSet,
+                                                   max_num=50,
+                                                   min_num=0,
+                                                   extra=0)
     template = 'cargo/cargo_formsets.html'
 
     def post(self, request):
         form = CargoNewForm(request.POST)
-        formset = self.stock_formset(request.POST)
-        context = {'form': form, 'formset': formset}
-        if form.is_valid() and formset.is_valid() and formset.cleaned_data:
-            instance = form.save()
-            stocks = {}
+        lines_form = CargoLinesForm(request.POST, request.FILES)
+        # со списком товаров строки формы можно не заполнять
+        formset_class = (self.stock_formset_optional
+                         if lines_form.has_lines()
+                         else self.stock_formset)
+        formset = formset_class(request.POST)
+        context = {'form': form, 'formset': formset,
+                   'lines_form': lines_form}
+        if (form.is_valid() and formset.is_valid()
+                and lines_form.is_valid()):
+            items = dict(lines_form.cleaned_data['items'])
             for stock in formset.cleaned_data:
-                name = stock['name']
-                stocks[name] = stocks.get(name, 0) + stock['number']
-            for name, number in stocks.items():
-                stock = Stock.objects.get(name=name)
-                CargoStock.objects.create(cargo=instance,
-                                          stock=stock, number=number)
-            messages.info(request, _('Заявка отправлена'))
-            return redirect(to='mainpage:index')
-        else:
-            if not formset.cleaned_data:
+                if stock:
+                    name = stock['name']
+                    items[name] = items.get(name, 0) + stock['number']
+            if not items:
                 context['formset'] = self.stock_formset()
-            return render(request, self.template, context)
+                return render(request, self.template, context)
+            try:
+                create_cargo(form.save(commit=False), items)
+            except KeyError:
+                # товар удален после загрузки формы
+                messages.error(request, _('Товар не найден'))
+            else:
+                messages.info(request, _('Заявка отправлена'))
+                return redirect(to='mainpage:index')
+        return render(request, self.template, context)
 
     def get(self, request):
         form = CargoNewForm()
         formset = self.stock_formset()
-        context = {'form': form, 'formset': formset}
+        context = {'form': form, 'formset': formset,
+                   'lines_form': CargoLinesForm()}
         return render(request, self.template, context)
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import Category
 from mptt.admin import DraggableMPTTAdmin
-from common.models import subtotal_value
+from .tree import get_category_tree
+from common.models import CategoryTotal
 from django.utils.translation import gettext as _
 
 
@@ -18,11 +19,17 @@ class CategoryAdmin(DraggableMPTTAdmin):
     list_display_links = ('indented_title', )
     search_fields = ('name', )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('totals')
+
     def num_of_subcategory(self, obj):
-        return obj.get_children().count()
+        return len(get_category_tree().children.get(obj.pk, ()))
 
     def total_value(self, obj):
-        return subtotal_value(obj)
+        try:
+            return obj.totals.subtree_value
+        except CategoryTotal.DoesNotExist:
+            return 0
 
     num_of_subcategory.short_description = _('Количество подкатегорий')
     total_value.short_description = _('Общая стоимость')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CategoryConfig(AppConfig):
     name = 'category'
     verbose_name = 'Категория'
+
+    def ready(self):
+        import category.signals
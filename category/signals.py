@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from mptt.signals import node_moved
+
+from common.versions import bump_version
+
+from .models import Category
+from .tree import TREE_VERSION
+
+
+@receiver(node_moved, sender=Category)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_tree(sender, instance, **kwargs):
+    bump_version(TREE_VERSION)
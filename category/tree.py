@@ -0,0 +1,123 @@
+import threading
+
+from common.versions import get_version
+
+from .models import Category
+
+TREE_VERSION = 'category-tree'
+
+_tree = None
+_tree_lock = threading.Lock()
+
+
+class CategoryTree:
+    """
+    Индекс дерева категорий в памяти процесса.
+
+    Хранит родителей, детей, уровни, количество потомков и имена
+    категорий; множества id поддеревьев строятся по запросу
+    и запоминаются.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        # id категорий в порядке обхода дерева (tree_id, lft)
+        self.order = []
+        self.parent = {}
+        self.children = {}
+        self.level = {}
+        self.name = {}
+        self.descendant_count = {}
+        self._position = {}
+        self._subtrees = {}
+        self._choices = {}
+        for pk, parent_id, name, level, lft, rght in rows:
+            self._position[pk] = len(self.order)
+            self.order.append(pk)
+            self.parent[pk] = parent_id
+            self.children[pk] = []
+            self.level[pk] = level
+            self.name[pk] = name
+            self.descendant_count[pk] = (rght - lft - 1) // 2
+        for pk in self.order:
+            parent_id = self.parent[pk]
+            if parent_id in self.children:
+                self.children[parent_id].append(pk)
+
+    @classmethod
+    def load(cls, version):
+        rows = (Category
+                .objects
+                .order_by('tree_id', 'lft')
+                .values_list('pk', 'parent_id', 'name',
+                             'level', 'lft', 'rght'))
+        return cls(version, rows)
+
+    def __contains__(self, pk):
+        return pk in self._position
+
+    def subtree(self, pk, include_self=True):
+        """
+        Множество id категории pk и всех ее потомков.
+        """
+        ids = self._subtrees.get(pk)
+        if ids is None:
+            # при обходе в порядке (tree_id, lft) потомки категории
+            # идут сразу за ней
+            start = self._position[pk]
+            end = start + self.descendant_count[pk] + 1
+            ids = frozenset(self.order[start:end])
+            self._subtrees[pk] = ids
+        if include_self:
+            return ids
+        return ids - {pk}
+
+    def ancestors(self, pk, include_self=False):
+        """
+        Список id предков категории pk от корня.
+        """
+        result = [pk] if include_self else []
+        parent_id = self.parent[pk]
+        while parent_id is not None:
+            result.append(parent_id)
+            parent_id = self.parent[parent_id]
+        result.reverse()
+        return result
+
+    def path(self, pk, separator=' / '):
+        """
+        Путь категории от корня, например "Электроника / Телефоны".
+        """
+        return separator.join(self.name[i]
+                              for i in self.ancestors(pk, include_self=True))
+
+    def choices(self, level_indicator='+--'):
+        """
+        Список выбора категорий с отступом по уровню
+        (в том же виде, что у mptt.forms.TreeNodeChoiceField).
+        """
+        choices = self._choices.get(level_indicator)
+        if choices is None:
+            choices = tuple((pk, '%s %s' % (level_indicator * self.level[pk],
+                                            self.name[pk]))
+                            for pk in self.order)
+            self._choices[level_indicator] = choices
+        return choices
+
+
+def get_category_tree():
+    """
+    Индекс дерева категорий текущей версии.
+
+    Индекс перестраивается не более одного раза на каждое
+    изменение дерева в каждом процессе.
+    """
+    global _tree
+    version = get_version(TREE_VERSION)
+    tree = _tree
+    if tree is None or tree.version != version:
+        with _tree_lock:
+            if _tree is None or _tree.version != version:
+                _tree = CategoryTree.load(version)
+            tree = _tree
+    return tree
@@ -0,0 +1,32 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """
+    Очередь исходящих писем (только просмотр).
+    """
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt',
+                    'sent', 'created',)
+    list_filter = ('status',)
+    search_fields = ('subject', 'to',)
+    readonly_fields = ('subject', 'to', 'body', 'status', 'attempts',
+                       'next_attempt', 'last_error', 'created', 'sent',)
+    exclude = ('html', 'qr_link', 'claim', 'locked_until',)
+    actions = ('retry',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        count = (queryset
+                 .exclude(status=OutgoingEmail.SENT)
+                 .update(status=OutgoingEmail.PENDING, attempts=0,
+                         next_attempt=timezone.now()))
+        self.message_user(request, _('Писем поставлено в очередь: %d')
+                          % count)
+    retry.short_description = _('Отправить повторно')
@@ -0,0 +1,98 @@
+import math
+
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from cargo.models import Cargo
+from shipment.models import Shipment
+
+from .models import CargoStock, ShipmentStock
+from .reports import line_value
+
+# документ: модель строк и имя поля строки со ссылкой на документ
+DOCUMENTS = {Shipment: (ShipmentStock, 'shipment'),
+             Cargo: (CargoStock, 'cargo')}
+
+
+def _line_subquery(lines, key, aggregate):
+    return Subquery(lines
+                    .objects
+                    .filter(**{key: OuterRef('pk')})
+                    .order_by()
+                    .values(key)
+                    .annotate(result=aggregate)
+                    .values('result'))
+
+
+def refresh_document_totals(model, documents=None):
+    """
+    Пересчет суммы и количества строк документов одним запросом UPDATE.
+
+    model - Shipment или Cargo, documents - id документов или набор
+    документов (без documents пересчитываются все документы).
+    Возвращает количество обновленных документов.
+    """
+    lines, key = DOCUMENTS[model]
+    queryset = model.objects.all()
+    if documents is not None:
+        queryset = queryset.filter(pk__in=documents)
+    return queryset.update(
+        total=Coalesce(_line_subquery(lines, key, Sum(line_value())),
+                       Value(0.0), output_field=models.FloatField()),
+        line_count=Coalesce(_line_subquery(lines, key, Count('pk')),
+                            Value(0), output_field=models.IntegerField()))
+
+
+def refresh_shipment_totals(shipments=None):
+    return refresh_document_totals(Shipment, shipments)
+
+
+def refresh_cargo_totals(cargos=None):
+    return refresh_document_totals(Cargo, cargos)
+
+
+def refresh_totals_for_stocks(stock_ids):
+    """
+    Пересчет документов, в которых есть товары stock_ids
+    (после изменения цены товаров).
+    """
+    for model, (lines, key) in DOCUMENTS.items():
+        refresh_document_totals(model,
+                                lines
+                                .objects
+                                .filter(stock_id__in=stock_ids)
+                                .values(key))
+
+
+def rebuild_document_totals():
+    """
+    Полный пересчет сумм покупок и поставок по их строкам.
+    """
+    return sum(refresh_document_totals(model) for model in DOCUMENTS)
+
+
+def verify_document_totals():
+    """
+    Сверка сохраненных сумм документов с их строками.
+
+    Возвращает список расхождений (модель, id документа,
+    сохраненные (сумма, количество), ожидаемые (сумма, количество)).
+    """
+    mismatches = []
+    for model, (lines, key) in DOCUMENTS.items():
+        expected = {row[key]: (row['total'] or 0, row['count'])
+                    for row in (lines
+                                .objects
+                                .values(key)
+                                .order_by()
+                                .annotate(total=Sum(line_value()),
+                                          count=Count('pk')))}
+        for pk, total, count in model.objects.values_list('pk', 'total',
+                                                          'line_count'):
+            expected_row = expected.get(pk, (0, 0))
+            if (count != expected_row[1]
+                    or not math.isclose(total, expected_row[0],
+                                        rel_tol=1e-9, abs_tol=1e-6)):
+                mismatches.append((model, pk, (total, count), expected_row))
+    return mismatches
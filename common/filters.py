@@ -0,0 +1,58 @@
+from django.contrib.admin import SimpleListFilter
+from django.utils.translation import gettext as _
+
+
+class RangeListFilter(SimpleListFilter):
+    """
+    Фильтр по диапазонам значений поля field.
+
+    ranges - кортеж (значение параметра, подпись, нижняя граница,
+    верхняя граница); граница None - без ограничения.
+    """
+    field = None
+    ranges = ()
+
+    def lookups(self, request, model_admin):
+        return tuple((value, title) for value, title, low, high
+                     in self.ranges)
+
+    def queryset(self, request, queryset):
+        for value, title, low, high in self.ranges:
+            if self.value() == value:
+                filters = {}
+                if low is not None:
+                    filters[self.field + '__gte'] = low
+                if high is not None:
+                    filters[self.field + '__lt'] = high
+                return queryset.filter(**filters)
+        return queryset
+
+
+class TotalFilter(RangeListFilter):
+    """
+    Фильтр покупок и поставок по сумме.
+    """
+    title = _('По сумме')
+    parameter_name = 'total'
+    field = 'total'
+    ranges = (
+        ('0-1000', _('До 1 000'), None, 1000),
+        ('1000-10000', _('От 1 000 до 10 000'), 1000, 10000),
+        ('10000-100000', _('От 10 000 до 100 000'), 10000, 100000),
+        ('100000-', _('От 100 000'), 100000, None),
+    )
+
+
+class LineCountFilter(RangeListFilter):
+    """
+    Фильтр покупок и поставок по количеству позиций.
+    """
+    title = _('По количеству позиций')
+    parameter_name = 'line_count'
+    field = 'line_count'
+    ranges = (
+        ('0', _('Без позиций'), None, 1),
+        ('1', _('Одна позиция'), 1, 2),
+        ('2-10', _('От 2 до 10'), 2, 11),
+        ('11-', _('Больше 10'), 11, None),
+    )
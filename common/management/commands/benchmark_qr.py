@@ -0,0 +1,57 @@
+import io
+import time
+import uuid
+
+import qrcode
+from django.core.management.base import BaseCommand
+
+from common.qr import (_render, qr_cache, qr_pool, render_qr,
+                       render_qr_batch)
+
+
+def legacy_png(link):
+    # прежний способ: qrcode.make и сохранение изображения Pillow
+    byte_stream = io.BytesIO()
+    qrcode.make(link).get_image().save(byte_stream, 'PNG')
+    return byte_stream.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Measures QR code renders/sec per format, cached and batched'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--links', type=int, default=500)
+        parser.add_argument('--processes', type=int, default=None)
+
+    def handle(self, *args, **options):
+        links = [f'http://localhost:8888/shipment_confirmation/'
+                 f'{i}{uuid.uuid4()}/' for i in range(options['links'])]
+        self.report('legacy png', links, legacy_png)
+        with qr_pool(options['processes']) as pool:
+            self.benchmark_formats(links, pool)
+
+    def benchmark_formats(self, links, pool):
+        for qr_format in ('png', 'svg'):
+            size = len(_render(links[0], qr_format))
+            self.report(f'{qr_format} ({size} bytes)', links,
+                        lambda link: _render(link, qr_format))
+            qr_cache.clear()
+            for link in links:
+                render_qr(link, qr_format)
+            self.report(f'{qr_format} cached', links,
+                        lambda link: render_qr(link, qr_format))
+            qr_cache.clear()
+            started = time.perf_counter()
+            render_qr_batch(links, qr_format, pool)
+            self.write(f'{qr_format} batch (pool)', len(links),
+                       time.perf_counter() - started)
+            qr_cache.clear()
+
+    def report(self, title, links, render):
+        started = time.perf_counter()
+        for link in links:
+            render(link)
+        self.write(title, len(links), time.perf_counter() - started)
+
+    def write(self, title, count, elapsed):
+        self.stdout.write(f'{title:24} {count / elapsed:10.0f} renders/sec')
@@ -0,0 +1,107 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from cargo.forms import CargoForm
+from cargo.models import Cargo
+from category.models import Category
+from common import reports
+from common.documents import refresh_cargo_totals, refresh_shipment_totals
+from common.models import CargoStock, ShipmentStock
+from common.versions import bump_version
+from customer.models import Customer
+from shipment.forms import ShipmentForm
+from shipment.models import Shipment
+from supplier.models import Supplier
+from warehouse.catalog import CATALOG_VERSION
+from warehouse.models import Stock
+
+
+class Command(BaseCommand):
+    help = ('Measures query counts and timings of document totals and '
+            'sales reports for growing document sizes '
+            '(changes are rolled back)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+',
+                            default=[100, 10000],
+                            help='number of lines per document')
+
+    def handle(self, *args, **options):
+        for lines in options['lines']:
+            with transaction.atomic():
+                shipment, cargo = self.fill(lines)
+                self.stdout.write(f'{lines} lines per document')
+                for title, report in self.reports(shipment, cargo):
+                    elapsed, count = self.measure(report)
+                    self.stdout.write(f'  {title:28} {count:6} queries '
+                                      f'{elapsed * 1000:10.2f} ms')
+                transaction.set_rollback(True)
+
+    def reports(self, shipment, cargo):
+        def legacy_total():
+            # прежний подсчет суммы в Python с загрузкой товара по строке
+            return sum(row.stock.price * row.number
+                       for row in shipment.shipmentstock_set.all())
+        return (
+            ('python sum (before)', legacy_total),
+            ('shipment form', lambda: ShipmentForm(instance=shipment)),
+            ('cargo form', lambda: CargoForm(instance=cargo)),
+            ('shipment list', lambda: list(
+                Shipment.objects.order_by('-total')[:100])),
+            ('cargo list', lambda: list(
+                Cargo.objects.order_by('-total')[:100])),
+            ('stock by category', reports.stock_value_by_category),
+            ('sales by category', reports.sales_by_category),
+            ('sales by customer', reports.sales_by_customer),
+            ('sales by month', reports.sales_by_period),
+            ('purchases by supplier', reports.purchases_by_supplier),
+        )
+
+    def fill(self, lines):
+        category = Category.objects.create(name='benchmark-reports')
+        customer = Customer.objects.create(full_name='benchmark',
+                                           phone_number='0',
+                                           email='benchmark@example.com')
+        supplier = Supplier.objects.create(organization='benchmark-reports',
+                                           address='-', phone_number='0',
+                                           email='benchmark@example.com',
+                                           legal_details='-')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        Stock.objects.bulk_create(
+            Stock(article=start + i, name=f'benchmark-reports {i}',
+                  price=i % 100 + 1, number=10, category=category)
+            for i in range(lines))
+        # bulk_create не отправляет сигналы товара
+        bump_version(CATALOG_VERSION)
+        stock_ids = (Stock.objects.filter(category=category)
+                     .values_list('pk', flat=True))
+        shipment = Shipment.objects.create(customer=customer)
+        cargo = Cargo.objects.create(supplier=supplier)
+        ShipmentStock.objects.bulk_create(
+            ShipmentStock(shipment=shipment, stock_id=pk, number=2)
+            for pk in stock_ids)
+        CargoStock.objects.bulk_create(
+            CargoStock(cargo=cargo, stock_id=pk, number=3)
+            for pk in stock_ids)
+        refresh_shipment_totals([shipment.pk])
+        refresh_cargo_totals([cargo.pk])
+        shipment.refresh_from_db()
+        cargo.refresh_from_db()
+        return shipment, cargo
+
+    def measure(self, report):
+        count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            report()
+            elapsed = time.perf_counter() - started
+        return elapsed, count
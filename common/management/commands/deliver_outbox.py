@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.outbox import MAX_ATTEMPTS, OutboxDelivery
+
+
+class Command(BaseCommand):
+    help = ('Delivers queued emails over persistent mail connections, '
+            'retrying failed messages with exponential backoff')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='deliver what is due and exit')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='seconds between queue polls')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='parallel mail connections')
+        parser.add_argument('--qr-processes', type=int, default=2,
+                            help='processes rendering QR codes of a batch '
+                                 '(0 renders them in the sending threads)')
+        parser.add_argument('--max-attempts', type=int,
+                            default=MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        with OutboxDelivery(concurrency=options['concurrency'],
+                            max_attempts=options['max_attempts'],
+                            qr_processes=options['qr_processes']) as outbox:
+            while True:
+                sent, failed = outbox.deliver(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'{sent} sent, {failed} failed')
+                if sent + failed == options['batch_size']:
+                    # очередь не пуста - следующий пакет сразу
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
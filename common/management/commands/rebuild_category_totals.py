@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.models import rebuild_category_totals, verify_category_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds and verifies per-category stock value totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Only compare stored totals with stock')
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = rebuild_category_totals()
+            self.stdout.write(f'Rebuilt totals for {count} categories')
+        mismatches = verify_category_totals()
+        for pk, stored, expected in mismatches:
+            self.stderr.write(f'Category {pk}: stored {stored}, '
+                              f'expected {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} categories out of sync')
+        self.stdout.write(self.style.SUCCESS('OK - category totals in sync'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.documents import rebuild_document_totals, verify_document_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds and verifies stored shipment and cargo totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Only compare stored totals with lines')
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = rebuild_document_totals()
+            self.stdout.write(f'Rebuilt totals for {count} documents')
+        mismatches = verify_document_totals()
+        for model, pk, stored, expected in mismatches:
+            self.stderr.write(f'{model.__name__} {pk}: stored {stored}, '
+                              f'expected {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} documents out of sync')
+        self.stdout.write(self.style.SUCCESS('OK - document totals in sync'))
@@ -0,0 +1,57 @@
+# Generated by Django 3.0.8 on 2026-10-18 07:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_category_totals(apps, schema_editor):
+    Category = apps.get_model('category', 'Category')
+    CategoryTotal = apps.get_model('common', 'CategoryTotal')
+    Stock = apps.get_model('warehouse', 'Stock')
+    own = {}
+    for price, number, category_id in Stock.objects.values_list(
+            'price', 'number', 'category_id'):
+        value, count = own.get(category_id, (0, 0))
+        own[category_id] = (value + price * number, count + number)
+    nodes = list(Category.objects.order_by('tree_id', 'lft')
+                 .values_list('pk', 'parent_id'))
+    subtree = {pk: list(own.get(pk, (0, 0))) for pk, parent_id in nodes}
+    for pk, parent_id in reversed(nodes):
+        if parent_id in subtree:
+            subtree[parent_id][0] += subtree[pk][0]
+            subtree[parent_id][1] += subtree[pk][1]
+    CategoryTotal.objects.bulk_create(
+        CategoryTotal(category_id=pk,
+                      value=own.get(pk, (0, 0))[0],
+                      number=own.get(pk, (0, 0))[1],
+                      subtree_value=subtree[pk][0],
+                      subtree_number=subtree[pk][1])
+        for pk, parent_id in nodes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_auto_20200307_1715'),
+        ('common', '0002_auto_20200301_1804'),
+        ('warehouse', '0002_auto_20200307_1715'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTotal',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='totals', serialize=False, to='category.Category', verbose_name='Категория')),
+                ('value', models.FloatField(default=0, verbose_name='Стоимость товаров')),
+                ('number', models.BigIntegerField(default=0, verbose_name='Количество товаров')),
+                ('subtree_value', models.FloatField(default=0, verbose_name='Общая стоимость')),
+                ('subtree_number', models.BigIntegerField(default=0, verbose_name='Общее количество')),
+            ],
+            options={
+                'verbose_name': 'Итоги категории',
+                'verbose_name_plural': 'Итоги категорий',
+            },
+        ),
+        migrations.RunPython(fill_category_totals,
+                             migrations.RunPython.noop),
+    ]
@@ -1,29 +1,26 @@
+import math
+
 import pytz
 
-from django.db import models
+from django.db import models, transaction
+
+from django.db.models import ExpressionWrapper, F, Sum
 
 from django.conf import settings
 
+from django.utils import timezone
+
 from django.utils.translation import gettext as _
 
 from warehouse.models import Stock
 
 
-def subtotal_value(obj):
+def stock_value_expression():
     """
-    Подсчет стоимости товаров подкатегорий.
+    Выражение стоимости товара (цена * количество) для запросов.
     """
-    result = 0
-    if obj is not None:
-        values = (Stock
-                  .objects
-                  .filter(category__in=obj.get_descendants(include_self=True))
-                  .values_list('price', 'number'))
-    else:
-        values = Stock.objects.all().values_list('price', 'number')
-    for price, count in values:
-        result += price * count
-    return result
+    return ExpressionWrapper(F('price') * F('number'),
+                             output_field=models.FloatField())
 
 
 def format_date(date):
@@ -89,3 +86,261 @@ class SupplierCategory(models.Model):
 
     def __str__(self):
         return _('поставщик - ') + self.supplier.organization
+
+
+class CategoryTotal(models.Model):
+    """
+    Сводная таблица стоимости и количества товаров по категориям.
+
+    value и number относятся к товарам самой категории,
+    subtree_value и subtree_number - ко всему поддереву категории.
+    """
+    class Meta:
+        verbose_name = _('Итоги категории')
+        verbose_name_plural = _('Итоги категорий')
+
+    category = models.OneToOneField('category.Category',
+                                    on_delete=models.CASCADE,
+                                    primary_key=True,
+                                    related_name='totals',
+                                    verbose_name=_('Категория'))
+    value = models.FloatField(default=0,
+                              verbose_name=_('Стоимость товаров'))
+    number = models.BigIntegerField(default=0,
+                                    verbose_name=_('Количество товаров'))
+    subtree_value = models.FloatField(default=0,
+                                      verbose_name=_('Общая стоимость'))
+    subtree_number = models.BigIntegerField(
+        default=0, verbose_name=_('Общее количество'))
+
+    def __str__(self):
+        return _('категория - ') + str(self.category_id)
+
+
+def change_category_totals(deltas):
+    """
+    Инкрементальное обновление сводной таблицы.
+
+    deltas - словарь {id категории: (изменение стоимости,
+    изменение количества)}; изменение применяется к самой категории
+    и к поддеревьям всех ее предков.
+    """
+    from category.models import Category
+
+    deltas = {pk: delta for pk, delta in deltas.items()
+              if pk is not None and any(delta)}
+    if not deltas:
+        return
+    nodes = (Category
+             .objects
+             .filter(pk__in=deltas)
+             .values_list('pk', 'tree_id', 'lft', 'rght'))
+    with transaction.atomic():
+        for pk, tree_id, lft, rght in nodes:
+            value, number = deltas[pk]
+            (CategoryTotal
+             .objects
+             .filter(category_id=pk)
+             .update(value=F('value') + value,
+                     number=F('number') + number))
+            (CategoryTotal
+             .objects
+             .filter(category__tree_id=tree_id,
+                     category__lft__lte=lft,
+                     category__rght__gte=rght)
+             .update(subtree_value=F('subtree_value') + value,
+                     subtree_number=F('subtree_number') + number))
+
+
+def _ancestor_ids(category_id):
+    """
+    id категории и всех ее предков.
+    """
+    from category.models import Category
+
+    if category_id is None:
+        return set()
+    node = (Category
+            .objects
+            .filter(pk=category_id)
+            .values('tree_id', 'lft', 'rght')
+            .first())
+    if node is None:
+        return set()
+    return set(Category
+               .objects
+               .filter(tree_id=node['tree_id'], lft__lte=node['lft'],
+                       rght__gte=node['rght'])
+               .values_list('pk', flat=True))
+
+
+def move_category_totals(category_id, old_parent_id, new_parent_id):
+    """
+    Перенос итогов поддерева категории при смене надкатегории:
+    итоги вычитаются из поддеревьев прежних предков и добавляются
+    к поддеревьям новых (общие предки не меняются).
+    """
+    with transaction.atomic():
+        moved = (CategoryTotal
+                 .objects
+                 .filter(category_id=category_id)
+                 .values_list('subtree_value', 'subtree_number')
+                 .first())
+        if not moved or not any(moved):
+            return
+        value, number = moved
+        old = _ancestor_ids(old_parent_id)
+        new = _ancestor_ids(new_parent_id)
+        (CategoryTotal
+         .objects
+         .filter(category_id__in=old - new)
+         .update(subtree_value=F('subtree_value') - value,
+                 subtree_number=F('subtree_number') - number))
+        (CategoryTotal
+         .objects
+         .filter(category_id__in=new - old)
+         .update(subtree_value=F('subtree_value') + value,
+                 subtree_number=F('subtree_number') + number))
+
+
+def _sum_subtrees(own):
+    """
+    Подсчет итогов поддеревьев по итогам категорий own
+    ({id категории: (value, number)}).
+
+    Возвращает словарь {id категории: (value, number,
+    subtree_value, subtree_number)}.
+    """
+    from category.models import Category
+
+    nodes = list(Category
+                 .objects
+                 .order_by('tree_id', 'lft')
+                 .values_list('pk', 'parent_id'))
+    subtree = {pk: list(own.get(pk, (0, 0))) for pk, parent_id in nodes}
+    # обход в обратном порядке: потомки обрабатываются раньше предков
+    for pk, parent_id in reversed(nodes):
+        if parent_id in subtree:
+            subtree[parent_id][0] += subtree[pk][0]
+            subtree[parent_id][1] += subtree[pk][1]
+    return {pk: tuple(own.get(pk, (0, 0))) + tuple(subtree[pk])
+            for pk, parent_id in nodes}
+
+
+def _save_category_totals(totals):
+    with transaction.atomic():
+        CategoryTotal.objects.all().delete()
+        CategoryTotal.objects.bulk_create(
+            CategoryTotal(category_id=pk, value=value, number=number,
+                          subtree_value=subtree_value,
+                          subtree_number=subtree_number)
+            for pk, (value, number,
+                     subtree_value, subtree_number) in totals.items())
+
+
+def compute_category_totals():
+    """
+    Подсчет итогов всех категорий по таблице товаров.
+    """
+    own = {row['category']: (row['value'] or 0, row['number'] or 0)
+           for row in (Stock
+                       .objects
+                       .values('category')
+                       .order_by()
+                       .annotate(value=Sum(stock_value_expression()),
+                                 number=Sum('number')))}
+    return _sum_subtrees(own)
+
+
+def recompute_category_subtrees():
+    """
+    Пересчет итогов поддеревьев по уже сохраненным итогам категорий
+    (после удаления категорий).
+    """
+    with transaction.atomic():
+        own = {pk: (value, number)
+               for pk, value, number in (CategoryTotal
+                                         .objects
+                                         .values_list('category_id',
+                                                      'value', 'number'))}
+        _save_category_totals(_sum_subtrees(own))
+
+
+def rebuild_category_totals():
+    """
+    Полное перестроение сводной таблицы по таблице товаров.
+    """
+    totals = compute_category_totals()
+    _save_category_totals(totals)
+    return len(totals)
+
+
+def verify_category_totals():
+    """
+    Сверка сводной таблицы с таблицей товаров.
+
+    Возвращает список расхождений (id категории, сохраненные итоги,
+    ожидаемые итоги).
+    """
+    expected = compute_category_totals()
+    stored = {row[0]: row[1:]
+              for row in (CategoryTotal
+                          .objects
+                          .values_list('category_id', 'value', 'number',
+                                       'subtree_value', 'subtree_number'))}
+    mismatches = []
+    for pk in expected.keys() | stored.keys():
+        stored_row, expected_row = stored.get(pk), expected.get(pk)
+        if (stored_row is None or expected_row is None
+                or not all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+                           for a, b in zip(stored_row, expected_row))):
+            mismatches.append((pk, stored_row, expected_row))
+    return mismatches
+
+
+class OutgoingEmail(models.Model):
+    """
+    Очередь исходящих писем.
+
+    Письмо записывается в той же транзакции, что и изменение данных,
+    и отправляется командой deliver_outbox.
+    """
+    class Meta:
+        verbose_name = _('Исходящее письмо')
+        verbose_name_plural = _('Исходящие письма')
+        indexes = [models.Index(fields=['status', 'next_attempt'],
+                                name='outgoing_email_due')]
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    statuses = [(PENDING, _('В очереди')),
+                (SENT, _('Отправлено')),
+                (FAILED, _('Не отправлено')), ]
+
+    subject = models.CharField(max_length=255, verbose_name=_('Тема'))
+    # адреса получателей через перевод строки
+    to = models.TextField(verbose_name=_('Получатели'))
+    body = models.TextField(verbose_name=_('Текст'))
+    html = models.TextField(blank=True, verbose_name=_('HTML'))
+    # ссылка, QR-код которой прикладывается к письму при отправке
+    qr_link = models.TextField(blank=True, verbose_name=_('Ссылка QR-кода'))
+    status = models.CharField(max_length=7, choices=statuses,
+                              default=PENDING, verbose_name=_('Статус'))
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name=_('Попыток отправки'))
+    next_attempt = models.DateTimeField(default=timezone.now,
+                                        verbose_name=_('Следующая попытка'))
+    # письма, взятые процессом отправки, не берутся другими процессами
+    # до истечения locked_until
+    claim = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True,
+                                  verbose_name=_('Последняя ошибка'))
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name=_('Создано'))
+    sent = models.DateTimeField(null=True, blank=True,
+                                verbose_name=_('Отправлено'))
+
+    def __str__(self):
+        return self.subject
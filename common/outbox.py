@@ -0,0 +1,206 @@
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.encoders import encode_base64
+from email.mime.base import MIMEBase
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .qr import make_qr_png, qr_pool, render_qr_batch
+
+# количество попыток отправки письма
+MAX_ATTEMPTS = 6
+# задержка перед повтором: BACKOFF * 2 ** (номер попытки - 1),
+# но не больше MAX_BACKOFF
+BACKOFF = datetime.timedelta(seconds=30)
+MAX_BACKOFF = datetime.timedelta(hours=1)
+# время, на которое процесс отправки забирает письма
+LEASE = datetime.timedelta(minutes=5)
+
+
+def outgoing_email(subject, to, body, html='', qr_link=''):
+    return OutgoingEmail(subject=subject, to='\n'.join(to), body=body,
+                         html=html, qr_link=qr_link)
+
+
+def queue_email(subject, to, body, html='', qr_link=''):
+    """
+    Добавить письмо в очередь.
+
+    Вызывается в транзакции, изменяющей данные: если транзакция
+    отменена, письмо тоже не будет отправлено.
+    """
+    email = outgoing_email(subject, to, body, html=html, qr_link=qr_link)
+    email.save()
+    return email
+
+
+def queue_emails(emails):
+    """
+    Добавить в очередь несколько писем (outgoing_email) одним запросом.
+    """
+    return OutgoingEmail.objects.bulk_create(emails)
+
+
+def build_message(email, connection=None, qr_png=None):
+    """
+    Письмо Django для записи очереди (QR-код создается здесь
+    или передается готовым в qr_png, а не в запросе, который
+    добавил письмо в очередь).
+    """
+    attachments = []
+    if email.qr_link:
+        attachment = MIMEBase('application', 'octet-stream')
+        attachment.set_payload(qr_png or make_qr_png(email.qr_link))
+        encode_base64(attachment)
+        attachment.add_header('Content-Disposition',
+                              'attachment; filename=qr.png')
+        attachments.append(attachment)
+    message = EmailMultiAlternatives(subject=email.subject,
+                                     body=email.body,
+                                     to=email.to.split('\n'),
+                                     attachments=attachments,
+                                     connection=connection)
+    if email.html:
+        message.attach_alternative(email.html, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    return min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def claim_emails(limit):
+    """
+    Забрать до limit писем, которые пора отправлять, двумя запросами:
+    условный UPDATE с меткой процесса и выборка по метке.
+    """
+    now = timezone.now()
+    due = (OutgoingEmail
+           .objects
+           .filter(status=OutgoingEmail.PENDING, next_attempt__lte=now)
+           .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+           .order_by('next_attempt'))
+    ids = list(due.values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    claim = uuid.uuid4().hex
+    due.filter(pk__in=ids).update(claim=claim, locked_until=now + LEASE)
+    return list(OutgoingEmail.objects.filter(claim=claim).order_by('pk'))
+
+
+class OutboxDelivery:
+    """
+    Отправка писем из очереди.
+
+    Письма отправляются не более чем в concurrency потоков; у каждого
+    потока свое соединение с почтовым сервером, которое остается
+    открытым между пакетами писем. Результаты записываются в базу
+    в основном потоке.
+
+    Если qr_processes больше нуля, QR-коды пакета рисуются заранее
+    в пуле из стольких процессов, который создается один раз
+    на все время отправки; иначе - в потоках отправки.
+    """
+
+    def __init__(self, concurrency=1, max_attempts=MAX_ATTEMPTS,
+                 backend=None, qr_processes=0):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backend = backend
+        self._pool = qr_pool(qr_processes) if qr_processes else None
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection(self.backend)
+            connection.open()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _send(self, email, qr_png=None):
+        try:
+            connection = self._connection()
+            build_message(email, connection, qr_png).send()
+        except Exception as error:
+            # после ошибки соединение открывается заново
+            connection = getattr(self._local, 'connection', None)
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                self._local.connection = None
+            return email, error
+        return email, None
+
+    def deliver(self, limit=100):
+        """
+        Отправить один пакет писем; возвращает пару
+        (отправлено, не отправлено).
+        """
+        emails = claim_emails(limit)
+        if not emails:
+            return 0, 0
+        qr_codes = self._render_qr_codes(emails)
+        results = list(self._executor.map(
+            self._send, emails,
+            [qr_codes.get(email.qr_link) for email in emails]))
+        now = timezone.now()
+        sent = [email.pk for email, error in results if error is None]
+        OutgoingEmail.objects.filter(pk__in=sent).update(
+            status=OutgoingEmail.SENT, sent=now, attempts=F('attempts') + 1,
+            claim='', locked_until=None, last_error='')
+        failed = [(email, error) for email, error in results
+                  if error is not None]
+        for email, error in failed:
+            attempts = email.attempts + 1
+            status = (OutgoingEmail.FAILED
+                      if attempts >= self.max_attempts
+                      else OutgoingEmail.PENDING)
+            OutgoingEmail.objects.filter(pk=email.pk).update(
+                status=status, attempts=attempts,
+                next_attempt=now + retry_delay(attempts),
+                claim='', locked_until=None,
+                last_error=f'{type(error).__name__}: {error}')
+        return len(sent), len(failed)
+
+    def _render_qr_codes(self, emails):
+        links = [email.qr_link for email in emails if email.qr_link]
+        if self._pool is None or not links:
+            return {}
+        try:
+            return render_qr_batch(links, 'png', self._pool)
+        except Exception:
+            # ошибка записывается отдельно для каждого письма
+            # при построении QR-кода в потоке отправки
+            return {}
+
+    def close(self):
+        self._executor.shutdown()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
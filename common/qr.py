@@ -0,0 +1,172 @@
+import collections
+import io
+import multiprocessing
+import os
+import threading
+
+import qrcode
+from PIL import Image
+
+# размер модуля QR-кода в пикселях для PNG и ширина поля в модулях
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+# количество QR-кодов в кэше процесса
+QR_CACHE_SIZE = 1024
+# маска QR-кода: подбор лучшей из восьми масок (None) занимает
+# большую часть времени построения, а код читается с любой маской
+QR_MASK_PATTERN = 0
+
+FORMATS = ('png', 'svg')
+
+
+def qr_matrix(link):
+    """
+    Матрица модулей QR-кода ссылки (вместе с полем): список строк
+    из значений True (темный модуль) и False.
+    """
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M,
+                       border=QR_BORDER)
+    qr.add_data(link)
+    if QR_MASK_PATTERN is None:
+        qr.make(fit=True)
+    else:
+        qr.best_fit()
+        qr.makeImpl(False, QR_MASK_PATTERN)
+    return qr.get_matrix()
+
+
+def matrix_to_svg(matrix):
+    """
+    Компактный SVG: один path из горизонтальных отрезков
+    подряд идущих темных модулей.
+    """
+    size = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                parts.append(f'M{start} {y}h{x - start}v1h{start - x}z')
+            else:
+                x += 1
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path d="{"".join(parts)}" fill="#000"/></svg>')
+
+
+def matrix_to_png(matrix, box_size=QR_BOX_SIZE):
+    """
+    PNG с палитрой из двух цветов: изображение строится
+    по одному пикселю на модуль и масштабируется до нужного размера.
+    """
+    size = len(matrix)
+    img = Image.new('1', (size, size))
+    img.putdata([0 if dark else 1 for row in matrix for dark in row])
+    img = img.resize((size * box_size, size * box_size), Image.NEAREST)
+    byte_stream = io.BytesIO()
+    img.save(byte_stream, 'PNG')
+    return byte_stream.getvalue()
+
+
+def _render(link, qr_format):
+    matrix = qr_matrix(link)
+    if qr_format == 'svg':
+        return matrix_to_svg(matrix).encode()
+    return matrix_to_png(matrix)
+
+
+def _render_item(item):
+    return _render(*item)
+
+
+class QRCache:
+    """
+    LRU-кэш готовых QR-кодов с ключом (ссылка, формат).
+    """
+
+    def __init__(self, maxsize=QR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+qr_cache = QRCache()
+
+
+def render_qr(link, qr_format='png'):
+    """
+    QR-код ссылки в формате png или svg (байты).
+    """
+    key = (link, qr_format)
+    value = qr_cache.get(key)
+    if value is None:
+        value = _render(link, qr_format)
+        qr_cache.put(key, value)
+    return value
+
+
+def qr_pool(processes=None):
+    """
+    Пул процессов для render_qr_batch.
+
+    Процессы запускаются методом spawn: fork процесса с потоками
+    и открытыми соединениями может унаследовать захваченные блокировки.
+    Пул создается один раз и передается во все вызовы.
+    """
+    context = multiprocessing.get_context('spawn')
+    return context.Pool(processes or os.cpu_count() or 1)
+
+
+def render_qr_batch(links, qr_format='png', pool=None):
+    """
+    QR-коды для набора ссылок: {ссылка: байты}.
+
+    Ссылки, которых нет в кэше, рисуются в текущем потоке
+    или, если передан pool (qr_pool), в пуле процессов.
+    """
+    result = {}
+    missing = []
+    for link in dict.fromkeys(links):
+        value = qr_cache.get((link, qr_format))
+        if value is None:
+            missing.append(link)
+        else:
+            result[link] = value
+    if pool is None or not missing:
+        rendered = [_render(link, qr_format) for link in missing]
+    else:
+        rendered = pool.map(_render_item,
+                            [(link, qr_format) for link in missing])
+    for link, value in zip(missing, rendered):
+        qr_cache.put((link, qr_format), value)
+        result[link] = value
+    return result
+
+
+def make_qr_png(link):
+    """
+    QR-код ссылки в формате PNG.
+    """
+    return render_qr(link, 'png')
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# отдельный кэш счетчиков (settings.CACHES)
+RATELIMIT_CACHE = 'ratelimit'
+
+
+class RateLimit:
+    """
+    Ограничение частоты запросов: не больше limit запросов
+    с одним ключом за period секунд.
+
+    Счетчики (фиксированное окно) хранятся в памяти процесса
+    в отдельном кэше: проверка не обращается к базе данных и к диску,
+    а поток запросов с неверными кодами не вытесняет ключи общего кэша.
+    Лимит действует в каждом процессе gunicorn отдельно.
+    """
+
+    def __init__(self, name, limit, period=60):
+        self.name = name
+        self.limit = limit
+        self.period = period
+
+    def _key(self, key):
+        window = int(time.time() // self.period)
+        return f'ratelimit:{self.name}:{window}:{key}'
+
+    def hit(self, key):
+        """
+        Учесть запрос с ключом key; False - лимит превышен.
+        """
+        cache = caches[RATELIMIT_CACHE]
+        key = self._key(key)
+        cache.add(key, 0, self.period)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # окно закончилось между add и incr
+            cache.add(key, 1, self.period)
+            count = 1
+        return count <= self.limit
+
+
+def client_ip(request):
+    """
+    Адрес клиента: из заголовка settings.CLIENT_IP_HEADER, который
+    прокси-сервер заполняет сам, иначе адрес соединения.
+    """
+    return (request.META.get(settings.CLIENT_IP_HEADER)
+            or request.META.get('REMOTE_ADDR'))
@@ -0,0 +1,128 @@
+from django.db import models
+from django.db.models import Count, ExpressionWrapper, F, Sum
+from django.db.models.functions import (TruncDay, TruncMonth, TruncWeek,
+                                        TruncYear)
+
+from warehouse.models import Stock
+
+from .models import (CargoStock, CategoryTotal, ShipmentStock,
+                     stock_value_expression)
+
+PERIODS = {'day': TruncDay, 'week': TruncWeek,
+           'month': TruncMonth, 'year': TruncYear}
+
+
+def line_value(prefix=''):
+    """
+    Стоимость строки документа (цена товара * количество).
+
+    prefix - путь до строки документа, например 'shipmentstock__'
+    для запросов по покупкам.
+    """
+    return ExpressionWrapper(F(prefix + 'stock__price')
+                             * F(prefix + 'number'),
+                             output_field=models.FloatField())
+
+
+def document_summary(lines):
+    """
+    Количество позиций и сумма строк документа одним запросом.
+
+    lines - набор строк ShipmentStock или CargoStock.
+    """
+    result = lines.aggregate(count=Count('pk'), total=Sum(line_value()))
+    return result['count'], result['total'] or 0
+
+
+def shipment_summary(shipment):
+    return document_summary(ShipmentStock.objects.filter(shipment=shipment))
+
+
+def cargo_summary(cargo):
+    return document_summary(CargoStock.objects.filter(cargo=cargo))
+
+
+def category_value(category_id=None):
+    """
+    Стоимость товаров категории вместе с подкатегориями
+    (без category_id - стоимость всех товаров).
+
+    Значение берется из сводной таблицы CategoryTotal,
+    поэтому подсчет не зависит от количества товаров.
+    """
+    if category_id is not None:
+        total = (CategoryTotal
+                 .objects
+                 .filter(category=category_id)
+                 .values_list('subtree_value', flat=True)
+                 .first())
+        return total or 0
+    result = CategoryTotal.objects.aggregate(value=Sum('value'))['value']
+    return result or 0
+
+
+def _grouped(lines, key):
+    return {row[key]: (row['value'] or 0, row['number'] or 0)
+            for row in (lines
+                        .values(key)
+                        .order_by()
+                        .annotate(value=Sum(line_value()),
+                                  number=Sum('number')))}
+
+
+def stock_value_by_category():
+    """
+    Стоимость и количество товаров на складе по категориям
+    (без подкатегорий): {id категории: (стоимость, количество)}.
+    """
+    return {row['category']: (row['value'] or 0, row['number'] or 0)
+            for row in (Stock
+                        .objects
+                        .values('category')
+                        .order_by()
+                        .annotate(value=Sum(stock_value_expression()),
+                                  number=Sum('number')))}
+
+
+def sales_by_category(lines=None):
+    """
+    Продажи по категориям товаров: {id категории: (сумма, количество)}.
+    """
+    lines = ShipmentStock.objects.all() if lines is None else lines
+    return _grouped(lines, 'stock__category')
+
+
+def sales_by_customer(lines=None):
+    """
+    Продажи по покупателям: {id покупателя: (сумма, количество)}.
+    """
+    lines = ShipmentStock.objects.all() if lines is None else lines
+    return _grouped(lines, 'shipment__customer')
+
+
+def purchases_by_supplier(lines=None):
+    """
+    Поставки по поставщикам: {id поставщика: (сумма, количество)}.
+    """
+    lines = CargoStock.objects.all() if lines is None else lines
+    return _grouped(lines, 'cargo__supplier')
+
+
+def sales_by_period(period='month', lines=None):
+    """
+    Продажи по периодам (day, week, month, year):
+    {начало периода: (сумма, количество)}.
+    """
+    lines = ShipmentStock.objects.all() if lines is None else lines
+    lines = lines.annotate(period=PERIODS[period]('shipment__date'))
+    return _grouped(lines, 'period')
+
+
+def purchases_by_period(period='month', lines=None):
+    """
+    Поставки по периодам (day, week, month, year):
+    {начало периода: (сумма, количество)}.
+    """
+    lines = CargoStock.objects.all() if lines is None else lines
+    lines = lines.annotate(period=PERIODS[period]('cargo__date'))
+    return _grouped(lines, 'period')
@@ -0,0 +1,86 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from mptt.signals import node_moved
+
+from category.models import Category
+from warehouse.models import Stock
+from .documents import (refresh_cargo_totals, refresh_shipment_totals,
+                        refresh_totals_for_stocks)
+from .models import CargoStock, CategoryTotal, ShipmentStock
+from .models import (change_category_totals, move_category_totals,
+                     recompute_category_subtrees)
+
+
+@receiver(post_save, sender=Stock)
+def update_totals_on_stock_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    # значения до сохранения запоминаются в warehouse.signals
+    previous = getattr(instance, '_previous_state', None)
+    if previous is not None:
+        deltas[previous['category_id']] = (
+            -previous['price'] * previous['number'], -previous['number'])
+    value, number = deltas.get(instance.category_id, (0, 0))
+    deltas[instance.category_id] = (value + instance.price * instance.number,
+                                    number + instance.number)
+    change_category_totals(deltas)
+    # суммы документов считаются по текущей цене товара
+    if previous is not None and previous['price'] != instance.price:
+        refresh_totals_for_stocks([instance.pk])
+
+
+@receiver(post_delete, sender=Stock)
+def update_totals_on_stock_delete(sender, instance, **kwargs):
+    change_category_totals({instance.category_id:
+                            (-instance.price * instance.number,
+                             -instance.number)})
+
+
+@receiver(post_init, sender=Category)
+def remember_category_parent(sender, instance, **kwargs):
+    # надкатегория на момент загрузки (без запроса, если поле отложено)
+    instance._saved_parent_id = instance.__dict__.get('parent_id')
+
+
+@receiver(post_save, sender=Category)
+def update_totals_on_category_save(sender, instance, created=False,
+                                   raw=False, **kwargs):
+    if created:
+        instance._saved_parent_id = instance.parent_id
+        if not raw:
+            CategoryTotal.objects.get_or_create(category=instance)
+
+
+@receiver(node_moved, sender=Category)
+def update_totals_on_category_move(sender, instance, **kwargs):
+    # node_moved отправляется и при смене порядка среди соседей
+    # (переименование), и повторно из TreeManager.move_node:
+    # итоги меняются только при смене надкатегории
+    old_parent_id = getattr(instance, '_saved_parent_id', None)
+    if old_parent_id == instance.parent_id:
+        return
+    move_category_totals(instance.pk, old_parent_id, instance.parent_id)
+    instance._saved_parent_id = instance.parent_id
+
+
+@receiver(post_delete, sender=Category)
+def update_totals_on_category_delete(sender, instance, **kwargs):
+    recompute_category_subtrees()
+
+
+@receiver(post_save, sender=ShipmentStock)
+@receiver(post_delete, sender=ShipmentStock)
+def update_shipment_totals(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_shipment_totals([instance.shipment_id])
+
+
+@receiver(post_save, sender=CargoStock)
+@receiver(post_delete, sender=CargoStock)
+def update_cargo_totals(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_cargo_totals([instance.cargo_id])
@@ -27,16 +27,42 @@ $(document).ready(function(){
         }
      });
 
+    // карта категория -> товары загружается один раз на страницу,
+    // пока она не загружена, товары категории запрашиваются отдельно
+    var form = $('form');
+    var stockMapUrl = form.data('stock-map-url');
+    var stockMap = null;
+    if (form.data('preload-stock-map')) {
+        $.getJSON(stockMapUrl).done(function (data) {
+            stockMap = data;
+        });
+    }
+
+    function fillItems(item, stocks) {
+        item.prepend('<option value="">---------</option>');
+        $.each(stocks, function(pk, value) {
+            item.append('<option value="' + pk + '">' + value + '</option>');
+        });
+    }
+
     $('fieldset').on('change', '.category', function () {
         var item = $(this).next();
+        var category = $(this).val();
         item.empty();
-        $.getJSON(location.href, {'category': $(this).val()})
-            .done(function (data) {
-                item.prepend('<option value="">---------</option>');
-                $.each(data, function(pk, value) {
-                    item.append('<option value="' + pk + '">' + value + '</option>');
+        if (!category) {
+            fillItems(item, {});
+        } else if (stockMap) {
+            var stocks = {};
+            $.each(stockMap.categories[category] || [], function(i, pk) {
+                stocks[pk] = stockMap.stocks[pk];
             });
-        })
+            fillItems(item, stocks);
+        } else {
+            $.getJSON(stockMapUrl, {'category': category})
+                .done(function (data) {
+                    fillItems(item, data);
+                });
+        }
     })
 
 })
\ No newline at end of file
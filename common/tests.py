@@ -1,3 +1,153 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .outbox import (BACKOFF, LEASE, MAX_BACKOFF, OutboxDelivery,
+                     claim_emails, queue_email, retry_delay)
+from .qr import make_qr_png, qr_cache
+from .ratelimit import client_ip
+
+
+class FailingBackend(BaseEmailBackend):
+    """
+    Почтовый сервер, который не принимает письма.
+    """
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('mail server is down')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTest(TestCase):
+    """
+    Очередь исходящих писем и ее отправка (common.outbox).
+    """
+
+    def deliver(self, **kwargs):
+        with OutboxDelivery(**kwargs) as outbox:
+            return outbox.deliver()
+
+    def test_deliver_queued_email(self):
+        email = queue_email('Покупка', ['customer@example.com'], 'Текст',
+                            html='<p>Текст</p>',
+                            qr_link='http://localhost/confirm/1/')
+        self.assertEqual(self.deliver(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, 'Покупка')
+        self.assertEqual(message.to, ['customer@example.com'])
+        self.assertEqual(message.body, 'Текст')
+        self.assertEqual(message.alternatives, [('<p>Текст</p>',
+                                                 'text/html')])
+        self.assertEqual(len(message.attachments), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNotNone(email.sent)
+        self.assertEqual(email.claim, '')
+        # отправленное письмо больше не отправляется
+        self.assertEqual(self.deliver(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_qr_codes_rendered_in_pool(self):
+        links = [f'http://localhost/confirm/{i}/' for i in range(3)]
+        for link in links:
+            queue_email('Покупка', ['customer@example.com'], 'Текст',
+                        qr_link=link)
+        qr_cache.clear()
+        self.assertEqual(self.deliver(qr_processes=1), (3, 0))
+        self.assertEqual([message.attachments[0].get_payload(decode=True)
+                          for message in mail.outbox],
+                         [make_qr_png(link) for link in links])
+
+    def test_claim_lease(self):
+        email = queue_email('Покупка', ['customer@example.com'], 'Текст')
+        claimed = claim_emails(10)
+        self.assertEqual([item.pk for item in claimed], [email.pk])
+        self.assertGreater(claimed[0].locked_until,
+                           timezone.now() + LEASE
+                           - datetime.timedelta(seconds=5))
+        # письмо, взятое другим процессом, не берется до конца аренды
+        self.assertEqual(claim_emails(10), [])
+        self.assertEqual(self.deliver(), (0, 0))
+        # процесс не отправил письмо и завершился - аренда истекла
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual([item.pk for item in claim_emails(10)], [email.pk])
+
+    def test_email_not_due_is_not_claimed(self):
+        queue_email('Покупка', ['customer@example.com'], 'Текст')
+        OutgoingEmail.objects.update(
+            next_attempt=timezone.now() + datetime.timedelta(minutes=1))
+        self.assertEqual(claim_emails(10), [])
+
+    def test_backoff_after_failed_send(self):
+        email = queue_email('Покупка', ['customer@example.com'], 'Текст')
+        backend = 'common.tests.FailingBackend'
+        started = timezone.now()
+        self.assertEqual(self.deliver(backend=backend), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('ConnectionRefusedError', email.last_error)
+        self.assertIsNone(email.locked_until)
+        self.assertGreaterEqual(email.next_attempt, started + BACKOFF)
+        # повтор - не раньше next_attempt
+        self.assertEqual(self.deliver(backend=backend), (0, 0))
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            next_attempt=timezone.now())
+        started = timezone.now()
+        self.assertEqual(self.deliver(backend=backend), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertGreaterEqual(email.next_attempt, started + 2 * BACKOFF)
+        # после восстановления сервера письмо отправляется
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            next_attempt=timezone.now())
+        self.assertEqual(self.deliver(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_retry_delay_is_capped(self):
+        self.assertEqual(retry_delay(1), BACKOFF)
+        self.assertEqual(retry_delay(3), 4 * BACKOFF)
+        self.assertEqual(retry_delay(30), MAX_BACKOFF)
+
+    def test_max_attempts(self):
+        email = queue_email('Покупка', ['customer@example.com'], 'Текст')
+        OutgoingEmail.objects.filter(pk=email.pk).update(attempts=2)
+        self.assertEqual(self.deliver(backend='common.tests.FailingBackend',
+                                      max_attempts=3), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, 3)
+        # письмо с исчерпанными попытками больше не берется
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            next_attempt=timezone.now())
+        self.assertEqual(claim_emails(10), [])
+        self.assertEqual(self.deliver(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class ClientIpTest(TestCase):
+    """
+    Адрес клиента для ограничения частоты запросов.
+    """
+
+    def test_remote_addr_without_proxy(self):
+        request = RequestFactory().get('/', HTTP_X_REAL_IP='10.0.0.1',
+                                       REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(client_ip(request), '10.0.0.2')
+
+    @override_settings(CLIENT_IP_HEADER='HTTP_X_REAL_IP')
+    def test_address_from_proxy_header(self):
+        factory = RequestFactory()
+        request = factory.get('/', HTTP_X_REAL_IP='10.0.0.1',
+                              REMOTE_ADDR='172.17.0.3')
+        self.assertEqual(client_ip(request), '10.0.0.1')
+        request = factory.get('/', REMOTE_ADDR='172.17.0.3')
+        self.assertEqual(client_ip(request), '172.17.0.3')
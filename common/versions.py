@@ -0,0 +1,55 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+# отдельный кэш без вытеснения (settings.CACHES)
+VERSIONS_CACHE = 'versions'
+
+
+def _version_key(name):
+    return 'version:' + name
+
+
+def _initial_version():
+    # если счетчик потерян (например, кэш очищен), новая версия
+    # больше всех прежних и не совпадает с версией данных,
+    # закэшированных процессами раньше
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных name (например, дерева категорий).
+
+    Версия хранится в общем для всех процессов кэше, поэтому
+    данные, закэшированные в памяти процесса, можно сверять с ней.
+    """
+    cache = caches[VERSIONS_CACHE]
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """
+    Увеличить версию набора данных name.
+
+    Версия увеличивается сразу (для чтения внутри текущей транзакции)
+    и повторно после фиксации транзакции, чтобы другие процессы
+    не закэшировали незафиксированное состояние.
+    """
+    def bump():
+        cache = caches[VERSIONS_CACHE]
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
@@ -26,12 +26,12 @@ class CustomerAdmin(admin.ModelAdmin):
         show_change_link = True
 
     form = CustomerForm
-    list_display = ('full_name', 'email', 'phone_number',)
+    list_display = ('full_name', 'email', 'phone_number', 'priority',)
     search_fields = ('full_name', 'email', 'phone_number',)
     inlines = [ShipmentInline, ]
 
     fieldsets = (
         (_('ДАННЫЕ ПОКУПАТЕЛЯ'),
          {'fields': ('full_name', 'phone_number',
-                     'email', 'contact_info')}),
+                     'email', 'contact_info', 'priority')}),
     )
@@ -10,7 +10,8 @@ class CustomerForm(forms.ModelForm):
     """
     class Meta:
         model = Customer
-        fields = '__all__'
+        # приоритет меняется только в интерфейсе кладовщика
+        fields = ('full_name', 'phone_number', 'email', 'contact_info')
         widgets = {'contact_info': forms.Textarea(attrs={'rows': '2',
                                                          'cols': '34'}),
                    'full_name': forms.TextInput(attrs={'size': '35'}),
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Приоритет'),
+        ),
+    ]
@@ -16,6 +16,10 @@ class Customer(models.Model):
     email = models.EmailField(verbose_name=_('Электронная почта'))
     contact_info = models.TextField(null=True,
                                     verbose_name=_('Контактные данные'))
+    # при нехватке товара покупки покупателей с большим приоритетом
+    # собираются первыми (shipment.allocation)
+    priority = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name=_('Приоритет'))
 
     def __str__(self):
         return self.full_name
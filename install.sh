@@ -14,11 +14,24 @@ docker run --name web -d \
 -e EMAIL_HOST_USER=$2 \
 -e EMAIL_HOST_PASSWORD=$3 \
 -e CLIENT_EMAIL=$4 \
+-e CLIENT_IP_HEADER=HTTP_X_REAL_IP \
 --volume StaticVolume:/home/warehouse/static \
 --volume DatabaseVolume:/home/warehouse/database \
 --restart always \
 warehouse
 
+docker run --name outbox -d \
+-e ADMIN_EMAIL=$2 \
+-e SERVER_EMAIL=$2 \
+-e DEFAULT_FROM_EMAIL=$2 \
+-e EMAIL_HOST=$1 \
+-e EMAIL_HOST_USER=$2 \
+-e EMAIL_HOST_PASSWORD=$3 \
+-e CLIENT_EMAIL=$4 \
+--volume DatabaseVolume:/home/warehouse/database \
+--restart always \
+warehouse outbox
+
 docker run --name nginx-custom -d \
 -p 8888:80 \
 --link web \
@@ -1,25 +1,22 @@
-import qrcode
-import io
-import uuid
-
-from django.urls import reverse
 from django.contrib import admin, messages
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from email.mime.base import MIMEBase
-from email.encoders import encode_base64
-from django.template.loader import render_to_string
 from django.utils.translation import gettext as _
 
 from .forms import ShipmentForm
 
+from common.filters import LineCountFilter, TotalFilter
 from common.models import ShipmentStock
+from common.outbox import queue_emails
 from warehouse.forms import StockFormM2M
+from warehouse.models import Stock, StockMovement
+from warehouse.services import change_stock
 
-from .models import get_shipment_total
+from .allocation import FIFO, FILLED, PRIORITY, plan_allocation
+from .approval import (ApprovalConflict, PlanOutdated, approve_shipments,
+                       confirmation_email, confirmation_link)
+from .availability import shipment_shortages
 from .models import Shipment
-
-from socket import error as socket_base_error
+from .tokens import hash_token, make_token, token_hint
 
 
 @admin.register(Shipment)
@@ -36,61 +33,80 @@ class ShipmentAdmin(admin.ModelAdmin):
         verbose_name_plural = _('Товары')
         can_delete = False
 
+        def get_queryset(self, request):
+            # товар и категория строки загружаются вместе со строками
+            return (super()
+                    .get_queryset(request)
+                    .select_related('stock__category'))
+
     form = ShipmentForm
     # поля для отображения в списке погрузок
-    shipment_total = get_shipment_total
-    shipment_total.short_description = _('Сумма покупки')
-    list_display = ('customer', 'date', 'status', shipment_total, 'qr', )
+    list_display = ('customer', 'date', 'status', 'total', 'line_count',
+                    'qr', )
     # поля для фильтрации
-    list_filter = ('date', 'customer', 'status', )
+    list_filter = ('date', 'customer', 'status', TotalFilter,
+                   LineCountFilter, )
     # поля для текстового поиска
     search_fields = ('status', 'customer__full_name', )
     fieldsets = ((_('ИНФОРМАЦИЯ О ПОКУПКЕ'),
                   {'fields': ('shipment_id', 'customer_name',
-                              'number_of_items', 'total',
+                              'number_of_items', 'shipment_total',
                               'shipment_status', 'shipment_date',
                               'shipment_qr', )}), )
     inlines = (StockInline, )
+    actions = ('approve_selected', 'allocate_fifo', 'allocate_priority',
+               'allocate_filled', )
+
+    def get_shortages(self, request, obj):
+        # проверка выполняется один раз за запрос: change_view
+        # и save_model используют один и тот же результат
+        shortages = request.__dict__.setdefault('_shipment_shortages', {})
+        if obj.pk not in shortages:
+            shortages[obj.pk] = shipment_shortages([obj.pk]).get(obj.pk, [])
+        return shortages[obj.pk]
 
-    def is_shipment_available(self, obj):
-        return all(s.stock.number > s.number
-                   for s in ShipmentStock.objects.filter(shipment=obj))
+    def is_shipment_available(self, request, obj):
+        return not self.get_shortages(request, obj)
 
     def has_add_permission(self, request):
         return False
 
     def save_model(self, request, obj, form, change):
-        shipment_available = self.is_shipment_available(obj)
+        shipment_available = self.is_shipment_available(request, obj)
         # нажата кнопка Cancel
         if '_cancel' in request.POST:
             if obj.status == Shipment.SENT:
-                # обновляем при отмене заказа,
+                # возвращаем на склад при отмене заказа,
                 # если товары были зарезервированы
-                for shipment_stock in obj.shipmentstock_set.all():
-                    shipment_stock.stock.number += shipment_stock.number
-                    shipment_stock.stock.save()
+                change_stock(self.get_shipment_lines(obj),
+                             StockMovement.RELEASE, shipment=obj)
             obj.status = Shipment.CANCELLED
         elif obj.status == Shipment.CREATED:
             # проверка данных клиента на сервере
             if shipment_available:
-                qr = str(obj.id) + str(uuid.uuid4())
-                email = obj.customer.email
+                token = make_token()
                 link = self.get_confirmation_link(settings.DJANGO_HOSTNAME,
-                                                  qr)
-                template_html = 'shipment/email_to_customer.html'
-                template_txt = 'shipment/email_to_customer.txt'
-                body = render_to_string(template_html, {'link': link})
-                body_txt = render_to_string(template_txt, {'link': link})
-                try:
-                    self.send_email_to_customer(email, body, body_txt, link)
+                                                  token)
+                reservation = {pk: -number for pk, number
+                               in self.get_shipment_lines(obj).items()}
+                result = change_stock(reservation,
+                                      StockMovement.RESERVATION,
+                                      shipment=obj)
+                if result.ok:
+                    # письмо ставится в очередь в транзакции сохранения
+                    # покупки и отправляется командой deliver_outbox
+                    self.send_email_to_customer(obj.customer.email, link)
                     obj.status = Shipment.SENT
-                    for shipment_stock in obj.shipmentstock_set.all():
-                        shipment_stock.stock.number -= shipment_stock.number
-                        shipment_stock.stock.save()
-                    obj.qr = qr
-                except socket_base_error:
-                    messages.error(request,
-                                   _('Не удалось подключиться к сети'))
+                    # в базе хранится только хэш кода из ссылки
+                    obj.qr = token_hint(token)
+                    obj.token_hash = hash_token(token)
+                else:
+                    shipment_available = False
+                    self.report_shortages(request, result)
+            else:
+                for line in self.get_shortages(request, obj):
+                    self.report_shortage(request, line.name,
+                                         line.requested, line.available)
         elif obj.status == Shipment.SENT:
             obj.status = Shipment.DONE
         super().save_model(request, obj, form, change)
@@ -99,43 +115,111 @@ class ShipmentAdmin(admin.ModelAdmin):
             messages.error(request, _('На складе недостаточно '
                                       + 'товара для данной покупки'))
 
+    def get_shipment_lines(self, obj):
+        return dict(ShipmentStock
+                    .objects
+                    .filter(shipment=obj)
+                    .values_list('stock_id', 'number'))
+
+    def report_shortages(self, request, result):
+        names = Stock.objects.in_bulk(result.shortages)
+        for pk, (requested, available) in result.shortages.items():
+            name = names[pk].name if pk in names else pk
+            self.report_shortage(request, name, requested, available)
+
+    def report_shortage(self, request, name, requested, available):
+        messages.error(request,
+                       _('Недостаточно товара "%(name)s": нужно '
+                         '%(requested)s, на складе %(available)s')
+                       % {'name': name, 'requested': requested,
+                          'available': available})
+
     # добавляем значения в extra_context для дальнейшего использования
     # на странице формы информации о погрузке
     def change_view(self, request, object_id,
                     form_url='', extra_context=None):
         extra = extra_context or {}
-        if Shipment.objects.filter(pk=object_id).exists():
-            obj = Shipment.objects.get(pk=object_id)
-            extra['STATUS_VALUE'] = Shipment.objects.get(pk=object_id).status
+        obj = self.get_object(request, object_id)
+        if obj is not None:
+            extra['STATUS_VALUE'] = obj.status
             extra['STATUS_DONE'] = Shipment.DONE
             extra['STATUS_CANCELLED'] = Shipment.CANCELLED
             extra['STATUS_CREATED'] = Shipment.CREATED
             extra['STATUS_SENT'] = Shipment.SENT
-            extra['SHIPMENT_AVAILABLE'] = self.is_shipment_available(obj)
+            extra['SHIPMENT_SHORTAGES'] = self.get_shortages(request, obj)
+            extra['SHIPMENT_AVAILABLE'] = not extra['SHIPMENT_SHORTAGES']
         return super().change_view(request, object_id,
                                    form_url, extra_context=extra)
 
-    def get_qr(self, link):
-        qr = qrcode.make(link)
-        img = qr.get_image()
-        byte_stream = io.BytesIO()
-        img.save(byte_stream, 'PNG')
-        return byte_stream.getvalue()
-
-    def get_confirmation_link(self, host, qr):
-        return str(host) + reverse('shipment:shipment_confirmation',
-                                   args=(qr, ))
-
-    def send_email_to_customer(self, receiver, body, body_txt, link):
-        qr = self.get_qr(link)
-        attachment = MIMEBase('application', 'octet-stream')
-        attachment.set_payload(qr)
-        encode_base64(attachment)
-        attachment.add_header('Content-Disposition',
-                              'attachment; filename=qr.png')
-        subject = _('Подтверждение получения товара')
-        message = EmailMultiAlternatives(subject=subject,
-                                         body=body_txt, to=[receiver, ],
-                                         attachments=[attachment, ])
-        message.attach_alternative(body, "text/html")
-        message.send()
+    def get_confirmation_link(self, host, token):
+        return confirmation_link(token, host)
+
+    def send_email_to_customer(self, receiver, link):
+        # QR-код ссылки прикладывается к письму при отправке
+        queue_emails([confirmation_email(receiver, link)])
+
+    def approve_selected(self, request, queryset):
+        try:
+            result = approve_shipments(
+                list(queryset.values_list('pk', flat=True)),
+                settings.DJANGO_HOSTNAME)
+        except ApprovalConflict:
+            self.message_user(request,
+                              _('Остатки товаров изменились во время '
+                                'подтверждения, повторите действие'),
+                              messages.ERROR)
+            return
+        self.report_approval(request, result.approved, result.shortages,
+                             result.skipped)
+    approve_selected.short_description = _('Подтвердить готовность '
+                                           'выбранных покупок к отправке')
+
+    def allocate_selected(self, request, queryset, policy):
+        # товар распределяется между выбранными покупками в статусе
+        # проверки, затем все принятые покупки подтверждаются вместе
+        plan = plan_allocation(policy, queryset.values('pk'))
+        try:
+            plan.commit(settings.DJANGO_HOSTNAME)
+        except (ApprovalConflict, PlanOutdated):
+            self.message_user(request,
+                              _('Остатки товаров изменились во время '
+                                'подтверждения, повторите действие'),
+                              messages.ERROR)
+            return
+        self.report_approval(request, plan.approved, plan.shortages(), ())
+
+    def allocate_fifo(self, request, queryset):
+        self.allocate_selected(request, queryset, FIFO)
+    allocate_fifo.short_description = _('Распределить товар по дате '
+                                        'покупки')
+
+    def allocate_priority(self, request, queryset):
+        self.allocate_selected(request, queryset, PRIORITY)
+    allocate_priority.short_description = _('Распределить товар '
+                                            'по приоритету покупателя')
+
+    def allocate_filled(self, request, queryset):
+        self.allocate_selected(request, queryset, FILLED)
+    allocate_filled.short_description = _('Распределить товар на наибольшее '
+                                          'число покупок')
+
+    def report_approval(self, request, approved, shortages, skipped):
+        if approved:
+            self.message_user(request,
+                              _('Подтверждено покупок: %(count)d')
+                              % {'count': len(approved)},
+                              messages.SUCCESS)
+        for pk, lines in shortages.items():
+            self.message_user(
+                request,
+                _('Покупка %(pk)s не подтверждена, не хватает: %(items)s')
+                % {'pk': pk,
+                   'items': ', '.join(f'{line.name} ({line.shortfall})'
+                                      for line in lines)},
+                messages.ERROR)
+        if skipped:
+            self.message_user(request,
+                              _('Пропущены покупки не в статусе проверки: '
+                                '%(ids)s')
+                              % {'ids': ', '.join(map(str, skipped))},
+                              messages.WARNING)
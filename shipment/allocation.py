@@ -0,0 +1,213 @@
+import math
+from array import array
+
+from common.models import ShipmentStock
+from warehouse.models import Stock
+
+from .approval import approve_shipments
+from .availability import LineShortage
+from .models import Shipment
+
+# порядок сборки покупок при нехватке товара
+FIFO = 'fifo'
+FILLED = 'filled'
+PRIORITY = 'priority'
+POLICIES = (FIFO, FILLED, PRIORITY)
+
+
+class Demand:
+    """
+    Открытые строки покупок и остатки товаров в виде параллельных
+    массивов: строки покупки shipments[k] занимают позиции
+    starts[k]:starts[k + 1] массивов stock и number, stock -
+    номер товара в stock_ids и supply.
+    """
+
+    def __init__(self):
+        self.shipments = []
+        self.date = []
+        self.priority = []
+        self.starts = array('q', [0])
+        self.stock = array('q')
+        self.number = array('q')
+        self.stock_ids = []
+        self.supply = array('q')
+        self._stock_index = {}
+
+    def add_shipment(self, shipment_id, date, priority):
+        self.shipments.append(shipment_id)
+        self.date.append(date)
+        self.priority.append(priority)
+        self.starts.append(len(self.stock))
+
+    def add_line(self, stock_id, number, available):
+        index = self._stock_index.get(stock_id)
+        if index is None:
+            index = self._stock_index[stock_id] = len(self.stock_ids)
+            self.stock_ids.append(stock_id)
+            self.supply.append(max(available, 0))
+        self.stock.append(index)
+        self.number.append(number)
+        self.starts[-1] = len(self.stock)
+
+    def __len__(self):
+        return len(self.stock)
+
+
+def load_demand(shipments=None):
+    """
+    Строки покупок в статусе проверки (или только покупок shipments)
+    вместе с остатками товаров одним запросом.
+    """
+    lines = ShipmentStock.objects.filter(shipment__status=Shipment.CREATED)
+    if shipments is not None:
+        lines = lines.filter(shipment__in=shipments)
+    demand = Demand()
+    current = None
+    for shipment_id, date, priority, stock_id, number, available in (
+            lines
+            .order_by('shipment_id')
+            .values_list('shipment_id', 'shipment__date',
+                         'shipment__customer__priority',
+                         'stock_id', 'number', 'stock__number')
+            .iterator()):
+        if shipment_id != current:
+            demand.add_shipment(shipment_id, date, priority)
+            current = shipment_id
+        demand.add_line(stock_id, number, available)
+    return demand
+
+
+def _fill_cost(demand):
+    # доля остатка, которую забирает покупка: покупки, занимающие
+    # меньше дефицитного товара, собираются первыми (жадный подбор
+    # для задачи о многомерном рюкзаке с одинаковой ценностью заказов)
+    requested = [0] * len(demand.stock_ids)
+    for index, number in zip(demand.stock, demand.number):
+        requested[index] += number
+    # учитываются только товары, которых не хватает на всех;
+    # покупка с отсутствующим товаром не собирается в любом случае
+    weight = [0.0 if requested[index] <= supply
+              else 1 / supply if supply
+              else math.inf
+              for index, supply in enumerate(demand.supply)]
+    stock, number, starts = demand.stock, demand.number, demand.starts
+    cost = []
+    for k in range(len(demand.shipments)):
+        total = 0.0
+        for i in range(starts[k], starts[k + 1]):
+            w = weight[stock[i]]
+            if w:
+                total += number[i] * w
+        cost.append(total)
+    return cost
+
+
+def _order(demand, policy):
+    shipments, date = demand.shipments, demand.date
+    if policy == FIFO:
+        def key(k):
+            return date[k], shipments[k]
+    elif policy == PRIORITY:
+        priority = demand.priority
+
+        def key(k):
+            return -priority[k], date[k], shipments[k]
+    elif policy == FILLED:
+        cost = _fill_cost(demand)
+
+        def key(k):
+            return cost[k], date[k], shipments[k]
+    else:
+        raise ValueError(f'Unknown allocation policy: {policy}')
+    return sorted(range(len(shipments)), key=key)
+
+
+class AllocationPlan:
+    """
+    Распределение товара между покупками.
+
+    approved - id покупок, которые можно собрать целиком,
+    rejected - id остальных покупок, reserved - {id товара:
+    резервируемое количество}. План подтверждается методом commit.
+    """
+
+    def __init__(self, policy, demand, approved, rejected, remaining):
+        self.policy = policy
+        self.demand = demand
+        self.approved = approved
+        self.rejected = rejected
+        self.remaining = remaining
+
+    @property
+    def reserved(self):
+        return {pk: supply - remaining for pk, supply, remaining
+                in zip(self.demand.stock_ids, self.demand.supply,
+                       self.remaining)
+                if supply != remaining}
+
+    def shortages(self):
+        """
+        Нехватка товаров для непринятых покупок после распределения:
+        {id покупки: [LineShortage]}.
+        """
+        demand = self.demand
+        position = {pk: k for k, pk in enumerate(demand.shipments)}
+        short = {}
+        for pk in self.rejected:
+            k = position[pk]
+            short[pk] = [(demand.stock[i], demand.number[i])
+                         for i in range(demand.starts[k],
+                                        demand.starts[k + 1])
+                         if demand.number[i] > self.remaining[
+                             demand.stock[i]]]
+        names = dict(Stock
+                     .objects
+                     .filter(pk__in={demand.stock_ids[index]
+                                     for lines in short.values()
+                                     for index, number in lines})
+                     .values_list('pk', 'name'))
+        return {pk: [LineShortage(demand.stock_ids[index],
+                                  names.get(demand.stock_ids[index]),
+                                  number, self.remaining[index])
+                     for index, number in lines]
+                for pk, lines in short.items()}
+
+    def commit(self, host=None):
+        """
+        Подтверждение всех принятых покупок в одной транзакции;
+        если покупки или остатки изменились, ничего не меняется
+        (approval.PlanOutdated).
+        """
+        return approve_shipments(self.approved, host, strict=True)
+
+
+def allocate(demand, policy=FIFO):
+    """
+    Распределение остатков между покупками по правилу policy:
+
+    FIFO - в порядке даты покупки,
+    PRIORITY - по приоритету покупателя, затем по дате,
+    FILLED - как можно больше покупок целиком (жадный подбор).
+
+    Покупка собирается только целиком. Расчет идет по массивам
+    Demand без обращения к базе данных.
+    """
+    remaining = array('q', demand.supply)
+    stock, number, starts = demand.stock, demand.number, demand.starts
+    approved, rejected = [], []
+    for k in _order(demand, policy):
+        start, end = starts[k], starts[k + 1]
+        for i in range(start, end):
+            if number[i] > remaining[stock[i]]:
+                rejected.append(demand.shipments[k])
+                break
+        else:
+            for i in range(start, end):
+                remaining[stock[i]] -= number[i]
+            approved.append(demand.shipments[k])
+    return AllocationPlan(policy, demand, approved, rejected, remaining)
+
+
+def plan_allocation(policy=FIFO, shipments=None):
+    return allocate(load_demand(shipments), policy)
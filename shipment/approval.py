@@ -0,0 +1,172 @@
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.translation import gettext as _
+
+from actionlog.models import log_actions
+from common.models import ShipmentStock
+from common.outbox import outgoing_email, queue_emails
+from warehouse.models import StockMovement
+from warehouse.services import change_stock
+
+from .availability import LineShortage
+from .models import Shipment
+from .tokens import hash_token, make_token, token_hint
+
+# повторы, если покупки или остатки изменились во время подтверждения
+APPROVAL_ATTEMPTS = 3
+
+
+def confirmation_link(token, host=None):
+    return (str(host or settings.DJANGO_HOSTNAME)
+            + reverse('shipment:shipment_confirmation', args=(token, )))
+
+
+def confirmation_email(receiver, link):
+    """
+    Письмо покупателю со ссылкой подтверждения (для очереди писем);
+    QR-код ссылки прикладывается при отправке.
+    """
+    context = {'link': link}
+    return outgoing_email(
+        _('Подтверждение получения товара'), [receiver, ],
+        render_to_string('shipment/email_to_customer.txt', context),
+        html=render_to_string('shipment/email_to_customer.html', context),
+        qr_link=link)
+
+
+class ApprovalResult:
+    """
+    Результат подтверждения покупок.
+
+    approved - id подтвержденных покупок, shortages - словарь
+    {id покупки: [LineShortage]} для покупок, которым не хватило
+    товара, skipped - id покупок не в статусе проверки.
+    """
+
+    def __init__(self):
+        self.approved = []
+        self.shortages = {}
+        self.skipped = []
+
+
+class ApprovalConflict(Exception):
+    """
+    Покупки или остатки товаров менялись параллельно
+    во всех попытках подтверждения.
+    """
+
+
+class PlanOutdated(Exception):
+    """
+    Не все покупки плана можно подтвердить: статус покупок
+    или остатки товаров изменились после составления плана.
+    """
+
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+
+def _plan(shipments):
+    # строки покупок вместе с остатками товаров одним запросом;
+    # товар распределяется между покупками в порядке их номеров
+    lines = {}
+    stock = {}
+    for shipment_id, stock_id, name, number, available in (
+            ShipmentStock
+            .objects
+            .filter(shipment__in=shipments)
+            .values_list('shipment_id', 'stock_id', 'stock__name',
+                         'number', 'stock__number')):
+        lines.setdefault(shipment_id, []).append((stock_id, name, number))
+        stock[stock_id] = available
+    result = ApprovalResult()
+    for shipment in shipments:
+        shortages = [LineShortage(stock_id, name, number, stock[stock_id])
+                     for stock_id, name, number
+                     in lines.get(shipment.pk, ())
+                     if number > stock[stock_id]]
+        if shortages:
+            result.shortages[shipment.pk] = shortages
+            continue
+        for stock_id, name, number in lines.get(shipment.pk, ()):
+            stock[stock_id] -= number
+        result.approved.append(shipment.pk)
+    return result, lines
+
+
+def _approve(shipment_ids, host, strict):
+    shipments = list(Shipment
+                     .objects
+                     .filter(pk__in=shipment_ids)
+                     .select_related('customer')
+                     .order_by('pk'))
+    created = [shipment for shipment in shipments
+               if shipment.status == Shipment.CREATED]
+    result, lines = _plan(created)
+    result.skipped = [shipment.pk for shipment in shipments
+                      if shipment.status != Shipment.CREATED]
+    if strict and len(result.approved) != len(set(shipment_ids)):
+        raise PlanOutdated(result)
+    approved_ids = set(result.approved)
+    approved = [shipment for shipment in created
+                if shipment.pk in approved_ids]
+    if not approved:
+        return result
+    # условный UPDATE: покупки, которые уже подтвердили
+    # в другом запросе, не резервируются второй раз
+    changed = (Shipment
+               .objects
+               .filter(pk__in=result.approved, status=Shipment.CREATED)
+               .update(status=Shipment.SENT))
+    if changed != len(approved):
+        raise ApprovalConflict()
+    reservation = {}
+    movements = []
+    for shipment in approved:
+        for stock_id, name, number in lines.get(shipment.pk, ()):
+            reservation[stock_id] = reservation.get(stock_id, 0) - number
+            movements.append((stock_id, -number, None, shipment.pk))
+    if not change_stock(reservation, StockMovement.RESERVATION,
+                        movements=movements):
+        # остатки изменились после чтения
+        raise ApprovalConflict()
+    emails = []
+    for shipment in approved:
+        token = make_token()
+        shipment.status = Shipment.SENT
+        shipment.qr = token_hint(token)
+        shipment.token_hash = hash_token(token)
+        emails.append(confirmation_email(shipment.customer.email,
+                                         confirmation_link(token, host)))
+    Shipment.objects.bulk_update(approved, ('qr', 'token_hash'))
+    # UPDATE и bulk_update не отправляют сигналы, которые пишут историю
+    log_actions(approved, _('Редактирование'))
+    # письма отправляются командой deliver_outbox
+    queue_emails(emails)
+    return result
+
+
+def approve_shipments(shipment_ids, host=None, strict=False):
+    """
+    Подтверждение готовности к отправке нескольких покупок.
+
+    Доступность всех покупок проверяется одним запросом, товар
+    резервируется общими запросами UPDATE в одной транзакции, письма
+    покупателям ставятся в очередь одним запросом. Покупки, которым
+    не хватает товара, остаются в статусе проверки.
+
+    Если данные менялись параллельно, подтверждение повторяется
+    (не больше APPROVAL_ATTEMPTS раз, затем ApprovalConflict).
+    С strict=True покупки подтверждаются все или ни одна
+    (иначе PlanOutdated).
+    """
+    for attempt in range(APPROVAL_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _approve(shipment_ids, host, strict)
+        except ApprovalConflict:
+            if attempt == APPROVAL_ATTEMPTS - 1:
+                raise
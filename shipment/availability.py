@@ -0,0 +1,44 @@
+from collections import namedtuple
+
+from django.db.models import F
+
+from common.models import ShipmentStock
+
+
+class LineShortage(namedtuple('LineShortage', ('stock_id', 'name',
+                                               'requested', 'available'))):
+    """
+    Строка покупки, для которой на складе недостаточно товара.
+    """
+    __slots__ = ()
+
+    @property
+    def shortfall(self):
+        return self.requested - self.available
+
+
+def shipment_shortages(shipments):
+    """
+    Нехватка товаров для покупок одним запросом: строки покупок
+    соединяются с товарами и сравниваются с количеством на складе.
+
+    shipments - id покупок или набор покупок. Возвращает словарь
+    {id покупки: [LineShortage]} только для покупок, которые нельзя
+    собрать; товара хватает, если на складе не меньше,
+    чем в строке покупки.
+    """
+    result = {}
+    for shipment_id, stock_id, name, requested, available in (
+            ShipmentStock
+            .objects
+            .filter(shipment__in=shipments, number__gt=F('stock__number'))
+            .order_by('shipment_id', 'stock__name')
+            .values_list('shipment_id', 'stock_id', 'stock__name',
+                         'number', 'stock__number')):
+        result.setdefault(shipment_id, []).append(
+            LineShortage(stock_id, name, requested, available))
+    return result
+
+
+def is_shipment_available(shipment):
+    return not shipment_shortages([shipment.pk])
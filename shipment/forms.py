@@ -1,14 +1,14 @@
 from django import forms
 
 from django.utils.translation import gettext as _
-from mptt.forms import TreeNodeChoiceField
 
-from category.models import Category
+from category.tree import get_category_tree
 from .models import Shipment
 from common.models import format_date
-from .models import get_shipment_total
 
 from warehouse.models import Stock
+from warehouse.catalog import get_stock_catalog
+from warehouse.forms import BaseCatalogFormSet, SharedChoiceField
 from customer.models import Customer
 
 
@@ -23,14 +23,15 @@ class ShipmentForm(forms.ModelForm):
     # дополнительные поля для формы
     number_of_items = forms.CharField(max_length=10,
                                       label=_('Количество позиций'))
-    total = forms.CharField(max_length=10, label=_('Сумма заказа'))
+    shipment_total = forms.CharField(max_length=10,
+                                     label=_('Сумма заказа'))
     customer_name = forms.CharField(max_length=80, label=_('Покупатель'))
     shipment_id = forms.CharField(max_length=10, label=_('Номер заказа'))
     shipment_date = forms.CharField(max_length=19, label=_('Дата заказа'))
     shipment_status = forms.CharField(max_length=9, label=_('Статус заказа'))
     shipment_qr = forms.CharField(max_length=50, label=_('Код подтверждения'))
 
-    field_order = ('number_of_items', 'total', 'customer_name',
+    field_order = ('number_of_items', 'shipment_total', 'customer_name',
                    'shipment_id', 'shipment_date',
                    'shipment_status', 'shipment_qr', )
 
@@ -43,10 +44,9 @@ class ShipmentForm(forms.ModelForm):
                                                 'readonly': 'readonly'})
                 value.required = False
 
-            # сумма погрузки
-            money = get_shipment_total(current_shipment)
-            # общее количество всех товаров погрузки
-            number = current_shipment.shipmentstock_set.count()
+            # количество позиций и сумма покупки
+            number = current_shipment.line_count
+            money = current_shipment.total
             date = format_date(current_shipment.date)
             values = (number, money, current_shipment.customer.full_name,
                       current_shipment.id, date, current_shipment.status,
@@ -71,13 +71,58 @@ class OrderCustomerSelectForm(forms.Form):
     customer.widget = forms.Select(attrs={'disabled': 'disabled'})
 
 
+def get_category_choices():
+    return (('', '---------'), ) + get_category_tree().choices('+--')
+
+
 class OrderItemForm(forms.Form):
     """
     Форма для выбора товара на странице покупки.
+
+    Списки категорий и товаров берутся из индекса дерева категорий
+    и каталога товаров; товары по выбранным id загружает
+    BaseOrderItemFormSet одним запросом.
     """
-    category = TreeNodeChoiceField(queryset=Category.objects.all(),
-                                   level_indicator=u'+--', required=False)
+    category = forms.TypedChoiceField(coerce=int, required=False,
+                                      empty_value=None)
     category.widget = forms.Select(attrs={'class': "category"})
-    item = forms.ModelChoiceField(queryset=Stock.objects.all())
+    item = SharedChoiceField()
     item.widget = forms.Select(attrs={'required': True})
     count = forms.DecimalField(required=True, initial=1, min_value=1)
+
+    def __init__(self, *args, catalog=None, category_choices=None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        catalog = catalog or get_stock_catalog()
+        if category_choices is None:
+            category_choices = get_category_choices()
+        self.fields['category'].choices = lambda: category_choices
+        self.fields['item'].set_choices(catalog.pk_choices,
+                                        catalog.pk_strings)
+
+
+class BaseOrderItemFormSet(BaseCatalogFormSet):
+    """
+    Набор форм товаров покупки с общими списками выбора.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.category_choices = get_category_choices()
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['category_choices'] = self.category_choices
+        return kwargs
+
+    def clean(self):
+        super().clean()
+        forms_with_items = [form for form in self.forms
+                            if form.cleaned_data.get('item')]
+        stocks = Stock.objects.in_bulk({int(form.cleaned_data['item'])
+                                        for form in forms_with_items})
+        for form in forms_with_items:
+            stock = stocks.get(int(form.cleaned_data['item']))
+            if stock is None:
+                raise forms.ValidationError(_('Товар не найден'))
+            form.cleaned_data['item'] = stock
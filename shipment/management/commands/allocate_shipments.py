@@ -0,0 +1,74 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shipment.allocation import POLICIES, Demand, allocate, plan_allocation
+from shipment.approval import ApprovalConflict, PlanOutdated
+
+
+def random_demand(lines, stocks, lines_per_shipment=5, seed=0):
+    """
+    Случайный спрос для замера: товара хватает примерно
+    на половину строк.
+    """
+    rng = random.Random(seed)
+    demand = Demand()
+    supply = [rng.randint(0, lines * 3 // stocks) for i in range(stocks)]
+    date = datetime.datetime(2020, 1, 1)
+    for k in range(lines // lines_per_shipment):
+        demand.add_shipment(k + 1, date + datetime.timedelta(minutes=k),
+                            rng.randint(0, 3))
+        for stock_id in rng.sample(range(stocks), lines_per_shipment):
+            demand.add_line(stock_id, rng.randint(1, 5), supply[stock_id])
+    return demand
+
+
+class Command(BaseCommand):
+    help = ('Allocates scarce stock between shipments awaiting approval '
+            'and optionally approves the allocated shipments')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', choices=POLICIES, default='fifo')
+        parser.add_argument('--commit', action='store_true',
+                            help='Approve allocated shipments')
+        parser.add_argument('--benchmark', type=int, metavar='LINES',
+                            help='Time all policies on random demand '
+                                 'instead of the database')
+        parser.add_argument('--stocks', type=int, default=2000,
+                            help='Stocks in the benchmark demand')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['stocks'])
+        started = time.perf_counter()
+        plan = plan_allocation(options['policy'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{len(plan.demand)} lines, '
+                          f'{len(plan.approved)} shipments allocated, '
+                          f'{len(plan.rejected)} short '
+                          f'({elapsed * 1000:.1f} ms)')
+        for pk, lines in plan.shortages().items():
+            self.stdout.write(f'  shipment {pk}: ' + ', '.join(
+                f'{line.name} short by {line.shortfall}' for line in lines))
+        if options['commit']:
+            try:
+                plan.commit()
+            except (ApprovalConflict, PlanOutdated):
+                raise CommandError('Shipments or stock changed, '
+                                   'run the allocation again')
+            self.stdout.write(self.style.SUCCESS(
+                f'OK - {len(plan.approved)} shipments approved'))
+
+    def benchmark(self, lines, stocks):
+        demand = random_demand(lines, stocks)
+        self.stdout.write(f'{len(demand)} lines, '
+                          f'{len(demand.shipments)} shipments, '
+                          f'{stocks} stocks')
+        for policy in POLICIES:
+            started = time.perf_counter()
+            plan = allocate(demand, policy)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {policy:10} {len(plan.approved):7} filled '
+                              f'{elapsed * 1000:10.1f} ms')
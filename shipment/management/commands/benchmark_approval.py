@@ -0,0 +1,123 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from category.models import Category
+from common.models import ShipmentStock
+from common.versions import bump_version
+from customer.models import Customer
+from shipment.approval import (approve_shipments, confirmation_email,
+                               confirmation_link)
+from shipment.availability import shipment_shortages
+from shipment.models import Shipment
+from shipment.tokens import hash_token, make_token, token_hint
+from warehouse.catalog import CATALOG_VERSION
+from warehouse.models import Stock, StockMovement
+from warehouse.services import change_stock
+
+
+def legacy_approve(shipment_ids):
+    # прежний порядок: проверка, резерв, письмо и сохранение
+    # для каждой покупки отдельно, как в форме покупки
+    approved = 0
+    for shipment in (Shipment
+                     .objects
+                     .filter(pk__in=shipment_ids)
+                     .select_related('customer')):
+        if shipment_shortages([shipment.pk]):
+            continue
+        reservation = {pk: -number for pk, number
+                       in (ShipmentStock
+                           .objects
+                           .filter(shipment=shipment)
+                           .values_list('stock_id', 'number'))}
+        with transaction.atomic():
+            if not change_stock(reservation, StockMovement.RESERVATION,
+                                shipment=shipment):
+                continue
+            token = make_token()
+            confirmation_email(shipment.customer.email,
+                               confirmation_link(token)).save()
+            shipment.status = Shipment.SENT
+            shipment.qr = token_hint(token)
+            shipment.token_hash = hash_token(token)
+            shipment.save()
+        approved += 1
+    return approved
+
+
+def bulk_approve(shipment_ids):
+    return len(approve_shipments(shipment_ids).approved)
+
+
+class Command(BaseCommand):
+    help = ('Measures shipments/sec of approving shipments one by one '
+            'and with the bulk approval action '
+            '(all changes are rolled back)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shipments', type=int, default=1000)
+        parser.add_argument('--lines', type=int, default=5,
+                            help='lines per shipment')
+        parser.add_argument('--stocks', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            shipment_ids = self.fill(options['shipments'], options['lines'],
+                                     options['stocks'])
+            self.stdout.write(f'{len(shipment_ids)} shipments, '
+                              f'{options["lines"]} lines each')
+            for title, approve in (('one by one (before)', legacy_approve),
+                                   ('bulk action', bulk_approve)):
+                with transaction.atomic():
+                    elapsed, count, approved = self.measure(approve,
+                                                            shipment_ids)
+                    self.stdout.write(
+                        f'  {title:20} {approved:6} approved '
+                        f'{count:7} queries {elapsed:8.2f} s '
+                        f'{approved / elapsed:10.1f} shipments/sec')
+                    transaction.set_rollback(True)
+            transaction.set_rollback(True)
+
+    def fill(self, shipments, lines, stocks):
+        category = Category.objects.create(name='benchmark-approval')
+        customer = Customer.objects.create(full_name='benchmark',
+                                           phone_number='0',
+                                           email='benchmark@example.com')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        # товара хватает примерно на 90% покупок
+        number = shipments * lines * 3 * 9 // (stocks * 10)
+        Stock.objects.bulk_create(
+            Stock(article=start + i, name=f'benchmark-approval {i}',
+                  price=i % 100 + 1, number=number, category=category)
+            for i in range(stocks))
+        # bulk_create не отправляет сигналы товара
+        bump_version(CATALOG_VERSION)
+        stock_ids = list(Stock.objects.filter(category=category)
+                         .values_list('pk', flat=True))
+        Shipment.objects.bulk_create(Shipment(customer=customer)
+                                     for i in range(shipments))
+        shipment_ids = list(Shipment.objects.filter(customer=customer)
+                            .order_by('pk').values_list('pk', flat=True))
+        ShipmentStock.objects.bulk_create(
+            ShipmentStock(shipment_id=pk,
+                          stock_id=stock_ids[(i * lines + j) % stocks],
+                          number=3)
+            for i, pk in enumerate(shipment_ids) for j in range(lines))
+        return shipment_ids
+
+    def measure(self, approve, shipment_ids):
+        count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            approved = approve(shipment_ids)
+            elapsed = time.perf_counter() - started
+        return elapsed, count, approved
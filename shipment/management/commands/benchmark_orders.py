@@ -0,0 +1,126 @@
+import multiprocessing
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from category.models import Category
+from common.models import ShipmentStock
+from customer.models import Customer
+from shipment.models import Shipment
+from shipment.orders import place_order
+from warehouse.models import Stock
+
+
+def legacy_order(customer, items, idempotency_key=None):
+    # прежний порядок записи: покупка и каждая строка
+    # в отдельной транзакции, без ключа заявки
+    shipment = Shipment.objects.create(customer=customer)
+    for stock, count in items.items():
+        ShipmentStock.objects.create(shipment=shipment, stock=stock,
+                                     number=count)
+    return shipment, True
+
+
+MODES = {'legacy': legacy_order, 'atomic': place_order}
+
+
+def run_worker(mode, customer_id, stock_ids, orders, lines, seed):
+    """
+    Процесс нагрузки: заявки со случайными товарами; в режиме atomic
+    каждая заявка отправляется дважды с одним ключом.
+    """
+    rng = random.Random(seed)
+    customer = Customer.objects.get(pk=customer_id)
+    stocks = list(Stock.objects.filter(pk__in=stock_ids))
+    submit = MODES[mode]
+    stats = {'created': 0, 'duplicate': 0, 'retry': 0}
+    for i in range(orders):
+        items = {stock: rng.randint(1, 5)
+                 for stock in rng.sample(stocks, lines)}
+        key = uuid.uuid4().hex if mode == 'atomic' else None
+        for attempt in range(2 if key else 1):
+            while True:
+                try:
+                    shipment, created = submit(customer, items, key)
+                    break
+                except OperationalError:
+                    # SQLite: база занята другим процессом дольше таймаута
+                    stats['retry'] += 1
+                    time.sleep(rng.random() / 100)
+            stats['created' if created else 'duplicate'] += 1
+    connections.close_all()
+    return stats
+
+
+class Command(BaseCommand):
+    help = ('Measures orders/sec of the old per-line order writes and '
+            'the atomic bulk order path with parallel workers '
+            '(test data is deleted afterwards)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--orders', type=int, default=100,
+                            help='orders per worker')
+        parser.add_argument('--lines', type=int, default=10,
+                            help='lines per order')
+        parser.add_argument('--mode', choices=['legacy', 'atomic', 'both'],
+                            default='both')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+                mode = cursor.fetchone()[0]
+            self.stdout.write(f'SQLite journal mode: {mode}')
+        suffix = int(time.time())
+        category = Category.objects.create(name=f'benchmark-orders-{suffix}')
+        customer = Customer.objects.create(full_name=category.name,
+                                           phone_number='0',
+                                           email='benchmark@example.com')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        stocks = [Stock.objects.create(article=start + i,
+                                       name=f'{category.name}-{i}',
+                                       price=1, number=1000,
+                                       category=category)
+                  for i in range(max(options['lines'], 20))]
+        stock_ids = [stock.pk for stock in stocks]
+        modes = (['legacy', 'atomic'] if options['mode'] == 'both'
+                 else [options['mode']])
+        try:
+            for mode in modes:
+                self.run(mode, customer.pk, stock_ids, options)
+        finally:
+            customer.delete()
+            category.delete()
+
+    def run(self, mode, customer_id, stock_ids, options):
+        connections.close_all()
+        tasks = [(mode, customer_id, stock_ids, options['orders'],
+                  options['lines'], seed)
+                 for seed in range(options['workers'])]
+        before = Shipment.objects.filter(customer_id=customer_id).count()
+        connections.close_all()
+        started = time.perf_counter()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['workers']) as pool:
+            results = pool.starmap(run_worker, tasks)
+        elapsed = time.perf_counter() - started
+        stats = {'created': 0, 'duplicate': 0, 'retry': 0}
+        for worker_stats in results:
+            for key, value in worker_stats.items():
+                stats[key] += value
+        shipments = (Shipment.objects.filter(customer_id=customer_id).count()
+                     - before)
+        self.stdout.write(f'{mode:7} {stats["created"]} orders in '
+                          f'{elapsed:.2f} s '
+                          f'({stats["created"] / elapsed:.0f} orders/sec), '
+                          f'{stats["duplicate"]} duplicates ignored, '
+                          f'{stats["retry"]} retried on lock')
+        if shipments != stats['created']:
+            raise CommandError(f'{shipments} shipments stored for '
+                               f'{stats["created"]} orders')
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Ключ заявки'),
+        ),
+    ]
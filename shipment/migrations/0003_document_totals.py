@@ -0,0 +1,40 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+def fill_shipment_totals(apps, schema_editor):
+    Shipment = apps.get_model('shipment', 'Shipment')
+    ShipmentStock = apps.get_model('common', 'ShipmentStock')
+    totals = {}
+    for shipment_id, price, number in ShipmentStock.objects.values_list(
+            'shipment_id', 'stock__price', 'number'):
+        total, count = totals.get(shipment_id, (0, 0))
+        totals[shipment_id] = (total + price * number, count + 1)
+    Shipment.objects.bulk_update(
+        (Shipment(pk=pk, total=total, line_count=count)
+         for pk, (total, count) in totals.items()),
+        ('total', 'line_count'), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0002_idempotency_key'),
+        ('common', '0004_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='line_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Количество позиций'),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='total',
+            field=models.FloatField(db_index=True, default=0, verbose_name='Сумма покупки'),
+        ),
+        migrations.RunPython(fill_shipment_totals,
+                             migrations.RunPython.noop),
+    ]
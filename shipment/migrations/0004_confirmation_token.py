@@ -0,0 +1,34 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:13
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_confirmation_codes(apps, schema_editor):
+    # ссылки из уже отправленных писем продолжают работать,
+    # а в базе остается только хэш и начало кода
+    Shipment = apps.get_model('shipment', 'Shipment')
+    shipments = list(Shipment.objects.exclude(qr__isnull=True).exclude(qr=''))
+    for shipment in shipments:
+        shipment.token_hash = hashlib.sha256(shipment.qr.encode()).hexdigest()
+        shipment.qr = shipment.qr[:8]
+    Shipment.objects.bulk_update(shipments, ('qr', 'token_hash'),
+                                 batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0003_document_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='token_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True, verbose_name='Хэш кода подтверждения'),
+        ),
+        migrations.RunPython(hash_confirmation_codes,
+                             migrations.RunPython.noop),
+    ]
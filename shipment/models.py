@@ -5,11 +5,6 @@ from django.utils.translation import gettext as _
 from common.models import format_date
 
 
-def get_shipment_total(obj):
-    return sum([row.stock.price * row.number
-                for row in obj.shipmentstock_set.all()])
-
-
 class Shipment(models.Model):
     """
     Таблица покупок.
@@ -33,9 +28,25 @@ class Shipment(models.Model):
                               default=CREATED)
     date = models.DateTimeField(auto_now_add=True,
                                 verbose_name=_('Дата покупки'))
+    # начало кода подтверждения для кладовщика; сам код не хранится
     qr = models.TextField(null=True, verbose_name=_('Код подтверждения'))
+    # SHA-256 кода подтверждения из ссылки в письме покупателю
+    token_hash = models.CharField(max_length=64, unique=True, null=True,
+                                  editable=False,
+                                  verbose_name=_('Хэш кода подтверждения'))
     stocks = models.ManyToManyField('warehouse.Stock',
                                     through='common.ShipmentStock')
+    # ключ, который клиент передает с заявкой: повторная отправка
+    # той же заявки не создает вторую покупку
+    idempotency_key = models.CharField(max_length=64, unique=True,
+                                       null=True, blank=True, editable=False,
+                                       verbose_name=_('Ключ заявки'))
+    # сумма и количество строк покупки, обновляются вместе со строками
+    # (common.documents)
+    total = models.FloatField(default=0, db_index=True,
+                              verbose_name=_('Сумма покупки'))
+    line_count = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name=_('Количество позиций'))
 
     def __str__(self):
         return (format_date(self.date) + ', '
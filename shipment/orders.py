@@ -0,0 +1,58 @@
+from django.db import IntegrityError, transaction
+
+from common.documents import refresh_shipment_totals
+from common.models import ShipmentStock
+
+from .models import Shipment
+
+IDEMPOTENCY_KEY_LENGTH = 64
+
+
+def clean_idempotency_key(value):
+    """
+    Ключ заявки из запроса (пустой или слишком длинный ключ
+    не используется).
+    """
+    value = (value or '').strip()
+    if not value or len(value) > IDEMPOTENCY_KEY_LENGTH:
+        return None
+    return value
+
+
+def place_order(customer, items, idempotency_key=None):
+    """
+    Создание покупки со строками в одной транзакции.
+
+    customer - покупатель (несохраненный покупатель сохраняется в той же
+    транзакции), items - словарь {товар: количество}. Если покупка
+    с таким ключом уже есть, ничего не записывается.
+
+    Возвращает пару (покупка, создана ли она).
+    """
+    if idempotency_key is not None:
+        shipment = Shipment.objects.filter(
+            idempotency_key=idempotency_key).first()
+        if shipment is not None:
+            return shipment, False
+    try:
+        with transaction.atomic():
+            if customer.pk is None:
+                customer.save()
+            shipment = Shipment.objects.create(
+                customer=customer, idempotency_key=idempotency_key)
+            ShipmentStock.objects.bulk_create(
+                ShipmentStock(shipment=shipment, stock=stock,
+                              number=int(count))
+                for stock, count in items.items())
+            # bulk_create не отправляет сигналы строк
+            refresh_shipment_totals([shipment.pk])
+    except IntegrityError:
+        # параллельная отправка той же заявки успела раньше
+        if idempotency_key is None:
+            raise
+        shipment = Shipment.objects.filter(
+            idempotency_key=idempotency_key).first()
+        if shipment is None:
+            raise
+        return shipment, False
+    return shipment, True
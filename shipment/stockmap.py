@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from category.tree import get_category_tree
+from warehouse.catalog import get_stock_catalog
+
+# время хранения карты в кэше (карта старой версии больше не читается)
+STOCK_MAP_TIMEOUT = 24 * 60 * 60
+
+
+class StockMap:
+    """
+    Закэшированный ответ со списком товаров категории
+    (или картой всех категорий) и его заголовки для условного GET.
+    """
+
+    def __init__(self, body, modified):
+        self.body = body
+        self.gzip_body = gzip.compress(body)
+        self.etag = '"%s"' % hashlib.md5(body).hexdigest()
+        self.gzip_etag = self.etag[:-1] + '-gzip"'
+        self.modified = modified
+
+
+def _category_stocks(catalog, tree):
+    # товары каждой категории вместе с товарами подкатегорий
+    own = {}
+    for pk, category_id in catalog.category.items():
+        own.setdefault(category_id, []).append(pk)
+    return {pk: sorted(stock_id
+                       for category_id in tree.subtree(pk)
+                       for stock_id in own.get(category_id, ()))
+            for pk in tree.order}
+
+
+def _build(catalog, tree, category):
+    names = dict(catalog.pk_choices[1:])
+    if category is None:
+        # компактная карта: наименования товаров и id товаров категорий
+        data = {'stocks': names,
+                'categories': _category_stocks(catalog, tree)}
+    else:
+        data = {pk: names[pk] for pk, category_id in catalog.category.items()
+                if category_id in tree.subtree(category)}
+    body = json.dumps(data, ensure_ascii=False,
+                      separators=(',', ':')).encode()
+    return StockMap(body, timezone.now())
+
+
+def get_stock_map(category=None):
+    """
+    Список товаров категории category {id: наименование}
+    или, без категории, карта всех категорий.
+
+    Ответ строится из каталога товаров и дерева категорий в памяти
+    и хранится в общем кэше с ключом по версиям каталога и дерева,
+    поэтому дата изменения одинакова во всех процессах.
+    Неизвестная категория - KeyError.
+    """
+    catalog = get_stock_catalog()
+    tree = get_category_tree()
+    if category is not None and category not in tree:
+        raise KeyError(category)
+    key = (f'stock-map:{catalog.version}:{tree.version}:'
+           f'{"all" if category is None else category}')
+    stock_map = cache.get(key)
+    if stock_map is None:
+        stock_map = _build(catalog, tree, category)
+        cache.add(key, stock_map, STOCK_MAP_TIMEOUT)
+        stock_map = cache.get(key, stock_map)
+    return stock_map
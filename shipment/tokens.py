@@ -0,0 +1,45 @@
+import hashlib
+import re
+import secrets
+
+from .models import Shipment
+
+# код подтверждения: 32 случайных байта в base64url (43 символа)
+TOKEN_BYTES = 32
+# в базе хранится только SHA-256 кода; старые коды (id + uuid4)
+# короче, но состоят из тех же символов
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# начало кода, которое показывается в интерфейсе кладовщика
+TOKEN_HINT_LENGTH = 8
+
+
+def make_token():
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_hint(token):
+    return token[:TOKEN_HINT_LENGTH]
+
+
+def is_token_valid(token):
+    """
+    Проверка формата кода без обращения к базе данных.
+    """
+    return bool(TOKEN_PATTERN.match(token or ''))
+
+
+def find_shipment(token):
+    """
+    Покупка по коду подтверждения одним запросом по уникальному
+    индексу хэша; None, если код неверный.
+    """
+    if not is_token_valid(token):
+        return None
+    try:
+        return Shipment.objects.get(token_hash=hash_token(token))
+    except Shipment.DoesNotExist:
+        return None
@@ -8,6 +8,8 @@ urlpatterns = [path('shipment_confirmation/<str:qr>/',
                     views.ShipmentConfirmation.as_view(),
                     name='shipment_confirmation'),
                path('order', views.OrderView.as_view(), name='order'),
+               path('order/stocks', views.StockMapView.as_view(),
+                    name='stock_map'),
                path('order_successful',
                     views.OrderSuccessfulView.as_view(),
                     name='order_successful'),
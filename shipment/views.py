@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib import messages
 from django.forms import formset_factory
 from django.urls import reverse
@@ -5,22 +7,30 @@ from django.conf import settings
 from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
 from django.views.generic import View, TemplateView
-from django.core.mail import EmailMultiAlternatives
 from django.utils.translation import gettext as _
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 
-from category.models import Category
-from warehouse.models import Stock
 from .models import Shipment
-from .forms import OrderItemForm
+from .forms import OrderItemForm, BaseOrderItemFormSet
 from .forms import OrderCustomerSelectForm
+from .orders import clean_idempotency_key, place_order
+from .stockmap import get_stock_map
+from .tokens import find_shipment, hash_token, is_token_valid
 from customer.forms import CustomerForm
-from common.models import ShipmentStock
+from common.outbox import queue_email
+from common.ratelimit import RateLimit, client_ip
 
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date
 
-from socket import error as socket_base_error
+# ограничение частоты запросов подтверждения покупки
+confirmation_ip_limit = RateLimit('confirmation-ip',
+                                  settings.CONFIRMATION_RATE_PER_IP)
+confirmation_token_limit = RateLimit('confirmation-token',
+                                     settings.CONFIRMATION_RATE_PER_TOKEN)
 
 
 def shipment_success(request):
@@ -35,7 +45,9 @@ class OrderView(View):
     """
     Class-based view для обработки страницы покупки.
     """
-    OrderItemFormSet = formset_factory(OrderItemForm, min_num=1, extra=0)
+    OrderItemFormSet = formset_factory(OrderItemForm,
+                                       formset=BaseOrderItemFormSet,
+                                       min_num=1, extra=0)
 
     def post(self, request):
         customer_form = CustomerForm(request.POST)
@@ -48,18 +60,16 @@ class OrderView(View):
             if request.POST.get('reg'):
                 customer = customer_selectform.cleaned_data.get('customer')
             else:
-                customer = customer_form.save()
-
-            sh = Shipment.objects.create(customer=customer)
+                # покупатель сохраняется вместе с покупкой
+                customer = customer_form.save(commit=False)
 
             stocks = dict()
             for form in item_formset:
                 name = form.cleaned_data['item']
                 stocks[name] = (stocks.get(name, 0)
                                 + form.cleaned_data.get('count'))
-            for stock, count in stocks.items():
-                ShipmentStock.objects.create(shipment=sh, stock=stock,
-                                             number=count)
+            key = clean_idempotency_key(request.POST.get('idempotency_key'))
+            place_order(customer, stocks, key)
 
             messages.info(request, _('Заявка отправлена'))
             return redirect('shipment:order_successful')
@@ -68,16 +78,6 @@ class OrderView(View):
             return redirect('shipment:order')
 
     def get(self, request):
-        if self.request.is_ajax():
-            cat = request.GET['category']
-            if cat:
-                category = (Category
-                            .objects
-                            .get(pk=cat).get_descendants(include_self=True))
-                stock = Stock.objects.filter(category__in=category)
-                stock_dict = {k: v for k, v in stock.values_list('pk', 
-                                                                 'name')}
-            return JsonResponse(stock_dict)
         customer_form = CustomerForm()
         item_formset = self.OrderItemFormSet()
         customer_selectform = OrderCustomerSelectForm()
@@ -85,10 +85,50 @@ class OrderView(View):
             'customer_form': customer_form,
             'item_formset': item_formset,
             'customer_selectform': customer_selectform,
+            'idempotency_key': uuid.uuid4().hex,
+            'preload_stock_map': settings.ORDER_PRELOAD_STOCK_MAP,
         }
         return render(request, 'shipment/order.html', context)
 
 
+class StockMapView(View):
+    """
+    Списки товаров для страницы покупки: товары категории
+    (?category=id) или карта всех категорий.
+
+    Ответ кэшируется по версии каталога и отдается с ETag
+    и Last-Modified, повторный запрос без изменений получает 304.
+    """
+
+    def get(self, request):
+        category = request.GET.get('category') or None
+        if category is not None and not category.isdecimal():
+            raise Http404(_('Категория не найдена'))
+        try:
+            stock_map = get_stock_map(category and int(category))
+        except KeyError:
+            raise Http404(_('Категория не найдена'))
+        compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        etag = stock_map.gzip_etag if compress else stock_map.etag
+        last_modified = int(stock_map.modified.timestamp())
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified)
+        if response is None:
+            if compress:
+                response = HttpResponse(stock_map.gzip_body,
+                                        content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(stock_map.body,
+                                        content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # браузер хранит ответ, но проверяет его при каждом запросе
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        return response
+
+
 class OrderSuccessfulView(View):
     """
     Class-based view для обработки перенаправления после покупки.
@@ -105,16 +145,19 @@ class ShipmentConfirmation(TemplateView):
     template_name = 'shipment/shipment_confirmation.html'
 
     def get(self, request, qr):
-        if qr and Shipment.objects.filter(qr=qr).exists():
-            shipment = Shipment.objects.get(qr=qr)
+        # неверные и повторяющиеся коды отсекаются до обращения к базе
+        if not confirmation_ip_limit.hit(client_ip(request)):
+            return HttpResponse(_('Слишком много запросов'), status=429)
+        if not is_token_valid(qr):
+            raise Http404(_('Покупка не найдена'))
+        if not confirmation_token_limit.hit(hash_token(qr)):
+            return HttpResponse(_('Слишком много запросов'), status=429)
+        shipment = find_shipment(qr)
+        if shipment is not None:
             if shipment.status == Shipment.SENT:
-                try:
-                    self.send_email_to_admin(shipment)
-                    messages.info(request, 
-                                  _('Покупка подтверждена, спасибо!'))
-                except socket_base_error:
-                    messages.error(request,
-                                   _('Не удалось подключиться к сети'))
+                self.send_email_to_admin(shipment)
+                messages.info(request,
+                              _('Покупка подтверждена, спасибо!'))
                 return render(request, template_name=self.template_name)
         raise Http404(_('Покупка не найдена'))
 
@@ -123,11 +166,8 @@ class ShipmentConfirmation(TemplateView):
                  + reverse('admin:shipment_shipment_change',
                            args=(shipment.id,)))
         body = render_to_string('shipment/email_to_admin.txt', {'link': link})
-        message = EmailMultiAlternatives(subject=_('Погрузка доставлена'),
-                                         body=body,
-                                         to=[settings.ADMINS[0][1], ])
         template_html = 'shipment/email_to_admin.html'
-        message.attach_alternative(render_to_string(template_html,
-                                                    {'link': link}), 
-                                   "text/html")
-        message.send()
+        # письмо отправляется командой deliver_outbox
+        queue_email(_('Погрузка доставлена'), [settings.ADMINS[0][1], ],
+                    body, html=render_to_string(template_html,
+                                                {'link': link}))
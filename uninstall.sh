@@ -1,8 +1,10 @@
 #!/bin/bash
 docker stop nginx-custom
 docker stop web
+docker stop outbox
 docker rm nginx-custom
 docker rm web
+docker rm outbox
 docker image rm -f warehouse
 docker volume rm StaticVolume
 docker volume rm DatabaseVolume
@@ -49,6 +49,34 @@ SERVER_EMAIL = os.environ.get('SERVER_EMAIL')
 
 ADMINS = [('Admin', os.environ.get('ADMIN_EMAIL'))]
 
+# загружать карту категория -> товары один раз при открытии
+# страницы покупки вместо запроса на каждую смену категории
+ORDER_PRELOAD_STOCK_MAP = os.environ.get('ORDER_PRELOAD_STOCK_MAP',
+                                         '1') == '1'
+
+# не больше стольких запросов подтверждения покупки в минуту
+# с одного IP-адреса и по одному коду подтверждения
+CONFIRMATION_RATE_PER_IP = int(os.environ.get('CONFIRMATION_RATE_PER_IP',
+                                              30))
+CONFIRMATION_RATE_PER_TOKEN = int(
+    os.environ.get('CONFIRMATION_RATE_PER_TOKEN', 5))
+
+# ключ request.META с адресом клиента, который передает прокси-сервер
+# (HTTP_X_REAL_IP за nginx); без прокси - REMOTE_ADDR
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', 'REMOTE_ADDR')
+
+# записывать историю действий фоновым потоком после фиксации
+# транзакции; в очереди не больше ACTION_LOG_QUEUE_SIZE записей
+ACTION_LOG_ASYNC = os.environ.get('ACTION_LOG_ASYNC', '0') == '1'
+ACTION_LOG_QUEUE_SIZE = int(os.environ.get('ACTION_LOG_QUEUE_SIZE', 10000))
+
+# записи истории действий старше стольких дней переносятся
+# командой archive_action_log в помесячные архивы
+ACTION_LOG_RETENTION_DAYS = int(os.environ.get('ACTION_LOG_RETENTION_DAYS',
+                                               365))
+ACTION_LOG_ARCHIVE_DIR = os.environ.get(
+    'ACTION_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'database', 'actionlog'))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -111,6 +139,31 @@ DATABASES = {
     }
 }
 
+# Общий для всех процессов gunicorn кэш
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'database', 'cache'),
+    },
+    # версии данных, по которым процессы сбрасывают свои индексы
+    # в памяти; в отдельном хранилище, чтобы вытеснение других
+    # ключей не удаляло версии
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'database', 'versions'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # счетчики ограничения частоты запросов: в памяти процесса,
+    # вытеснение затрагивает только их
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RATELIMIT_ENTRIES',
+                                                      100000))},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -1,11 +1,16 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.http import Http404
+from django.urls import path
 
 from django.utils.translation import gettext as _
 
-from .models import Stock
+from .models import LowStock, Stock, StockMovement
 
 from .filters import StockCategoryFilter, StockEmptyFilter
 from .filters import StockPriceFilter
+from .export import EXPORT_FORMATS, stock_export_response
+from .search import search_stocks
 
 
 @admin.register(Stock)
@@ -13,7 +18,8 @@ class StockAdmin(admin.ModelAdmin):
     """
     Отображение списка товаров.
     """
-    list_display = ('article', 'name', 'price', 'number', 'category',)
+    list_display = ('article', 'name', 'price', 'number', 'reorder_level',
+                    'category',)
     list_display_links = ('name',)
     search_fields = ('article', 'name',)
     ordering = ('category', 'name',)
@@ -22,6 +28,92 @@ class StockAdmin(admin.ModelAdmin):
     verbose_name_plural = _('Товары')
     list_filter = (StockPriceFilter, ('category', StockCategoryFilter),
                    StockEmptyFilter)
+    actions = ('export_csv', 'export_ndjson',)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/<str:export_format>/',
+                 self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_view(self, request, export_format):
+        """
+        Выгрузка всех товаров с учетом фильтров, поиска
+        и сортировки списка.
+        """
+        if (export_format not in EXPORT_FORMATS
+                or not self.has_view_or_change_permission(request)):
+            raise Http404
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            raise Http404
+        return stock_export_response(changelist.queryset, export_format)
+
+    def export_csv(self, request, queryset):
+        return stock_export_response(queryset, 'csv')
+    export_csv.short_description = _('Выгрузить выбранные товары (CSV)')
+
+    def export_ndjson(self, request, queryset):
+        return stock_export_response(queryset, 'ndjson')
+    export_ndjson.short_description = _('Выгрузить выбранные товары '
+                                        '(NDJSON)')
+
+    def get_search_results(self, request, queryset, search_term):
+        # поиск через полнотекстовый индекс, если он доступен
+        result = search_stocks(queryset, search_term)
+        if result is None:
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return result, False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """
+    Журнал движения товаров (только просмотр).
+    """
+    list_display = ('date', 'stock', 'kind', 'delta', 'cargo', 'shipment',)
+    list_filter = ('kind', 'date',)
+    list_select_related = ('stock', 'cargo__supplier', 'shipment__customer',)
+    search_fields = ('stock__name',)
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LowStock)
+class LowStockAdmin(admin.ModelAdmin):
+    """
+    Заканчивающиеся товары (только просмотр).
+    """
+    list_display = ('stock', 'stock_number', 'stock_reorder_level', 'date',
+                    'notified',)
+    list_select_related = ('stock',)
+    search_fields = ('stock__name',)
+
+    def stock_number(self, obj):
+        return obj.stock.number
+    stock_number.short_description = _('Количество на складе')
+
+    def stock_reorder_level(self, obj):
+        return obj.stock.reorder_level
+    stock_reorder_level.short_description = _('Минимальный остаток')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 admin.site.site_header = _('Администрирование склада')
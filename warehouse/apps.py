@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_stock_search(sender, using='default', **kwargs):
+    from .search import install_search_index
+    install_search_index(using)
 
 
 class WarehouseConfig(AppConfig):
     name = 'warehouse'
     verbose_name = 'Склад'
+
+    def ready(self):
+        import warehouse.signals
+        post_migrate.connect(install_stock_search, sender=self)
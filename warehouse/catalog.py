@@ -0,0 +1,56 @@
+import threading
+
+from common.versions import get_version
+
+from .models import Stock
+
+CATALOG_VERSION = 'stock-catalog'
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+class StockCatalog:
+    """
+    Список товаров (id, наименование, категория) в памяти процесса
+    для списков выбора в формах.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        rows = list(rows)
+        # список выбора по id (с пустым значением) и по наименованию
+        self.pk_choices = (('', '---------'), ) + tuple(
+            (pk, name) for pk, name, category_id in rows)
+        self.name_choices = tuple((name, name)
+                                  for pk, name, category_id in rows)
+        # значения из формы приходят строками
+        self.pk_strings = frozenset(str(pk) for pk, name, category_id in rows)
+        self.names = frozenset(name for pk, name, category_id in rows)
+        self.category = {pk: category_id for pk, name, category_id in rows}
+
+    @classmethod
+    def load(cls, version):
+        rows = (Stock
+                .objects
+                .order_by('pk')
+                .values_list('pk', 'name', 'category_id'))
+        return cls(version, rows)
+
+
+def get_stock_catalog():
+    """
+    Список товаров текущей версии каталога.
+
+    Версия увеличивается при добавлении, удалении, переименовании
+    товара или смене его категории.
+    """
+    global _catalog
+    version = get_version(CATALOG_VERSION)
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = StockCatalog.load(version)
+            catalog = _catalog
+    return catalog
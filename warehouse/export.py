@@ -0,0 +1,71 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from category.tree import get_category_tree
+
+EXPORT_FIELDS = ('article', 'name', 'price', 'number', 'category')
+# количество строк, читаемых из базы за один раз
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """
+    Псевдо-файл для csv.writer: возвращает записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stock_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки выгрузки товаров (артикул, наименование, цена, количество,
+    путь категории).
+
+    Товары читаются из базы порциями, пути категорий берутся
+    из индекса дерева, поэтому память не растет с числом строк.
+    """
+    tree = get_category_tree()
+    paths = {}
+    rows = (queryset
+            .values_list('article', 'name', 'price', 'number', 'category_id')
+            .iterator(chunk_size))
+    for article, name, price, number, category_id in rows:
+        path = paths.get(category_id)
+        if path is None:
+            path = paths[category_id] = tree.path(category_id)
+        yield article, name, price, number, path
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)),
+                         ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def stock_export_response(queryset, export_format='csv'):
+    """
+    Потоковый ответ с выгрузкой товаров queryset в формате
+    csv или ndjson.
+    """
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(stock_export_rows(queryset)),
+                                     content_type=content_type)
+    response['Content-Disposition'] = (f'attachment; '
+                                       f'filename="stocks.{export_format}"')
+    return response
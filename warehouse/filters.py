@@ -3,11 +3,11 @@ from django.utils.translation import gettext as _
 from django.utils.html import mark_safe
 
 from .forms import StockPriceFilterForm
-from category.models import Category
+from category.tree import get_category_tree
 
 from mptt.admin import TreeRelatedFieldListFilter
 
-from common.models import subtotal_value
+from common.reports import category_value
 
 
 class StockPriceFilter(ListFilter):
@@ -75,28 +75,21 @@ class StockCategoryFilter(TreeRelatedFieldListFilter):
 
     def field_choices(self, field, request, model_admin):
         mptt_level_indent = self.mptt_level_indent
-        initial_choices = field.get_choices(include_blank=False)
-        pks = [pk for pk, val in initial_choices]
-        models = field.related_model._default_manager.filter(pk__in=pks)
-        levels_dict = {model.pk: getattr(model, model._mptt_meta.level_attr)
-                       for model in models}
-        subcategories = {model.pk: model.get_descendant_count()
-                         for model in models}
+        tree = get_category_tree()
         choices = []
-        for pk, val in initial_choices:
+        for pk in tree.order:
             padding_style = ' style="padding-%s:%spx"' % (
                 'left',
-                mptt_level_indent * levels_dict[pk],)
-            choices.append((pk, val + f'({subcategories[pk]})',
+                mptt_level_indent * tree.level[pk],)
+            choices.append((pk, tree.name[pk]
+                            + f'({tree.descendant_count[pk]})',
                            mark_safe(padding_style)))
         return choices
 
     def total_value(self, obj_id):
-        if obj_id is not None:
-            obj = Category.objects.filter(id=obj_id).get()
-        else:
-            obj = None
-        return subtotal_value(obj)
+        # итоги категорий хранятся в сводной таблице,
+        # поэтому достаточно первичного ключа категории
+        return category_value(obj_id)
 
     def choices(self, cl):
         yield {
@@ -128,7 +121,8 @@ class StockEmptyFilter(SimpleListFilter):
     def lookups(self, request, model_admin):
         return (
             ('Empty', _('Нет на складе')),
-            ('Available', _('Есть на складе'))
+            ('Available', _('Есть на складе')),
+            ('Low', _('Ниже минимального остатка')),
         )
 
     def queryset(self, request, queryset):
@@ -136,3 +130,5 @@ class StockEmptyFilter(SimpleListFilter):
             return queryset.filter(number__gt=0)
         if self.value() == 'Empty':
             return queryset.filter(number__exact=0)
+        if self.value() == 'Low':
+            return queryset.filter(low_stock__isnull=False)
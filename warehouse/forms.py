@@ -2,7 +2,7 @@ from django import forms
 
 from django.utils.translation import gettext as _
 
-from .models import Stock
+from .catalog import get_stock_catalog
 
 
 class StockPriceFilterForm(forms.Form):
@@ -16,11 +16,47 @@ class StockPriceFilterForm(forms.Form):
         self.fields['price_to'].widget = forms.NumberInput(attrs=attrs)
 
 
+class SharedChoiceField(forms.ChoiceField):
+    """
+    Поле выбора, список которого общий для всех форм набора.
+
+    Список не копируется в каждую форму, а значение проверяется
+    по множеству допустимых значений, а не перебором списка.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.valid_values = frozenset()
+
+    def set_choices(self, choices, valid_values):
+        self.choices = lambda: choices
+        self.valid_values = valid_values
+
+    def valid_value(self, value):
+        return value in self.valid_values
+
+
+class BaseCatalogFormSet(forms.BaseFormSet):
+    """
+    Набор форм, которые получают общий каталог товаров:
+    количество запросов не зависит от количества форм.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog = get_stock_catalog()
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['catalog'] = self.catalog
+        return kwargs
+
+
 class StockForm(forms.Form):
     """
     Форма заказа для страниц оформления покупки и поставки.
     """
-    name = forms.ChoiceField(required=True, label=_("Товар"))
+    name = SharedChoiceField(required=True, label=_("Товар"))
     number = forms.IntegerField(min_value=1,
                                 required=True,
                                 label=_("Количество"))
@@ -29,10 +65,10 @@ class StockForm(forms.Form):
                                              'min': '1',
                                              'max': '99'})
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, catalog=None, **kwargs):
         super().__init__(*args, **kwargs)
-        choices = list(Stock.objects.values_list('name', 'name'))
-        self.fields['name'].choices = choices
+        catalog = catalog or get_stock_catalog()
+        self.fields['name'].set_choices(catalog.name_choices, catalog.names)
         self.fields['number'].initial = 1
 
 
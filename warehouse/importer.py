@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+import math
+import sys
+import time
+
+from django.db import transaction
+
+from category.models import Category
+from category.tree import TREE_VERSION, get_category_tree
+from common.documents import refresh_totals_for_stocks
+from common.models import rebuild_category_totals
+from common.versions import bump_version
+
+from .catalog import CATALOG_VERSION
+from .ledger import record_movements
+from .lowstock import refresh_low_stock
+from .models import Stock, StockMovement
+
+FIELDS = ('article', 'name', 'price', 'number', 'category')
+# количество строк, обрабатываемых за один проход
+IMPORT_CHUNK_SIZE = 1000
+# границы целых чисел в базе данных (64 бита со знаком)
+INTEGER_MIN, INTEGER_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class ImportRowError(Exception):
+    pass
+
+
+def read_csv(stream, delimiter=','):
+    """
+    Строки CSV-файла с заголовком article,name,price,number,category.
+    """
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    missing = set(FIELDS) - set(reader.fieldnames or ())
+    if missing:
+        raise ImportRowError('Missing columns: ' + ', '.join(sorted(missing)))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """
+    Строки файла JSON Lines (один объект на строку).
+    """
+    for line_num, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_num, ImportRowError(f'Invalid JSON: {error}')
+            continue
+        yield line_num, row
+
+
+def open_text(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+class ImportStats:
+    """
+    Счетчики импорта.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.categories = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def __str__(self):
+        return (f'{self.rows} rows ({self.created} created, '
+                f'{self.updated} updated, {self.unchanged} unchanged, '
+                f'{self.skipped} skipped), '
+                f'{self.categories} categories created, '
+                f'{self.elapsed:.1f} s, {self.rate:.0f} rows/sec')
+
+
+class CatalogImporter:
+    """
+    Потоковый импорт товаров и категорий.
+
+    Строки обрабатываются порциями по chunk_size: товары ищутся
+    по артикулу одним запросом на порцию и создаются/обновляются
+    через bulk_create/bulk_update. Категории ищутся по пути
+    в индексе в памяти; новые категории создаются без обновления
+    полей mptt, дерево перестраивается один раз в конце.
+    """
+
+    def __init__(self, separator='/', chunk_size=IMPORT_CHUNK_SIZE,
+                 on_error=None, on_progress=None):
+        self.separator = separator
+        self.chunk_size = chunk_size
+        self.on_error = on_error or (lambda line_num, error: None)
+        self.on_progress = on_progress or (lambda stats: None)
+        self.stats = ImportStats()
+        tree = get_category_tree()
+        # индекс {(имя, имя, ...): id категории} и {имя: id категории}
+        self._paths = {}
+        self._names = {}
+        for pk in tree.order:
+            path = tuple(tree.name[i]
+                         for i in tree.ancestors(pk, include_self=True))
+            self._paths[path] = pk
+            self._names[tree.name[pk]] = pk
+
+    def run(self, rows):
+        """
+        Импорт строк rows - пар (номер строки, словарь или ошибка).
+        """
+        with transaction.atomic():
+            with Category.objects.disable_mptt_updates():
+                chunk = []
+                for line_num, row in rows:
+                    self.stats.rows += 1
+                    try:
+                        if isinstance(row, Exception):
+                            raise row
+                        chunk.append((line_num, self._clean(row)))
+                    except ImportRowError as error:
+                        self._skip(line_num, error)
+                    if len(chunk) >= self.chunk_size:
+                        self._save_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self._save_chunk(chunk)
+            if self.stats.categories:
+                Category.objects.rebuild()
+                bump_version(TREE_VERSION)
+            if self.stats.created or self.stats.updated:
+                rebuild_category_totals()
+                bump_version(CATALOG_VERSION)
+        return self.stats
+
+    def _skip(self, line_num, error):
+        self.stats.skipped += 1
+        self.on_error(line_num, error)
+
+    def _clean(self, row):
+        try:
+            article = int(row['article'])
+            name = str(row['name']).strip()
+            price = float(row['price'])
+            number = int(row['number'])
+            path = row['category']
+        except KeyError as error:
+            raise ImportRowError(f'Missing field {error}')
+        except (TypeError, ValueError) as error:
+            raise ImportRowError(str(error))
+        if not name or len(name) > 80:
+            raise ImportRowError('Invalid name')
+        if not INTEGER_MIN <= article <= INTEGER_MAX:
+            raise ImportRowError('Article out of range')
+        if not math.isfinite(price) or number > INTEGER_MAX:
+            raise ImportRowError('Price or number out of range')
+        if price < 0 or number < 0:
+            raise ImportRowError('Negative price or number')
+        if isinstance(path, str):
+            path = path.split(self.separator)
+        path = tuple(str(part).strip() for part in path)
+        if not all(path):
+            raise ImportRowError('Invalid category path')
+        return {'article': article, 'name': name, 'price': price,
+                'number': number, 'category_id': self._category(path)}
+
+    def _category(self, path):
+        pk = self._paths.get(path)
+        if pk is not None:
+            return pk
+        parent_id = self._category(path[:-1]) if len(path) > 1 else None
+        name = path[-1]
+        if name in self._names:
+            raise ImportRowError(f'Category "{name}" already exists '
+                                 f'elsewhere in the tree')
+        category = Category(name=name, parent_id=parent_id)
+        category.save()
+        self.stats.categories += 1
+        self._paths[path] = self._names[name] = category.pk
+        return category.pk
+
+    def _save_chunk(self, chunk):
+        # последняя строка с тем же артикулом побеждает
+        rows = {}
+        for line_num, row in chunk:
+            if row['article'] in rows:
+                self._skip(rows[row['article']][0], ImportRowError(
+                    f'Article repeated on line {line_num}'))
+            rows[row['article']] = (line_num, row)
+        existing = Stock.objects.in_bulk(list(rows), field_name='article')
+        # наименования уникальны: занятые другими артикулами пропускаются
+        taken = dict(Stock
+                     .objects
+                     .filter(name__in=[row['name']
+                                       for line_num, row in rows.values()])
+                     .values_list('name', 'article'))
+        names = set()
+        created, updated, repriced, deltas = [], [], [], {}
+        for article, (line_num, row) in rows.items():
+            owner = taken.get(row['name'], article)
+            if owner != article or row['name'] in names:
+                self._skip(line_num, ImportRowError(
+                    f'Name "{row["name"]}" belongs to another article'))
+                continue
+            names.add(row['name'])
+            stock = existing.get(article)
+            if stock is None:
+                created.append(Stock(**row))
+                continue
+            if all(getattr(stock, field) == value
+                   for field, value in row.items()):
+                self.stats.unchanged += 1
+                continue
+            if stock.number != row['number']:
+                deltas[stock.pk] = row['number'] - stock.number
+            if stock.price != row['price']:
+                repriced.append(stock.pk)
+            for field, value in row.items():
+                setattr(stock, field, value)
+            updated.append(stock)
+        if created:
+            Stock.objects.bulk_create(created)
+            # SQLite не возвращает id из bulk_create
+            for pk, number in (Stock
+                               .objects
+                               .filter(article__in=[stock.article
+                                                    for stock in created])
+                               .values_list('pk', 'number')):
+                deltas[pk] = number
+        if updated:
+            Stock.objects.bulk_update(updated, ['name', 'price', 'number',
+                                                'category_id'])
+            refresh_low_stock({stock.pk: (stock.number, stock.reorder_level)
+                               for stock in updated})
+        if repriced:
+            # суммы покупок и поставок считаются по текущей цене
+            refresh_totals_for_stocks(repriced)
+        record_movements(deltas, StockMovement.ADJUSTMENT)
+        self.stats.created += len(created)
+        self.stats.updated += len(updated)
+        self.on_progress(self.stats)
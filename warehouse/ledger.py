@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from common.models import rebuild_category_totals
+
+from .models import Stock, StockMovement, StockSnapshot
+
+
+def record_movements(deltas, kind, cargo=None, shipment=None, date=None):
+    """
+    Запись движений товаров в журнал.
+
+    deltas - словарь {id товара: изменение количества}.
+    """
+    date = date or timezone.now()
+    StockMovement.objects.bulk_create(
+        StockMovement(stock_id=pk, kind=kind, delta=delta, date=date,
+                      cargo=cargo, shipment=shipment)
+        for pk, delta in deltas.items() if delta)
+
+
+def record_document_movements(movements, kind, date=None):
+    """
+    Запись движений товаров нескольких документов одним запросом.
+
+    movements - записи (id товара, изменение количества,
+    id поставки, id покупки).
+    """
+    date = date or timezone.now()
+    StockMovement.objects.bulk_create(
+        StockMovement(stock_id=pk, kind=kind, delta=delta, date=date,
+                      cargo_id=cargo_id, shipment_id=shipment_id)
+        for pk, delta, cargo_id, shipment_id in movements if delta)
+
+
+def _latest_snapshot_boundary(date=None):
+    snapshots = StockSnapshot.objects.all()
+    if date is not None:
+        snapshots = snapshots.filter(date__lte=date)
+    return snapshots.aggregate(movement_id=Max('movement_id'))['movement_id']
+
+
+def ledger_balances(stock_ids=None, date=None):
+    """
+    Остатки товаров по журналу: последний снимок
+    плюс движения после него.
+
+    Возвращает словарь {id товара: количество}; если date не указана,
+    остатки считаются на текущий момент.
+    """
+    boundary = _latest_snapshot_boundary(date)
+    snapshots = StockSnapshot.objects.filter(movement_id=boundary)
+    movements = StockMovement.objects.all()
+    if boundary is not None:
+        movements = movements.filter(id__gt=boundary)
+    if date is not None:
+        movements = movements.filter(date__lte=date)
+    if stock_ids is not None:
+        snapshots = snapshots.filter(stock_id__in=stock_ids)
+        movements = movements.filter(stock_id__in=stock_ids)
+    balances = dict(snapshots.values_list('stock_id', 'number'))
+    for pk, delta in (movements
+                      .values('stock_id')
+                      .order_by()
+                      .annotate(delta=Sum('delta'))
+                      .values_list('stock_id', 'delta')):
+        balances[pk] = balances.get(pk, 0) + delta
+    return balances
+
+
+def stock_number_at(stock_id, date):
+    """
+    Количество товара на момент date.
+    """
+    return ledger_balances([stock_id], date).get(stock_id, 0)
+
+
+def take_snapshot():
+    """
+    Снимок остатков всех товаров по журналу.
+
+    Снимки делаются для всех товаров сразу, поэтому у всех строк
+    снимка одинаковый movement_id.
+    """
+    with transaction.atomic():
+        boundary = (StockMovement
+                    .objects
+                    .aggregate(movement_id=Max('id'))['movement_id'])
+        if boundary is None:
+            return 0
+        if boundary == _latest_snapshot_boundary():
+            return 0
+        balances = ledger_balances()
+        date = timezone.now()
+        snapshots = [StockSnapshot(stock_id=pk, number=number, date=date,
+                                   movement_id=boundary)
+                     for pk, number in balances.items()]
+        StockSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def find_discrepancies():
+    """
+    Товары, у которых количество на складе не совпадает с журналом.
+
+    Возвращает словарь {id товара: (количество на складе,
+    количество по журналу)}.
+    """
+    balances = ledger_balances()
+    return {pk: (number, balances.get(pk, 0))
+            for pk, number in Stock.objects.values_list('pk', 'number')
+            if number != balances.get(pk, 0)}
+
+
+def rebuild_stock_numbers():
+    """
+    Пересчет количества товаров на складе по журналу.
+    """
+    with transaction.atomic():
+        discrepancies = find_discrepancies()
+        stocks = [Stock(pk=pk, number=balance)
+                  for pk, (number, balance) in discrepancies.items()]
+        Stock.objects.bulk_update(stocks, ['number'], batch_size=500)
+        if stocks:
+            rebuild_category_totals()
+    return discrepancies
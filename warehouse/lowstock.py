@@ -0,0 +1,146 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from category.tree import get_category_tree
+from common.models import SupplierCategory
+
+from .models import LowStock, Stock
+
+# количество id в одном запросе удаления
+LOW_STOCK_BATCH_SIZE = 500
+
+
+def refresh_low_stock(levels):
+    """
+    Обновление списка заканчивающихся товаров по измененным товарам.
+
+    levels - словарь {id товара: (количество, минимальный остаток)};
+    проверяются только переданные товары.
+    """
+    low, recovered = [], []
+    for pk, (number, reorder_level) in levels.items():
+        if number < reorder_level:
+            low.append(pk)
+        else:
+            recovered.append(pk)
+    if low:
+        LowStock.objects.bulk_create((LowStock(stock_id=pk) for pk in low),
+                                     ignore_conflicts=True)
+    for start in range(0, len(recovered), LOW_STOCK_BATCH_SIZE):
+        (LowStock
+         .objects
+         .filter(stock_id__in=recovered[start:start + LOW_STOCK_BATCH_SIZE])
+         .delete())
+
+
+def rescan_low_stock():
+    """
+    Полное перестроение списка заканчивающихся товаров
+    (например, после изменения таблицы товаров в обход приложения).
+    """
+    (LowStock
+     .objects
+     .exclude(stock__number__lt=F('stock__reorder_level'))
+     .delete())
+    low = (Stock
+           .objects
+           .filter(number__lt=F('reorder_level'))
+           .values_list('pk', flat=True))
+    LowStock.objects.bulk_create((LowStock(stock_id=pk) for pk in low),
+                                 ignore_conflicts=True)
+    return LowStock.objects.count()
+
+
+def pending_low_stock():
+    """
+    Заканчивающиеся товары, о которых еще не сообщали,
+    сгруппированные по поставщикам: {поставщик: [товары]}.
+
+    Поставщик определяется по категории товара и ее надкатегориям;
+    товары без поставщика собираются под ключом None.
+    """
+    stocks = [row.stock for row in (LowStock
+                                    .objects
+                                    .filter(notified__isnull=True)
+                                    .select_related('stock')
+                                    .order_by('stock__article'))]
+    if not stocks:
+        return {}
+    suppliers = {}
+    for row in SupplierCategory.objects.select_related('supplier'):
+        suppliers.setdefault(row.category_id, []).append(row.supplier)
+    tree = get_category_tree()
+    batches = {}
+    for stock in stocks:
+        found = False
+        for category_id in tree.ancestors(stock.category_id,
+                                          include_self=True):
+            for supplier in suppliers.get(category_id, ()):
+                batches.setdefault(supplier, {})[stock.pk] = stock
+                found = True
+        if not found:
+            batches.setdefault(None, {})[stock.pk] = stock
+    return {supplier: list(batch.values())
+            for supplier, batch in batches.items()}
+
+
+def low_stock_message(supplier, stocks, connection=None):
+    if supplier is None:
+        receivers = [email for name, email in settings.ADMINS if email]
+    else:
+        receivers = [supplier.email]
+    body = render_to_string('warehouse/low_stock_email.txt',
+                            {'supplier': supplier, 'stocks': stocks})
+    return EmailMessage(subject=_('Товары заканчиваются'), body=body,
+                        to=receivers, connection=connection)
+
+
+def send_low_stock_notifications(rate=1.0, connection=None):
+    """
+    Отправка уведомлений о заканчивающихся товарах: одно письмо
+    на поставщика, все письма через одно SMTP-соединение,
+    не чаще rate писем в секунду.
+
+    Товар отмечается уведомленным после отправки писем всем его
+    поставщикам; если отправка прервалась, оставшиеся товары будут
+    отправлены при следующем запуске (товар нескольких поставщиков -
+    всем им снова). Возвращает количество отправленных писем.
+    """
+    batches = pending_low_stock()
+    if not batches:
+        return 0
+    # количество еще не отправленных писем с товаром
+    unsent = {}
+    for stocks in batches.values():
+        for stock in stocks:
+            unsent[stock.pk] = unsent.get(stock.pk, 0) + 1
+    interval = 1 / rate if rate else 0
+    last_sent = None
+    sent = 0
+    connection = connection or get_connection()
+    with connection:
+        for supplier, stocks in batches.items():
+            if last_sent is not None:
+                delay = interval - (time.monotonic() - last_sent)
+                if delay > 0:
+                    time.sleep(delay)
+            low_stock_message(supplier, stocks, connection).send()
+            last_sent = time.monotonic()
+            sent += 1
+            notified = []
+            for stock in stocks:
+                unsent[stock.pk] -= 1
+                if not unsent[stock.pk]:
+                    notified.append(stock.pk)
+            if notified:
+                (LowStock
+                 .objects
+                 .filter(stock_id__in=notified)
+                 .update(notified=timezone.now()))
+    return sent
@@ -1,9 +1,13 @@
 from django.core.management.base import BaseCommand
 import datetime
 import pytz
-from warehouse.models import Stock
+from warehouse.models import Stock, StockMovement
+from warehouse.ledger import record_movements
+from warehouse.catalog import CATALOG_VERSION
 from category.models import Category
 from common.models import SupplierCategory, CargoStock, ShipmentStock
+from common.models import rebuild_category_totals
+from common.versions import bump_version
 from supplier.models import Supplier
 from customer.models import Customer
 from shipment.models import Shipment
@@ -16,6 +20,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         self.fill_db()
+        # товары добавлены через bulk_create, минуя сигналы
+        rebuild_category_totals()
         self.stdout.write(self.style.SUCCESS('OK - data successfully added'))
 
     def fill_db(self):
@@ -65,6 +71,10 @@ class Command(BaseCommand):
                 )
 
         Stock.objects.bulk_create(stocks)
+        # bulk_create не отправляет сигналы товара
+        bump_version(CATALOG_VERSION)
+        record_movements({stock.pk: stock.number for stock in stocks},
+                         StockMovement.ADJUSTMENT)
 
         suppliers = (Supplier(pk=1, organization='LG',
                             address='680000, Хабаровск, ул. Большая, 1-1',
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from category.models import Category
+from common.versions import bump_version
+from warehouse.catalog import CATALOG_VERSION
+from warehouse.models import Stock
+from warehouse.search import search_stocks, search_supported
+
+WORDS = ('Телевизор', 'Смартфон', 'Холодильник', 'Пылесос', 'Ноутбук',
+         'Samsung', 'Sony', 'Philips', 'Bosch', 'Xiaomi', 'черный',
+         'белый', 'серебристый', 'Pro', 'Mini', 'Max')
+TERMS = ('тел', 'samsung', 'холод bosch', 'pro max', 'серебр', '1000',
+         '123456', 'ноутбук xiaomi mini')
+
+
+class Command(BaseCommand):
+    help = ('Compares full-text stock search with LIKE search '
+            'on generated data (changes are rolled back)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search_supported():
+            raise CommandError('Full-text search requires SQLite with FTS5')
+        with transaction.atomic():
+            self.fill(options['rows'])
+            for term in TERMS:
+                like_time, like_count = self.measure(
+                    lambda: self.like_search(term), options['repeat'])
+                fts_time, fts_count = self.measure(
+                    lambda: search_stocks(Stock.objects.all(), term),
+                    options['repeat'])
+                self.stdout.write(
+                    f'{term!r:24} LIKE {like_time * 1000:8.2f} ms '
+                    f'({like_count} rows)   FTS {fts_time * 1000:8.2f} ms '
+                    f'({fts_count} rows)')
+            transaction.set_rollback(True)
+
+    def fill(self, rows):
+        category = Category.objects.create(name='benchmark-search')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        random.seed(0)
+        stocks = (Stock(article=start + i,
+                        name=' '.join(random.sample(WORDS, 3)) + f' {i}',
+                        price=1, number=1, category=category)
+                  for i in range(rows))
+        Stock.objects.bulk_create(stocks)
+        # bulk_create не отправляет сигналы товара
+        bump_version(CATALOG_VERSION)
+
+    def like_search(self, term):
+        # то же условие, что строит ModelAdmin для search_fields
+        queryset = Stock.objects.all()
+        for bit in term.split():
+            queryset = queryset.filter(Q(article__icontains=bit)
+                                       | Q(name__icontains=bit))
+        return queryset
+
+    def measure(self, search, repeat):
+        # как на странице списка: количество строк и первая страница
+        started = time.perf_counter()
+        for i in range(repeat):
+            queryset = search()
+            count = queryset.count()
+            list(queryset.order_by('category', 'name')[:25])
+        return (time.perf_counter() - started) / repeat, count
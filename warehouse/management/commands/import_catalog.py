@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.importer import (IMPORT_CHUNK_SIZE, CatalogImporter,
+                                ImportRowError, open_text, read_csv,
+                                read_jsonl)
+
+
+class Command(BaseCommand):
+    help = ('Imports stocks and categories from a CSV or JSON Lines file '
+            '(columns: article, name, price, number, category path)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='input file, "-" for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='input format (default: by file extension)')
+        parser.add_argument('--delimiter', default=',',
+                            help='CSV delimiter')
+        parser.add_argument('--separator', default='/',
+                            help='category path separator')
+        parser.add_argument('--chunk-size', type=int,
+                            default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            input_format = ('jsonl' if path.endswith(('.jsonl', '.ndjson'))
+                            else 'csv')
+
+        def on_error(line_num, error):
+            self.stderr.write(f'line {line_num}: {error}')
+
+        def on_progress(stats):
+            self.stdout.write(f'{stats.rows} rows, '
+                              f'{stats.rate:.0f} rows/sec')
+
+        importer = CatalogImporter(separator=options['separator'],
+                                   chunk_size=options['chunk_size'],
+                                   on_error=on_error,
+                                   on_progress=on_progress)
+        try:
+            with open_text(path) as stream:
+                if input_format == 'jsonl':
+                    rows = read_jsonl(stream)
+                else:
+                    rows = read_csv(stream, options['delimiter'])
+                stats = importer.run(rows)
+        except (OSError, ImportRowError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'OK - {stats}'))
@@ -0,0 +1,36 @@
+from socket import error as socket_base_error
+
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.lowstock import (pending_low_stock, rescan_low_stock,
+                                send_low_stock_notifications)
+
+
+class Command(BaseCommand):
+    help = ('Sends one low stock notification per supplier '
+            'over a single mail connection')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=1.0,
+                            help='maximum messages per second')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only list pending notifications')
+        parser.add_argument('--rescan', action='store_true',
+                            help='rebuild the low stock list from '
+                                 'the stock table first')
+
+    def handle(self, *args, **options):
+        if options['rescan']:
+            count = rescan_low_stock()
+            self.stdout.write(f'{count} stocks below reorder level')
+        if options['dry_run']:
+            for supplier, stocks in pending_low_stock().items():
+                self.stdout.write(f'{supplier or "ADMINS"}: '
+                                  + ', '.join(str(stock.article)
+                                              for stock in stocks))
+            return
+        try:
+            sent = send_low_stock_notifications(rate=options['rate'])
+        except socket_base_error as error:
+            raise CommandError(f'Mail server error: {error}')
+        self.stdout.write(self.style.SUCCESS(f'OK - {sent} messages sent'))
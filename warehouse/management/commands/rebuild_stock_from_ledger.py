@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.ledger import find_discrepancies, rebuild_stock_numbers
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds stock quantities from the movement ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report stock that differs '
+                                 'from the ledger')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            discrepancies = find_discrepancies()
+        else:
+            discrepancies = rebuild_stock_numbers()
+        for pk, (number, balance) in sorted(discrepancies.items()):
+            self.stdout.write(f'Stock {pk}: stored {number}, '
+                              f'ledger {balance}')
+        if options['check'] and discrepancies:
+            raise CommandError(f'{len(discrepancies)} stock rows '
+                               f'differ from the ledger')
+        action = 'checked' if options['check'] else 'rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'OK - stock {action}, {len(discrepancies)} rows differed'))
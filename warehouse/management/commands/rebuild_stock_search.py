@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.search import install_search_index, optimize_search_index
+from warehouse.search import search_supported
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search_supported(using):
+            raise CommandError('Full-text search requires SQLite with FTS5')
+        install_search_index(using, rebuild=True)
+        optimize_search_index(using)
+        self.stdout.write(self.style.SUCCESS('OK - search index rebuilt'))
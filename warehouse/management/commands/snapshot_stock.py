@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from warehouse.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Stores per-stock balance snapshots from the movement ledger'
+
+    def handle(self, *args, **options):
+        count = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'OK - {count} stock balances stored'))
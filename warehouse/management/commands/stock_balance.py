@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from warehouse.ledger import ledger_balances
+from warehouse.models import Stock
+
+
+class Command(BaseCommand):
+    help = 'Prints stock quantities at a point in time from the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('date', help='"2020-03-01 12:00", or '
+                                         '"2020-03-01" for the end of day')
+        parser.add_argument('--article', type=int)
+
+    def handle(self, *args, **options):
+        date = parse_datetime(options['date'])
+        if date is None:
+            day = parse_date(options['date'])
+            if day is None:
+                raise CommandError('Invalid date')
+            date = datetime.datetime.combine(day, datetime.time.max)
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        stocks = Stock.objects.order_by('article')
+        if options['article'] is not None:
+            stocks = stocks.filter(article=options['article'])
+        stocks = list(stocks.values_list('pk', 'article', 'name'))
+        balances = ledger_balances([pk for pk, article, name in stocks],
+                                   date)
+        for pk, article, name in stocks:
+            self.stdout.write(f'{article}\t{name}\t{balances.get(pk, 0)}')
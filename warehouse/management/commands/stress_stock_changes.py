@@ -0,0 +1,110 @@
+import multiprocessing
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from category.models import Category
+from warehouse.models import Stock, StockMovement
+from warehouse.services import change_stock
+
+INITIAL_NUMBER = 1000
+
+
+def run_worker(using, stock_ids, operations, seed):
+    """
+    Процесс нагрузки: случайные списания и поступления
+    по общему набору товаров.
+    """
+    rng = random.Random(seed)
+    applied = dict.fromkeys(stock_ids, 0)
+    stats = {'ok': 0, 'shortage': 0, 'retry': 0}
+    for i in range(operations):
+        lines = rng.sample(stock_ids, rng.randint(1, min(3, len(stock_ids))))
+        deltas = {pk: rng.choice((-1, -1, 1)) * rng.randint(1, 20)
+                  for pk in lines}
+        while True:
+            try:
+                result = change_stock(deltas, StockMovement.ADJUSTMENT)
+                break
+            except OperationalError:
+                # SQLite: база занята другим процессом дольше таймаута
+                stats['retry'] += 1
+                time.sleep(rng.random() / 100)
+        if result.ok:
+            stats['ok'] += 1
+            for pk, delta in deltas.items():
+                applied[pk] += delta
+        else:
+            stats['shortage'] += 1
+    connections.close_all()
+    return applied, stats
+
+
+class Command(BaseCommand):
+    help = ('Runs parallel workers against the same stock rows '
+            'and checks that no update is lost')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200)
+        parser.add_argument('--stocks', type=int, default=5)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if using != 'default':
+            raise CommandError('Stock service works with the default '
+                               'database; point DATABASES at PostgreSQL '
+                               'to stress it')
+        connection = connections[using]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+                mode = cursor.fetchone()[0]
+            self.stdout.write(f'SQLite journal mode: {mode}')
+        category = Category.objects.create(
+            name=f'stress-test-{int(time.time())}')
+        start = (Stock.objects.order_by('-article')
+                 .values_list('article', flat=True).first() or 0) + 1
+        stocks = [Stock.objects.create(article=start + i,
+                                       name=f'{category.name}-{i}',
+                                       price=1, number=INITIAL_NUMBER,
+                                       category=category)
+                  for i in range(options['stocks'])]
+        stock_ids = [stock.pk for stock in stocks]
+        try:
+            self.run(using, stock_ids, options)
+        finally:
+            category.delete()
+
+    def run(self, using, stock_ids, options):
+        connections.close_all()
+        tasks = [(using, stock_ids, options['operations'], seed)
+                 for seed in range(options['workers'])]
+        started = time.perf_counter()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['workers']) as pool:
+            results = pool.starmap(run_worker, tasks)
+        elapsed = time.perf_counter() - started
+
+        expected = dict.fromkeys(stock_ids, INITIAL_NUMBER)
+        stats = {'ok': 0, 'shortage': 0, 'retry': 0}
+        for applied, worker_stats in results:
+            for pk, delta in applied.items():
+                expected[pk] += delta
+            for key, value in worker_stats.items():
+                stats[key] += value
+        actual = dict(Stock.objects.filter(pk__in=stock_ids)
+                      .values_list('pk', 'number'))
+        total = stats['ok'] + stats['shortage']
+        self.stdout.write(f'{total} changes in {elapsed:.2f} s '
+                          f'({total / elapsed:.0f}/s): {stats["ok"]} applied, '
+                          f'{stats["shortage"]} rejected for shortage, '
+                          f'{stats["retry"]} retried on lock')
+        lost = {pk: (expected[pk], actual.get(pk))
+                for pk in stock_ids if expected[pk] != actual.get(pk)}
+        if lost:
+            raise CommandError(f'Lost updates (expected, actual): {lost}')
+        self.stdout.write(self.style.SUCCESS('OK - no lost updates'))
@@ -0,0 +1,68 @@
+# Generated by Django 3.0.8 on 2026-10-18 07:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_opening_balances(apps, schema_editor):
+    Stock = apps.get_model('warehouse', 'Stock')
+    StockMovement = apps.get_model('warehouse', 'StockMovement')
+    date = django.utils.timezone.now()
+    StockMovement.objects.bulk_create(
+        StockMovement(stock_id=pk, kind='adjustment', delta=number,
+                      date=date)
+        for pk, number in Stock.objects.values_list('pk', 'number')
+        if number)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0001_initial'),
+        ('cargo', '0002_auto_20200301_1804'),
+        ('warehouse', '0002_auto_20200307_1715'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(verbose_name='Дата')),
+                ('number', models.IntegerField(verbose_name='Количество')),
+                ('movement_id', models.IntegerField(verbose_name='Последнее учтенное движение')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='warehouse.Stock', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Снимок остатка',
+                'verbose_name_plural': 'Снимки остатков',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Поступление'), ('reservation', 'Резерв'), ('release', 'Снятие резерва'), ('adjustment', 'Корректировка')], max_length=11, verbose_name='Операция')),
+                ('delta', models.IntegerField(verbose_name='Изменение количества')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+                ('cargo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cargo.Cargo', verbose_name='Поставка')),
+                ('shipment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shipment.Shipment', verbose_name='Покупка')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='warehouse.Stock', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Движение товара',
+                'verbose_name_plural': 'Движение товаров',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['stock', 'date'], name='stock_snapshot_stock_date'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['stock', 'date'], name='stock_movement_stock_date'),
+        ),
+        migrations.RunPython(record_opening_balances,
+                             migrations.RunPython.noop),
+    ]
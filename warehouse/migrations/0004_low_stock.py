@@ -0,0 +1,32 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0003_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStock',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='low_stock', serialize=False, to='warehouse.Stock', verbose_name='Товар')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+                ('notified', models.DateTimeField(blank=True, null=True, verbose_name='Поставщик уведомлен')),
+            ],
+            options={
+                'verbose_name': 'Заканчивающийся товар',
+                'verbose_name_plural': 'Заканчивающиеся товары',
+            },
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=0, verbose_name='Минимальный остаток'),
+        ),
+    ]
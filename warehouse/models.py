@@ -2,6 +2,8 @@ from django.db import models
 
 from django.db.models.fields import validators
 
+from django.utils import timezone
+
 from django.utils.translation import gettext as _
 
 from mptt.models import TreeForeignKey
@@ -23,8 +25,93 @@ class Stock(models.Model):
                               validators=[validators.MinValueValidator(0)])
     number = models.PositiveIntegerField()
     number.verbose_name = _('Количество на складе')
+    reorder_level = models.PositiveIntegerField(
+        default=0, verbose_name=_('Минимальный остаток'))
     category = TreeForeignKey('category.Category', on_delete=models.CASCADE,
                               verbose_name=_('Категория'))
 
     def __str__(self):
         return self.name
+
+
+class StockMovement(models.Model):
+    """
+    Журнал движения товаров (записи только добавляются).
+    """
+    class Meta:
+        verbose_name = _('Движение товара')
+        verbose_name_plural = _('Движение товаров')
+        indexes = [models.Index(fields=['stock', 'date'],
+                                name='stock_movement_stock_date')]
+
+    RECEIPT = 'receipt'
+    RESERVATION = 'reservation'
+    RELEASE = 'release'
+    ADJUSTMENT = 'adjustment'
+    kinds = [(RECEIPT, _('Поступление')),
+             (RESERVATION, _('Резерв')),
+             (RELEASE, _('Снятие резерва')),
+             (ADJUSTMENT, _('Корректировка')), ]
+
+    stock = models.ForeignKey('warehouse.Stock', on_delete=models.CASCADE,
+                              verbose_name=_('Товар'))
+    kind = models.CharField(max_length=11, choices=kinds,
+                            verbose_name=_('Операция'))
+    delta = models.IntegerField(verbose_name=_('Изменение количества'))
+    date = models.DateTimeField(default=timezone.now,
+                                verbose_name=_('Дата'))
+    cargo = models.ForeignKey('cargo.Cargo', on_delete=models.SET_NULL,
+                              null=True, blank=True,
+                              verbose_name=_('Поставка'))
+    shipment = models.ForeignKey('shipment.Shipment',
+                                 on_delete=models.SET_NULL,
+                                 null=True, blank=True,
+                                 verbose_name=_('Покупка'))
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.delta:+d}'
+
+
+class StockSnapshot(models.Model):
+    """
+    Остаток товара на момент снимка: сумма всех движений
+    с id не больше movement_id.
+    """
+    class Meta:
+        verbose_name = _('Снимок остатка')
+        verbose_name_plural = _('Снимки остатков')
+        indexes = [models.Index(fields=['stock', 'date'],
+                                name='stock_snapshot_stock_date')]
+
+    stock = models.ForeignKey('warehouse.Stock', on_delete=models.CASCADE,
+                              verbose_name=_('Товар'))
+    date = models.DateTimeField(verbose_name=_('Дата'))
+    number = models.IntegerField(verbose_name=_('Количество'))
+    movement_id = models.IntegerField(
+        verbose_name=_('Последнее учтенное движение'))
+
+    def __str__(self):
+        return f'{self.stock_id}: {self.number}'
+
+
+class LowStock(models.Model):
+    """
+    Товары, количество которых ниже минимального остатка.
+
+    Строка добавляется, когда товар опускается ниже минимального
+    остатка, и удаляется, когда количество восстанавливается.
+    """
+    class Meta:
+        verbose_name = _('Заканчивающийся товар')
+        verbose_name_plural = _('Заканчивающиеся товары')
+
+    stock = models.OneToOneField('warehouse.Stock', on_delete=models.CASCADE,
+                                 primary_key=True, related_name='low_stock',
+                                 verbose_name=_('Товар'))
+    date = models.DateTimeField(default=timezone.now,
+                                verbose_name=_('Дата'))
+    notified = models.DateTimeField(null=True, blank=True,
+                                    verbose_name=_('Поставщик уведомлен'))
+
+    def __str__(self):
+        return str(self.stock)
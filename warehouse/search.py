@@ -0,0 +1,114 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .importer import INTEGER_MAX
+
+SEARCH_TABLE = 'warehouse_stock_fts'
+
+# Полнотекстовый индекс SQLite FTS5 по артикулу и наименованию товара.
+# Индекс хранит только токены (content='warehouse_stock'),
+# а триггеры синхронизируют его с таблицей товаров при любых
+# изменениях, в том числе через bulk_create и update().
+SEARCH_INDEX_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+    f"USING fts5(article, name, content='warehouse_stock', "
+    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+SEARCH_TRIGGERS_SQL = {
+    f'{SEARCH_TABLE}_insert': (
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert "
+        f"AFTER INSERT ON warehouse_stock BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}(rowid, article, name) "
+        f"VALUES (new.id, new.article, new.name); END"),
+    f'{SEARCH_TABLE}_delete': (
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete "
+        f"AFTER DELETE ON warehouse_stock BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, article, name) "
+        f"VALUES ('delete', old.id, old.article, old.name); END"),
+    f'{SEARCH_TABLE}_update': (
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update "
+        f"AFTER UPDATE OF article, name ON warehouse_stock BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, article, name) "
+        f"VALUES ('delete', old.id, old.article, old.name); "
+        f"INSERT INTO {SEARCH_TABLE}(rowid, article, name) "
+        f"VALUES (new.id, new.article, new.name); END"),
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def search_supported(using='default'):
+    """
+    Поддерживает ли база данных полнотекстовый индекс товаров.
+    """
+    return connections[using].vendor == 'sqlite'
+
+
+def install_search_index(using='default', rebuild=False):
+    """
+    Создание индекса и триггеров, если их нет.
+
+    SQLite пересоздает таблицу товаров при изменении ее схемы
+    в миграциях, при этом триггеры удаляются, поэтому функция
+    вызывается после каждой миграции и перестраивает индекс,
+    если триггеры пришлось создать заново.
+    """
+    if not search_supported(using):
+        return False
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        cursor.execute(SEARCH_INDEX_SQL)
+        for name, sql in SEARCH_TRIGGERS_SQL.items():
+            if name not in existing:
+                cursor.execute(sql)
+                rebuild = True
+        if rebuild:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) "
+                           f"VALUES ('rebuild')")
+    return rebuild
+
+
+def optimize_search_index(using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) "
+                       f"VALUES ('optimize')")
+
+
+def build_match_query(search_term):
+    """
+    Запрос FTS5: все слова поискового запроса как префиксы
+    (например, "тел lg" находит "Телевизор LG").
+    """
+    tokens = TOKEN_RE.findall(search_term)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_stocks(queryset, search_term):
+    """
+    Поиск товаров по артикулу и наименованию через индекс FTS5.
+
+    К найденным по индексу товарам добавляется товар с артикулом,
+    точно равным запросу из одного числа (уникальный индекс).
+    Возвращает None, если индекс недоступен и нужно использовать
+    обычный поиск через LIKE.
+    """
+    search_term = search_term.strip()
+    if not search_term:
+        return queryset
+    if not search_supported(queryset.db):
+        return None
+    match = build_match_query(search_term)
+    if not match:
+        return None
+    matched_ids = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} '
+                         f'WHERE {SEARCH_TABLE} MATCH %s', (match, ))
+    condition = Q(pk__in=matched_ids)
+    # число вне диапазона INTEGER не может быть артикулом
+    # (например, отсканированный штрихкод)
+    if search_term.isdecimal() and int(search_term) <= INTEGER_MAX:
+        condition |= Q(article=int(search_term))
+    return queryset.filter(condition)
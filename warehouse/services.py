@@ -0,0 +1,119 @@
+from django.db import models, transaction
+from django.db.models import Case, F, Q, When
+
+from common.models import change_category_totals
+
+from .ledger import record_document_movements, record_movements
+from .lowstock import refresh_low_stock
+from .models import Stock
+
+# количество строк в одном UPDATE (ограничение на число параметров SQLite)
+CHANGE_BATCH_SIZE = 200
+# повторы, если нехватка исчезла к моменту повторного чтения
+CHANGE_ATTEMPTS = 3
+
+
+class StockChangeResult:
+    """
+    Результат изменения количества товаров.
+
+    shortages - словарь {id товара: (требуемое количество,
+    количество на складе)} для строк, которые не удалось списать.
+    """
+
+    def __init__(self, deltas, shortages=None):
+        self.deltas = deltas
+        self.shortages = shortages or {}
+
+    @property
+    def ok(self):
+        return not self.shortages
+
+    def __bool__(self):
+        return self.ok
+
+
+class _StockShortage(Exception):
+    pass
+
+
+def _apply_batch(deltas):
+    whens = []
+    guard = Q()
+    for pk, delta in deltas:
+        whens.append(When(pk=pk, then=F('number') + delta))
+        if delta < 0:
+            guard |= Q(pk=pk, number__gte=-delta)
+        else:
+            guard |= Q(pk=pk)
+    number = Case(*whens, output_field=models.PositiveIntegerField())
+    return Stock.objects.filter(guard).update(number=number)
+
+
+def _update_totals_and_levels(deltas):
+    # одно чтение измененных товаров для итогов категорий
+    # и списка заканчивающихся товаров
+    category_deltas = {}
+    levels = {}
+    for pk, price, category_id, number, reorder_level in (
+            Stock
+            .objects
+            .filter(pk__in=deltas)
+            .values_list('pk', 'price', 'category_id',
+                         'number', 'reorder_level')):
+        value, total_number = category_deltas.get(category_id, (0, 0))
+        category_deltas[category_id] = (value + price * deltas[pk],
+                                        total_number + deltas[pk])
+        levels[pk] = (number, reorder_level)
+    change_category_totals(category_deltas)
+    refresh_low_stock(levels)
+
+
+def change_stock(deltas, kind, cargo=None, shipment=None, movements=None):
+    """
+    Изменение количества товаров на складе.
+
+    deltas - словарь {id товара: изменение количества}
+    (отрицательное значение - списание), kind - вид операции
+    StockMovement; изменения записываются в журнал движения товаров
+    вместе с документом (cargo или shipment), список заканчивающихся
+    товаров обновляется для измененных строк. Все изменения применяются
+    в одной транзакции запросами UPDATE с F() и условием
+    number >= списываемое количество, поэтому параллельные
+    изменения не теряются. Если хотя бы одну строку списать нельзя,
+    ничего не меняется, а нехватка возвращается в результате.
+
+    Если изменение относится к нескольким документам, записи журнала
+    передаются в movements (см. record_document_movements).
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return StockChangeResult(deltas)
+    items = sorted(deltas.items())
+    for attempt in range(CHANGE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                for start in range(0, len(items), CHANGE_BATCH_SIZE):
+                    batch = items[start:start + CHANGE_BATCH_SIZE]
+                    if _apply_batch(batch) != len(batch):
+                        raise _StockShortage()
+                _update_totals_and_levels(deltas)
+                if movements is None:
+                    record_movements(deltas, kind, cargo=cargo,
+                                     shipment=shipment)
+                else:
+                    record_document_movements(movements, kind)
+            return StockChangeResult(deltas)
+        except _StockShortage:
+            available = dict(Stock
+                             .objects
+                             .filter(pk__in=deltas)
+                             .values_list('pk', 'number'))
+            shortages = {pk: (abs(delta), available.get(pk, 0))
+                         for pk, delta in items
+                         if pk not in available
+                         or available[pk] + delta < 0}
+            if shortages:
+                return StockChangeResult(deltas, shortages)
+    return StockChangeResult(deltas, {pk: (abs(delta), available.get(pk, 0))
+                                      for pk, delta in items if delta < 0})
@@ -0,0 +1,64 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from common.versions import bump_version
+
+from .catalog import CATALOG_VERSION
+from .ledger import record_movements
+from .lowstock import refresh_low_stock
+from .models import Stock, StockMovement
+
+
+@receiver(pre_save, sender=Stock)
+def remember_stock_state(sender, instance, raw=False, **kwargs):
+    """
+    Запоминаем значения полей товара до сохранения
+    (для инкрементального обновления итогов и каталога).
+    """
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (Stock
+                                    .objects
+                                    .filter(pk=instance.pk)
+                                    .values('name', 'price', 'number',
+                                            'category_id', 'reorder_level')
+                                    .first())
+
+
+@receiver(post_save, sender=Stock)
+def invalidate_catalog_on_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if (raw or previous is None
+            or previous['name'] != instance.name
+            or previous['category_id'] != instance.category_id):
+        bump_version(CATALOG_VERSION)
+
+
+@receiver(post_save, sender=Stock)
+def record_manual_adjustment(sender, instance, raw=False, **kwargs):
+    """
+    Изменение количества при сохранении товара (например, в интерфейсе
+    кладовщика) записывается в журнал как корректировка.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    delta = instance.number - (previous['number'] if previous else 0)
+    record_movements({instance.pk: delta}, StockMovement.ADJUSTMENT)
+
+
+@receiver(post_save, sender=Stock)
+def refresh_low_stock_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if (previous is None
+            or previous['number'] != instance.number
+            or previous['reorder_level'] != instance.reorder_level):
+        refresh_low_stock({instance.pk: (instance.number,
+                                         instance.reorder_level)})
+
+
+@receiver(post_delete, sender=Stock)
+def invalidate_catalog_on_delete(sender, instance, **kwargs):
+    bump_version(CATALOG_VERSION)
@@ -0,0 +1,249 @@
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from cargo.models import Cargo
+from category.models import Category
+from common.models import CategoryTotal, SupplierCategory
+from customer.models import Customer
+from shipment.models import Shipment
+from supplier.models import Supplier
+
+from .importer import CatalogImporter
+from .ledger import record_document_movements
+from .lowstock import (pending_low_stock, rescan_low_stock,
+                       send_low_stock_notifications)
+from .models import Stock, StockMovement
+from .search import search_stocks
+from .services import CHANGE_BATCH_SIZE, change_stock
+
+
+class ChangeStockTest(TestCase):
+    """
+    Изменение количества товаров (warehouse.services.change_stock).
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name='test')
+        Stock.objects.bulk_create(
+            Stock(article=1000 + i, name=f'test {i}', price=2, number=10,
+                  category=self.category)
+            for i in range(CHANGE_BATCH_SIZE * 2 + 50))
+        self.stock_ids = list(Stock
+                              .objects
+                              .filter(category=self.category)
+                              .order_by('pk')
+                              .values_list('pk', flat=True))
+        CategoryTotal.objects.filter(category=self.category).update(
+            value=2 * 10 * len(self.stock_ids),
+            number=10 * len(self.stock_ids),
+            subtree_value=2 * 10 * len(self.stock_ids),
+            subtree_number=10 * len(self.stock_ids))
+        customer = Customer.objects.create(full_name='test',
+                                           phone_number='0',
+                                           email='test@example.com')
+        self.shipment = Shipment.objects.create(customer=customer)
+        supplier = Supplier.objects.create(organization='test',
+                                           address='-', phone_number='0',
+                                           email='test@example.com',
+                                           legal_details='-')
+        self.cargo = Cargo.objects.create(supplier=supplier)
+
+    def numbers(self):
+        return dict(Stock
+                    .objects
+                    .filter(pk__in=self.stock_ids)
+                    .values_list('pk', 'number'))
+
+    def test_change_in_several_batches(self):
+        deltas = {pk: -3 for pk in self.stock_ids}
+        deltas[self.stock_ids[0]] = 5
+        with CaptureQueriesContext(connection) as queries:
+            result = change_stock(deltas, StockMovement.RESERVATION,
+                                  shipment=self.shipment)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.shortages, {})
+        numbers = self.numbers()
+        self.assertEqual(numbers[self.stock_ids[0]], 15)
+        self.assertEqual(set(numbers[pk] for pk in self.stock_ids[1:]), {7})
+        updates = [query for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "warehouse_stock"')]
+        self.assertEqual(len(updates), 3)
+        movements = StockMovement.objects.filter(shipment=self.shipment)
+        self.assertEqual(movements.count(), len(self.stock_ids))
+        self.assertEqual(dict(movements.values_list('stock_id', 'delta')),
+                         deltas)
+        self.assertEqual(set(movements.values_list('kind', flat=True)),
+                         {StockMovement.RESERVATION})
+        totals = CategoryTotal.objects.get(category=self.category)
+        self.assertEqual(totals.number,
+                         10 * len(self.stock_ids) + sum(deltas.values()))
+        self.assertEqual(totals.value, 2 * totals.number)
+
+    def test_shortage_rolls_back_whole_change(self):
+        # нехватка во втором пакете: первый пакет тоже откатывается
+        short = self.stock_ids[CHANGE_BATCH_SIZE + 10]
+        Stock.objects.filter(pk=short).update(number=2)
+        before = self.numbers()
+        deltas = {pk: -4 for pk in self.stock_ids}
+        result = change_stock(deltas, StockMovement.RESERVATION,
+                              shipment=self.shipment)
+        self.assertFalse(result.ok)
+        self.assertEqual(result.shortages, {short: (4, 2)})
+        self.assertEqual(self.numbers(), before)
+        self.assertFalse(StockMovement.objects.exists())
+        totals = CategoryTotal.objects.get(category=self.category)
+        self.assertEqual(totals.number, 10 * len(self.stock_ids))
+
+    def test_missing_stock_is_reported(self):
+        missing = max(self.stock_ids) + 1
+        result = change_stock({self.stock_ids[0]: -1, missing: -1},
+                              StockMovement.RESERVATION)
+        self.assertEqual(result.shortages, {missing: (1, 0)})
+        self.assertEqual(self.numbers()[self.stock_ids[0]], 10)
+
+    def test_movements_of_one_document(self):
+        deltas = {pk: 4 for pk in self.stock_ids[:3]}
+        self.assertTrue(change_stock(deltas, StockMovement.RECEIPT,
+                                     cargo=self.cargo))
+        self.assertEqual(
+            sorted(StockMovement
+                   .objects
+                   .values_list('stock_id', 'delta', 'kind', 'cargo_id',
+                                'shipment_id')),
+            [(pk, 4, StockMovement.RECEIPT, self.cargo.pk, None)
+             for pk in self.stock_ids[:3]])
+
+    def test_movements_of_several_documents(self):
+        first, second = self.stock_ids[:2]
+        other = Shipment.objects.create(customer=self.shipment.customer)
+        # строки двух покупок с одним товаром складываются в deltas
+        movements = [(first, -2, None, self.shipment.pk),
+                     (first, -1, None, other.pk),
+                     (second, -5, None, other.pk)]
+        self.assertTrue(change_stock({first: -3, second: -5},
+                                     StockMovement.RESERVATION,
+                                     movements=movements))
+        self.assertEqual(self.numbers()[first], 7)
+        self.assertEqual(self.numbers()[second], 5)
+        self.assertEqual(
+            sorted(StockMovement
+                   .objects
+                   .values_list('stock_id', 'delta', 'cargo_id',
+                                'shipment_id')),
+            sorted(movements))
+
+    def test_record_document_movements_skips_zero_deltas(self):
+        record_document_movements([(self.stock_ids[0], 0, self.cargo.pk,
+                                    None),
+                                   (self.stock_ids[1], 3, self.cargo.pk,
+                                    None)],
+                                  StockMovement.RECEIPT)
+        self.assertEqual(list(StockMovement
+                              .objects
+                              .values_list('stock_id', 'delta')),
+                         [(self.stock_ids[1], 3)])
+
+
+class CatalogImporterTest(TestCase):
+    """
+    Проверка строк импорта (warehouse.importer.CatalogImporter).
+    """
+
+    def row(self, **values):
+        row = {'article': '1', 'name': 'Гвозди', 'price': '2.5',
+               'number': '10', 'category': 'Крепеж'}
+        row.update(values)
+        return row
+
+    def test_out_of_range_rows_are_skipped(self):
+        errors = []
+        importer = CatalogImporter(
+            on_error=lambda line_num, error: errors.append(line_num))
+        rows = [(2, self.row(price='nan')),
+                (3, self.row(price='inf')),
+                (4, self.row(price='-inf')),
+                (5, self.row(article='99999999999999999999')),
+                (6, self.row(article='-99999999999999999999')),
+                (7, self.row(number='99999999999999999999')),
+                (8, self.row())]
+        stats = importer.run(rows)
+        self.assertEqual(errors, [2, 3, 4, 5, 6, 7])
+        self.assertEqual((stats.created, stats.skipped), (1, 6))
+        self.assertEqual(list(Stock.objects.values_list('article', 'price')),
+                         [(1, 2.5)])
+
+
+class SearchStocksTest(TestCase):
+    """
+    Поиск товаров (warehouse.search.search_stocks).
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='test')
+        Stock.objects.bulk_create([
+            Stock(article=100, name='Молоток', price=1, number=1,
+                  category=category),
+            Stock(article=7, name='Гвозди 100мм', price=1, number=1,
+                  category=category),
+            Stock(article=8, name='Шурупы', price=1, number=1,
+                  category=category)])
+
+    def search(self, search_term):
+        return sorted(search_stocks(Stock.objects.all(), search_term)
+                      .values_list('article', flat=True))
+
+    def test_article_and_name_matches(self):
+        self.assertEqual(self.search('100'), [7, 100])
+        self.assertEqual(self.search('гвоз'), [7])
+
+    def test_number_out_of_integer_range(self):
+        self.assertEqual(self.search('99999999999999999999'), [])
+
+
+class FailingSupplierBackend(BaseEmailBackend):
+    """
+    Почтовый сервер, который не принимает письма одному адресу.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if 'second@example.com' in message.to:
+                raise ConnectionRefusedError('mail server is down')
+            mail.outbox.append(message)
+        return len(email_messages)
+
+
+class LowStockNotificationTest(TestCase):
+    """
+    Уведомления о заканчивающихся товарах
+    (warehouse.lowstock.send_low_stock_notifications).
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='test')
+        for name in ('first', 'second'):
+            supplier = Supplier.objects.create(
+                organization=name, address='-', phone_number='0',
+                email=f'{name}@example.com', legal_details='-')
+            SupplierCategory.objects.create(supplier=supplier,
+                                            category=category)
+        Stock.objects.bulk_create([Stock(article=1, name='test', price=1,
+                                         number=1, reorder_level=5,
+                                         category=category)])
+        rescan_low_stock()
+
+    def test_stock_of_failed_supplier_is_not_marked(self):
+        connection = get_connection(
+            'warehouse.tests.FailingSupplierBackend')
+        with self.assertRaises(ConnectionRefusedError):
+            send_low_stock_notifications(rate=0, connection=connection)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(list(pending_low_stock()), list(Supplier
+                                                         .objects
+                                                         .order_by('pk')))
+        self.assertEqual(send_low_stock_notifications(rate=0), 2)
+        self.assertEqual(pending_low_stock(), {})